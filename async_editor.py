@@ -0,0 +1,449 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urlsplit
+
+from batch import JobResult, batch_output_path, expand_paths, load_parameters, print_report
+from gcode_codecs import open_gcode, text_gcode_path
+from gcode_editor import ENGINES, OUTPUT_BUFFER_SIZE, edit_gcode_stream, find_layer_info, iter_chunk_lines
+
+# Size of the chunks read from the input files
+CHUNK_SIZE = 1 << 16
+
+# Default amount of jobs edited and sent at the same time by run_jobs_async()
+MAX_JOBS = 8
+
+# An output of edited G-code : write(data) sends bytes and waits until the sink can take more, close() ends the
+# output and abort() drops it after an error, so that a printer never gets a partial file as a complete one. See
+# open_file_sink(), open_socket_sink() and open_http_upload_sink().
+Sink = namedtuple("Sink", ["write", "close", "abort"])
+
+
+async def read_file_chunks(gcode_file_path, chunk_size=CHUNK_SIZE):
+    """Read a file by chunks without blocking the event loop. Compressed and binary G-code is decoded (see
+    open_gcode()).
+
+    Parameters
+    ----------
+    gcode_file_path : The relative path of the file to read.
+    chunk_size : Amount of bytes of each chunk.
+
+    Returns
+    -------
+    chunks : An asynchronous generator of bytes.
+    """
+
+    file = await asyncio.to_thread(open_gcode, gcode_file_path, "rb")
+    try:
+        while True:
+            chunk = await asyncio.to_thread(file.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        await asyncio.to_thread(file.close)
+
+
+def iter_async_chunks(chunks, loop):
+    """Iterate over an asynchronous iterable from a thread other than the one of the event loop. Each chunk is awaited
+    on the event loop while the thread waits for it.
+
+    Parameters
+    ----------
+    chunks : An asynchronous iterable of bytes or str chunks.
+    loop : The running event loop.
+
+    Returns
+    -------
+    chunks : A generator of the same chunks.
+    """
+
+    chunks = chunks.__aiter__()
+
+    while True:
+        try:
+            yield asyncio.run_coroutine_threadsafe(chunks.__anext__(), loop).result()
+        except StopAsyncIteration:
+            return
+
+
+def next_encoded_block(edited_blocks):
+    """Edit the next block of layers. This is the task run in the executor.
+
+    Parameters
+    ----------
+    edited_blocks : A generator of edited G-code text, see edit_gcode_stream().
+
+    Returns
+    -------
+    edited_block : The next block encoded in bytes, or None at the end of the G-code.
+    """
+
+    edited_block = next(edited_blocks, None)
+
+    return None if edited_block is None else edited_block.encode()
+
+
+async def edit_gcode_async(chunks, sink, parameter_set, total_layers=None, engine="regex",
+                           buffer_size=OUTPUT_BUFFER_SIZE, executor=None):
+    """Edit G-code coming from asynchronous chunks and send it to a sink, without blocking the event loop. The edition
+    runs in an executor, one block of layers ahead of the sink : a slow sink pauses the edition, which pauses the
+    reading of the chunks. At most two blocks of buffer_size characters are held in memory.
+
+    Parameters
+    ----------
+    chunks : An asynchronous iterable of bytes or str chunks, see read_file_chunks().
+    sink : A Sink receiving the edited G-code. It is neither closed nor aborted.
+    parameter_set : User parameters as a ParameterSet, see load_parameter_file().
+    total_layers : Total amount of layers of the G-code, see edit_gcode_stream().
+    engine : How G1 lines are edited, one of ENGINES.
+    buffer_size : Amount of characters of whole layers sent to the sink at once.
+    executor : A thread pool for the edition. It must not be the one reading the chunks, as an edition waits for them.
+    A thread is started for this edition if None.
+
+    Returns
+    -------
+    size : Amount of bytes sent to the sink.
+    """
+
+    loop = asyncio.get_running_loop()
+
+    # The edition pulls the lines it needs from the chunks, in the thread of the executor
+    chunks = chunks.__aiter__()
+    input_lines = iter_chunk_lines(iter_async_chunks(chunks, loop))
+    edited_blocks = edit_gcode_stream(input_lines, parameter_set, total_layers, engine, buffer_size)
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(1)
+
+    size = 0
+    pending_block = None
+    try:
+        pending_block = loop.run_in_executor(executor, next_encoded_block, edited_blocks)
+        while True:
+            edited_block = await pending_block
+            if edited_block is None:
+                break
+
+            # Edit the next block while this one is sent
+            pending_block = loop.run_in_executor(executor, next_encoded_block, edited_blocks)
+            await sink.write(edited_block)
+            size += len(edited_block)
+    finally:
+        # If the sink failed, let the block being edited finish, as its thread may be waiting for chunks from the
+        # event loop
+        if pending_block is not None and not pending_block.done():
+            await asyncio.wait([pending_block])
+        edited_blocks.close()
+        if own_executor:
+            executor.shutdown(wait=False)
+
+        # An edition stopped early leaves the chunks unfinished. An asynchronous generator like read_file_chunks() is
+        # closed here, on the event loop, since its first chunk was asked from the thread of the edition, which does
+        # not close it.
+        if hasattr(chunks, "aclose"):
+            await chunks.aclose()
+
+    return size
+
+
+def wrap_stream_sink(reader, writer):
+    """Make a Sink of an asyncio stream. Writing waits until the transport buffer is drained.
+
+    Parameters
+    ----------
+    reader : The asyncio.StreamReader of the connection. Unused.
+    writer : The asyncio.StreamWriter of the connection.
+
+    Returns
+    -------
+    sink : A Sink.
+    """
+
+    async def write(data):
+        writer.write(data)
+        await writer.drain()
+
+    async def close():
+        writer.close()
+        await writer.wait_closed()
+
+    return Sink(write, close, close)
+
+
+async def open_file_sink(output_file_path):
+    """Open a file as a Sink. Writes run in a thread.
+
+    Parameters
+    ----------
+    output_file_path : The relative path of the new G code file.
+
+    Returns
+    -------
+    sink : A Sink.
+    """
+
+    file = await asyncio.to_thread(open, output_file_path, "wb")
+
+    async def write(data):
+        await asyncio.to_thread(file.write, data)
+
+    async def close():
+        await asyncio.to_thread(file.close)
+
+    async def abort():
+        await close()
+        await asyncio.to_thread(os.remove, output_file_path)
+
+    return Sink(write, close, abort)
+
+
+async def open_socket_sink(host, port):
+    """Open a TCP connection as a Sink, for example to a print server reading raw G-code.
+
+    Parameters
+    ----------
+    host : The host name or address.
+    port : The TCP port.
+
+    Returns
+    -------
+    sink : A Sink.
+    """
+
+    return wrap_stream_sink(*await asyncio.open_connection(host, port))
+
+
+async def open_http_upload_sink(url, headers=None):
+    """Open an HTTP upload as a Sink. The G-code is sent as the body of a PUT request with a chunked transfer
+    encoding, so that its size does not need to be known. Closing the sink ends the request and checks the response.
+
+    Example, with the API of PrusaLink :
+    await open_http_upload_sink("http://192.168.1.20/api/v1/files/usb/part.gcode", {"X-Api-Key": "..."})
+
+    Parameters
+    ----------
+    url : The URL of the uploaded file, http or https.
+    headers : A dictionary of additional headers, for example for authentication.
+
+    Returns
+    -------
+    sink : A Sink. Its close() raises ConnectionError if the printer does not accept the file.
+    """
+
+    parts = urlsplit(url)
+    https = parts.scheme == "https"
+    port = parts.port or (443 if https else 80)
+    target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+
+    reader, writer = await asyncio.open_connection(parts.hostname, port, ssl=https or None)
+
+    # Send the request head
+    request_lines = [f"PUT {target} HTTP/1.1", f"Host: {parts.netloc}", "Content-Type: application/octet-stream",
+                     "Transfer-Encoding: chunked", "Connection: close"]
+    request_lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+    writer.write(("\r\n".join(request_lines) + "\r\n\r\n").encode("latin-1"))
+
+    async def write(data):
+        writer.write(b"%x\r\n%b\r\n" % (len(data), data))
+        await writer.drain()
+
+    async def close():
+        try:
+            # End the body and read the status of the response
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+            status_line = (await reader.readline()).decode("latin-1").strip()
+        finally:
+            writer.close()
+            await writer.wait_closed()
+
+        status = status_line.split(" ", 2)
+        if len(status) < 2 or not status[1].startswith("2"):
+            raise ConnectionError(f"Upload to {url} failed : {status_line or 'no response'}")
+
+    async def abort():
+        # Leaving the chunked body unfinished tells the printer the upload failed
+        writer.transport.abort()
+
+    return Sink(write, close, abort)
+
+
+async def open_sink(target, headers=None):
+    """Open the Sink matching a target : an http:// or https:// URL for an HTTP upload, tcp://host:port for a socket,
+    or a file path.
+
+    Parameters
+    ----------
+    target : A URL or a relative file path.
+    headers : A dictionary of additional headers for an HTTP upload.
+
+    Returns
+    -------
+    sink : A Sink.
+    """
+
+    parts = urlsplit(target)
+
+    if parts.scheme in ("http", "https"):
+        return await open_http_upload_sink(target, headers)
+    if parts.scheme == "tcp":
+        return await open_socket_sink(parts.hostname, parts.port)
+
+    return await open_file_sink(target)
+
+
+def job_target(gcode_file_path, parameter_file_path, destination):
+    """Compute where a job sends its G-code. Like batch_output_path(), the name of the new file holds the names of the
+    parameter file and of the G-code file. It is appended to an HTTP URL, a socket target is used as is. The G-code is
+    sent as text, so the name of a compressed or binary G-code file gets the extension of a text file.
+
+    Parameters
+    ----------
+    gcode_file_path : The relative path of the G code file to edit.
+    parameter_file_path : The relative path of the parameters file used for the edition.
+    destination : A folder, an http:// or https:// URL of a folder, or tcp://host:port.
+
+    Returns
+    -------
+    target : A target for open_sink().
+    """
+
+    scheme = urlsplit(destination).scheme
+    gcode_file_path = text_gcode_path(gcode_file_path)
+
+    if scheme == "tcp":
+        return destination
+    if scheme in ("http", "https"):
+        file_name = os.path.basename(batch_output_path(gcode_file_path, parameter_file_path, ""))
+        return destination.rstrip("/") + "/" + quote(file_name)
+
+    return batch_output_path(gcode_file_path, parameter_file_path, destination)
+
+
+async def run_job_async(gcode_file_path, parameter_file_path, target, parameter_set, engine, executor, semaphore,
+                        headers=None):
+    """Edit one G-code file and send it to its target, once the semaphore lets it start.
+
+    Parameters
+    ----------
+    gcode_file_path : The relative path of the G code file to edit.
+    parameter_file_path : The relative path of the parameters file used for the edition.
+    target : Where the G-code is sent, see open_sink().
+    parameter_set : User parameters as a ParameterSet, or an error message if the parameter file cannot be used.
+    engine : How G1 lines are edited, one of ENGINES.
+    executor : The thread pool of the editions.
+    semaphore : An asyncio.Semaphore limiting the amount of jobs running at the same time.
+    headers : A dictionary of additional headers for an HTTP upload.
+
+    Returns
+    -------
+    result : A JobResult.
+    """
+
+    if isinstance(parameter_set, str):
+        return JobResult(gcode_file_path, parameter_file_path, target, "invalid", 0.0, parameter_set)
+
+    async with semaphore:
+        start = time.perf_counter()
+
+        try:
+            # The phases depend on the amount of layers, read before the edition starts
+            total_layers = (await asyncio.to_thread(find_layer_info, gcode_file_path))[2]
+
+            sink = await open_sink(target, headers)
+            try:
+                await edit_gcode_async(read_file_chunks(gcode_file_path), sink, parameter_set, total_layers, engine,
+                                       executor=executor)
+            except BaseException:
+                await sink.abort()
+                raise
+            await sink.close()
+            status, message = "ok", ""
+        except Exception as e:
+            status, message = "error", f"{type(e).__name__}: {e}"
+
+        return JobResult(gcode_file_path, parameter_file_path, target, status, time.perf_counter() - start, message)
+
+
+async def run_jobs_async(jobs, max_jobs=MAX_JOBS, engine="regex", workers=None, headers=None):
+    """Edit many G-code files and send them to their targets concurrently, in a single thread for the input and
+    output. Each parameter file is extracted and checked once.
+
+    Parameters
+    ----------
+    jobs : A list of (gcode_file_path, parameter_file_path, target) triples, see job_target().
+    max_jobs : The amount of jobs running at the same time.
+    engine : How G1 lines are edited, one of ENGINES.
+    workers : The amount of threads editing G-code, max_jobs if None.
+    headers : A dictionary of additional headers for HTTP uploads.
+
+    Returns
+    -------
+    results : A list of JobResult, in the order of the jobs.
+    """
+
+    parameters = load_parameters([parameter_file_path for _, parameter_file_path, _ in jobs])
+    semaphore = asyncio.Semaphore(max_jobs)
+
+    with ThreadPoolExecutor(workers or max_jobs) as executor:
+        return await asyncio.gather(*[
+            run_job_async(gcode_file_path, parameter_file_path, target, parameters[parameter_file_path], engine,
+                          executor, semaphore, headers)
+            for gcode_file_path, parameter_file_path, target in jobs])
+
+
+def main(argv=None):
+    """Command line interface of the asynchronous editor. Every G-code file is edited with every parameter file and
+    sent to every destination.
+
+    Examples :
+    python async_editor.py --gcode "input/*.gcode" --parameter parameter/example_parameter.txt --to output/
+    python async_editor.py --gcode input/part.gcode --parameter parameter/example_parameter.txt
+        --to http://192.168.1.20/api/v1/files/usb --to http://192.168.1.21/api/v1/files/usb --header "X-Api-Key: ..."
+
+    Parameters
+    ----------
+    argv : The command line arguments, sys.argv is used if None.
+
+    Returns
+    -------
+    exit_code : 0 if every job succeeded, 1 otherwise.
+    """
+
+    parser = argparse.ArgumentParser(description="Edit G-code files and send them to printers concurrently.")
+    parser.add_argument("--gcode", nargs="+", required=True, help="G-code files or glob patterns")
+    parser.add_argument("--parameter", nargs="+", required=True, help="Parameter files or glob patterns")
+    parser.add_argument("--to", nargs="+", default=["output/"], dest="destinations",
+                        help="Folders, http(s) upload URLs of folders or tcp://host:port")
+    parser.add_argument("--header", action="append", default=[], help='HTTP header such as "X-Api-Key: ..."')
+    parser.add_argument("--jobs", type=int, default=MAX_JOBS, help="Amount of jobs running at the same time")
+    parser.add_argument("--engine", choices=ENGINES, default="regex", help="How G1 lines are edited")
+    args = parser.parse_args(argv)
+
+    headers = dict(header.split(":", 1) for header in args.header)
+    headers = {name.strip(): value.strip() for name, value in headers.items()}
+
+    for destination in args.destinations:
+        if not urlsplit(destination).scheme:
+            os.makedirs(destination, exist_ok=True)
+
+    jobs = [(gcode_file_path, parameter_file_path, job_target(gcode_file_path, parameter_file_path, destination))
+            for gcode_file_path in expand_paths(args.gcode)
+            for parameter_file_path in expand_paths(args.parameter)
+            for destination in args.destinations]
+
+    results = asyncio.run(run_jobs_async(jobs, args.jobs, args.engine, headers=headers))
+    print_report(results)
+
+    return 0 if all(result.status == "ok" for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
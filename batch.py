@@ -0,0 +1,308 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from gcode_editor import ENGINES, edit_gcode_file, load_parameter_file
+
+# Outcome of a job run by run_batch()
+JobResult = namedtuple("JobResult", ["gcode_file_path", "parameter_file_path", "output_file_path", "status",
+                                     "seconds", "message"])
+
+
+def read_manifest(manifest_path):
+    """Read a manifest file describing the jobs of a batch. The manifest is a JSON list of objects with a "gcode" and a
+    "parameter" key. Each value is a path, a glob pattern or a list of them. Every G-code file matched by an object is
+    edited with every parameter file matched by the same object.
+
+    Example :
+    [{"gcode": "input/*.gcode",
+      "parameter": ["parameter/example_parameter.txt", "parameter/example_parameter_bis.txt"]}]
+
+    Parameters
+    ----------
+    manifest_path : The relative path of the manifest file.
+
+    Returns
+    -------
+    jobs : A list of (gcode_file_path, parameter_file_path) pairs.
+    """
+
+    with open(manifest_path, "r") as file:
+        manifest = json.load(file)
+
+    jobs = []
+    for entry in manifest:
+        jobs.extend(list_jobs(entry["gcode"], entry["parameter"]))
+
+    # Remove duplicated jobs, keeping their first position
+    return list(dict.fromkeys(jobs))
+
+
+def expand_paths(patterns):
+    """Expand glob patterns into paths. A pattern which matches nothing is kept as is, its job will then report the
+    missing file.
+
+    Parameters
+    ----------
+    patterns : A path, a glob pattern or a list of them.
+
+    Returns
+    -------
+    paths : A list of paths.
+    """
+
+    if isinstance(patterns, str):
+        patterns = [patterns]
+
+    paths = []
+    for pattern in patterns:
+        paths.extend(sorted(glob.glob(pattern)) or [pattern])
+
+    return paths
+
+
+def list_jobs(gcode_patterns, parameter_patterns):
+    """List the jobs editing every G-code file with every parameter file.
+
+    Parameters
+    ----------
+    gcode_patterns : A path, a glob pattern or a list of them for the G-code files.
+    parameter_patterns : A path, a glob pattern or a list of them for the parameter files.
+
+    Returns
+    -------
+    jobs : A list of (gcode_file_path, parameter_file_path) pairs.
+    """
+
+    return [(gcode_file_path, parameter_file_path)
+            for gcode_file_path in expand_paths(gcode_patterns)
+            for parameter_file_path in expand_paths(parameter_patterns)]
+
+
+def batch_output_path(gcode_file_path, parameter_file_path, output_folder):
+    """Compute the path of the new G-code file of a job. The name of the parameter file is part of it, so that a G-code
+    file edited with several parameter files gives several files.
+
+    Parameters
+    ----------
+    gcode_file_path : The relative path of the G code file to edit.
+    parameter_file_path : The relative path of the parameters file used for the edition.
+    output_folder : The folder of the new G-code files.
+
+    Returns
+    -------
+    output_file_path : The relative path of the new G code file.
+    """
+
+    parameter_name = os.path.splitext(os.path.basename(parameter_file_path))[0]
+    gcode_name = os.path.basename(gcode_file_path)
+
+    return os.path.join(output_folder, f"modified-{parameter_name}-{gcode_name}")
+
+
+def find_duplicate_outputs(output_file_paths):
+    """Find the jobs writing the same file as an earlier job, like two G-code files with the same name in different
+    folders. Running them would make them race on the file and silently lose all results but one.
+
+    Parameters
+    ----------
+    output_file_paths : A list of relative paths of new G-code files, one per job.
+
+    Returns
+    -------
+    duplicates : A dictionary giving for the index of each duplicated job the index of the first job writing its file.
+    """
+
+    first_jobs = {}
+    duplicates = {}
+
+    for index, output_file_path in enumerate(output_file_paths):
+        key = os.path.normcase(os.path.abspath(output_file_path))
+        first_index = first_jobs.setdefault(key, index)
+        if first_index != index:
+            duplicates[index] = first_index
+
+    return duplicates
+
+
+def load_parameters(parameter_file_paths):
+    """Extract and check each parameter file once.
+
+    Parameters
+    ----------
+    parameter_file_paths : A list of relative paths of parameter files.
+
+    Returns
+    -------
+    parameters : A dictionary giving for each path its ParameterSet, or an error message if the file cannot be used.
+    """
+
+    parameters = {}
+
+    for parameter_file_path in dict.fromkeys(parameter_file_paths):
+        try:
+            parameters[parameter_file_path] = load_parameter_file(parameter_file_path)
+        except (OSError, ValueError) as e:
+            parameters[parameter_file_path] = str(e)
+
+    return parameters
+
+
+def run_job(gcode_file_path, output_file_path, parameter_set, engine):
+    """Edit one G-code file and measure the time it takes. This is the task run by each worker.
+
+    Parameters
+    ----------
+    gcode_file_path : The relative path of the G code file to edit.
+    output_file_path : The relative path of the new G code file.
+    parameter_set : User parameters as a ParameterSet, see load_parameter_file().
+    engine : How G1 lines are edited, one of ENGINES.
+
+    Returns
+    -------
+    status : "ok" or "error".
+    seconds : Duration of the edition.
+    message : The error message, empty if the edition succeeded.
+    """
+
+    start = time.perf_counter()
+
+    try:
+        edit_gcode_file(gcode_file_path, output_file_path, parameter_set, engine=engine)
+        status, message = "ok", ""
+    except Exception as e:
+        status, message = "error", f"{type(e).__name__}: {e}"
+
+    return status, time.perf_counter() - start, message
+
+
+def run_batch(jobs, output_folder="output/", workers=1, engine="regex"):
+    """Edit many G-code files with many parameter files. Each parameter file is extracted and checked once, then the
+    jobs are run in a pool of processes. A job writing the same file as an earlier job is not run, see
+    find_duplicate_outputs().
+
+    Parameters
+    ----------
+    jobs : A list of (gcode_file_path, parameter_file_path) pairs, see read_manifest() and list_jobs().
+    output_folder : The folder of the new G-code files, see batch_output_path().
+    workers : The amount of processes.
+    engine : How G1 lines are edited, one of ENGINES.
+
+    Returns
+    -------
+    results : A list of JobResult, in the order of the jobs.
+    """
+
+    # Extract and check each parameter file once
+    parameters = load_parameters([parameter_file_path for _, parameter_file_path in jobs])
+
+    # Only the first job writing a file is run, the next ones are rejected before any job starts
+    output_file_paths = [batch_output_path(gcode_file_path, parameter_file_path, output_folder)
+                         for gcode_file_path, parameter_file_path in jobs]
+    duplicates = find_duplicate_outputs(output_file_paths)
+
+    os.makedirs(output_folder, exist_ok=True)
+
+    with ProcessPoolExecutor(workers) as executor:
+
+        # Schedule the jobs with valid parameters and their own output file
+        futures = []
+        for index, (gcode_file_path, parameter_file_path) in enumerate(jobs):
+            parameter_set = parameters[parameter_file_path]
+            if isinstance(parameter_set, str) or index in duplicates:
+                futures.append(None)
+            else:
+                futures.append(executor.submit(run_job, gcode_file_path, output_file_paths[index], parameter_set,
+                                               engine))
+
+        # Gather the results in the order of the jobs
+        results = []
+        for index, ((gcode_file_path, parameter_file_path), future) in enumerate(zip(jobs, futures)):
+            if index in duplicates:
+                first_gcode_file_path, first_parameter_file_path = jobs[duplicates[index]]
+                status, seconds, message = "invalid", 0.0, (f"Same output file as {first_gcode_file_path} + "
+                                                            f"{first_parameter_file_path}")
+            elif future is None:
+                status, seconds, message = "invalid", 0.0, parameters[parameter_file_path]
+            else:
+                status, seconds, message = future.result()
+            results.append(JobResult(gcode_file_path, parameter_file_path, output_file_paths[index], status, seconds,
+                                     message))
+
+    return results
+
+
+def print_report(results):
+    """Print the status and duration of each job, then a summary.
+
+    Parameters
+    ----------
+    results : A list of JobResult.
+
+    Returns
+    -------
+
+    """
+
+    for result in results:
+        print(f"{result.status:<7} {result.seconds:8.3f} s  {result.gcode_file_path} + {result.parameter_file_path}"
+              f" -> {result.output_file_path}")
+        if result.message:
+            print(f"        {result.message}")
+
+    nb_ok = sum(result.status == "ok" for result in results)
+    total_seconds = sum(result.seconds for result in results)
+    print(f"{nb_ok}/{len(results)} jobs succeeded in {total_seconds:.3f} s of edition.")
+
+
+def main(argv=None):
+    """Command line interface of the batch runner.
+
+    Examples :
+    python batch.py manifest.json --workers 4
+    python batch.py --gcode "input/*.gcode" --parameter "parameter/*.txt"
+
+    Parameters
+    ----------
+    argv : The command line arguments, sys.argv is used if None.
+
+    Returns
+    -------
+    exit_code : 0 if every job succeeded, 1 otherwise.
+    """
+
+    parser = argparse.ArgumentParser(description="Edit many G-code files with many parameter files.")
+    parser.add_argument("manifest", nargs="?", help="JSON manifest of the jobs, see read_manifest()")
+    parser.add_argument("--gcode", nargs="+", default=[], help="G-code files or glob patterns")
+    parser.add_argument("--parameter", nargs="+", default=[], help="Parameter files or glob patterns")
+    parser.add_argument("--output", default="output/", help="Folder of the new G-code files")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Amount of processes")
+    parser.add_argument("--engine", choices=ENGINES, default="regex", help="How G1 lines are edited")
+    parser.add_argument("--report", help="Save the result of each job in this JSON file")
+    args = parser.parse_args(argv)
+
+    # Jobs from the manifest and from the command line
+    jobs = read_manifest(args.manifest) if args.manifest else []
+    if args.gcode or args.parameter:
+        jobs.extend(list_jobs(args.gcode, args.parameter))
+    if not jobs:
+        parser.error("no job, give a manifest or --gcode and --parameter")
+
+    results = run_batch(jobs, args.output, args.workers, args.engine)
+    print_report(results)
+
+    if args.report:
+        with open(args.report, "w") as file:
+            json.dump([result._asdict() for result in results], file, indent=2)
+
+    return 0 if all(result.status == "ok" for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
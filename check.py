@@ -1,5 +1,35 @@
 import numpy as np
 
+from collections import namedtuple
+
+# Lowest possible temperature in degree Celsius
+ABSOLUTE_ZERO = -273.15
+
+# Usual range of nozzle temperatures in degree Celsius, according to classic data found on the Web
+USUAL_TEMPERATURE_RANGE = (180, 220)
+
+# Sections of a parameter file, in order. The first three give a value for each phase.
+PARAMETER_SECTIONS = ("phase", "temperature", "speed", "extrude", "shift", "heating")
+PHASE_SECTIONS = PARAMETER_SECTIONS[:3]
+
+# Amount of values of the sections with global values
+GLOBAL_SECTION_SIZES = {"extrude": 1, "shift": 2, "heating": 1}
+
+# Severity of a ParameterViolation. A parameter set is valid when it has no error, warnings only point out unusual
+# values.
+ERROR = "error"
+WARNING = "warning"
+
+# A problem found by validate_parameter_sets(). set_index is the position of the parameter set in the batch, section
+# the name of the section of the parameter file (see PARAMETER_SECTIONS), row the line of the section (-1 for the whole
+# section), code a short name of the check which failed, severity ERROR or WARNING and message the text shown to the
+# user.
+ParameterViolation = namedtuple("ParameterViolation", ["set_index", "section", "row", "code", "severity", "message"])
+
+# Outcome of validate_parameter_sets(). is_valid is a boolean array telling for each parameter set whether it has no
+# error, violations the list of every ParameterViolation found, sorted by parameter set.
+ValidationResult = namedtuple("ValidationResult", ["is_valid", "violations"])
+
 
 def print_warning(message):
     print("Warning : "+message)
@@ -264,3 +294,203 @@ def check_parameter(parameter_array):
             list_boolean.append(check_func[i](parameter_array[i]))
 
     return False not in list_boolean
+
+
+def validate_parameter_sets(parameter_arrays):
+    """Check many parameter sets at once, without printing anything. Unlike check_parameter(), every violation is
+    collected instead of stopping at the first one. The parameter sets with the same amount of phases are stacked and
+    checked together by validate_parameter_batch(). A set whose sections do not have the expected shape only reports
+    these shape errors, its values are not checked.
+
+    Parameters
+    ----------
+    parameter_arrays : A list of parameter sets, each one in the form returned by extract_values_from_file().
+
+    Returns
+    -------
+    result : A ValidationResult.
+    """
+
+    is_valid = np.ones(len(parameter_arrays), dtype=bool)
+    violations = []
+
+    # Group the well-formed sets by amount of phases
+    groups = {}
+    for set_index, parameter_array in enumerate(parameter_arrays):
+        shape_violations = check_parameter_shape(set_index, parameter_array)
+        if shape_violations:
+            is_valid[set_index] = False
+            violations.extend(shape_violations)
+        else:
+            groups.setdefault(len(parameter_array[0]), []).append(set_index)
+
+    # Check each group at once
+    for set_indexes in groups.values():
+        sets = [parameter_arrays[set_index] for set_index in set_indexes]
+        result = validate_parameter_batch(*(np.stack([np.asarray(parameter_array[section], dtype=float)
+                                                      for parameter_array in sets])
+                                            for section in range(len(PARAMETER_SECTIONS))))
+        is_valid[set_indexes] = result.is_valid
+        violations.extend(violation._replace(set_index=set_indexes[violation.set_index])
+                          for violation in result.violations)
+
+    # The sort is stable, the violations of a set keep their order
+    violations.sort(key=lambda violation: violation.set_index)
+
+    return ValidationResult(is_valid=is_valid, violations=violations)
+
+
+def check_parameter_shape(set_index, parameter_array):
+    """Check that a parameter set has every section, with a (phase number, value) line for each phase in the first
+    three sections and the expected amount of values in the others.
+
+    Parameters
+    ----------
+    set_index : The position of the parameter set in the batch.
+    parameter_array : A parameter set in the form returned by extract_values_from_file().
+
+    Returns
+    -------
+    violations : A list of ParameterViolation, empty if the shape is correct.
+    """
+
+    if len(parameter_array) != len(PARAMETER_SECTIONS):
+        return [ParameterViolation(set_index, "phase", -1, "section_count", ERROR,
+                                   f"The parameter file has {len(parameter_array)} sections instead of "
+                                   f"{len(PARAMETER_SECTIONS)}.")]
+
+    violations = []
+    arrays = [np.asarray(array) for array in parameter_array]
+    nb_phases = len(arrays[0])
+
+    for section, array in zip(PHASE_SECTIONS, arrays):
+        if array.ndim != 2 or array.shape[1] != 2 or not len(array):
+            violations.append(ParameterViolation(set_index, section, -1, f"{section}_shape", ERROR,
+                                                 f"Each line of the {section} section must start with 'Phase'."))
+        # The amount of phases is only known from a well-formed phase section
+        elif violations and violations[0].section == "phase":
+            continue
+        elif len(array) < nb_phases:
+            violations.append(ParameterViolation(set_index, section, -1, f"{section}_count", ERROR,
+                                                 f"Some phases are not described in {section}."))
+        elif len(array) > nb_phases:
+            violations.append(ParameterViolation(set_index, section, -1, f"{section}_count", ERROR,
+                                                 f"There are more phases described in {section} than existant "
+                                                 f"phases."))
+
+    for section, array in zip(PARAMETER_SECTIONS[3:], arrays[3:]):
+        if array.ndim != 1 or len(array) != GLOBAL_SECTION_SIZES[section]:
+            violations.append(ParameterViolation(set_index, section, -1, f"{section}_count", ERROR,
+                                                 f"The {section} section must have {GLOBAL_SECTION_SIZES[section]} "
+                                                 f"value(s) instead of {array.size}."))
+
+    return violations
+
+
+def validate_parameter_batch(phases, temperatures, speeds, extrude_corrections, shifts, heatings):
+    """Check a batch of parameter sets stacked in arrays, each check runs on the whole batch at once. This is the fast
+    path for generated parameter sets, see validate_parameter_sets() for a list of parsed parameter files.
+
+    Parameters
+    ----------
+    phases : An array of shape (number of sets, number of phases, 2) of (phase number, end percentage) lines.
+    temperatures : Same as phases, with (phase number, temperature in degree Celsius) lines.
+    speeds : Same as phases, with (phase number, speed ratio in percent) lines.
+    extrude_corrections : An array of shape (number of sets, 1) of extrusion corrections in percent.
+    shifts : An array of shape (number of sets, 2) of (shift_x, shift_y) in mm.
+    heatings : An array of shape (number of sets, 1) of heating flags.
+
+    Returns
+    -------
+    result : A ValidationResult.
+    """
+
+    phases, temperatures, speeds = (np.asarray(array, dtype=float) for array in (phases, temperatures, speeds))
+    extrude_corrections, shifts, heatings = (np.asarray(array, dtype=float).reshape(len(phases), -1)
+                                             for array in (extrude_corrections, shifts, heatings))
+    nb_phases = phases.shape[1]
+    checks = []
+
+    # The phase numbers of each section must be 0, 1, 2... A NaN phase number is never equal.
+    for section, array in zip(PHASE_SECTIONS, (phases, temperatures, speeds)):
+        checks.append((section, f"{section}_index", ERROR, np.trunc(array[:, :, 0]) != np.arange(nb_phases),
+                       lambda values, row: f"Wrong index. You have use {values[row, 0]:g} instead of {row}",
+                       array))
+
+    # The phases start at 0 %, end at 100 % and each one ends after its predecessor
+    phase_values = phases[:, :, 1]
+    first_row = np.arange(nb_phases) == 0
+    last_row = np.arange(nb_phases) == nb_phases - 1
+    increasing = np.ones(phase_values.shape, dtype=bool)
+    increasing[:, 1:] = phase_values[:, 1:] > phase_values[:, :-1]
+    checks.append(("phase", "first_phase", ERROR, first_row & (phase_values != 0),
+                   lambda values, row: "The first phase must be set to 0 %", phases))
+    checks.append(("phase", "last_phase", ERROR, last_row & (phase_values != 100),
+                   lambda values, row: "The last phase must be set to 100 %", phases))
+    checks.append(("phase", "phase_order", ERROR, ~increasing,
+                   lambda values, row: "A phase should have a greater percentage value than its predecessor", phases))
+
+    # Temperatures above the absolute zero, usual temperatures are only a warning
+    temperature_values = temperatures[:, :, 1]
+    impossible_temperature = ~(temperature_values >= ABSOLUTE_ZERO)
+    checks.append(("temperature", "impossible_temperature", ERROR, impossible_temperature,
+                   lambda values, row: "Impossible value for degree Celsius", temperatures))
+    checks.append(("temperature", "low_temperature", WARNING,
+                   ~impossible_temperature & (temperature_values < USUAL_TEMPERATURE_RANGE[0]),
+                   lambda values, row: f"Your temperature {values[row, 1]:g} °C seems to be low", temperatures))
+    checks.append(("temperature", "high_temperature", WARNING, temperature_values > USUAL_TEMPERATURE_RANGE[1],
+                   lambda values, row: f"Your nozzle temperature {values[row, 1]:g} °C seems to be high",
+                   temperatures))
+
+    # Speeds cannot be negative
+    checks.append(("speed", "negative_speed", ERROR, ~(speeds[:, :, 1] >= 0),
+                   lambda values, row: "Impossible negative speed", speeds))
+
+    # Global values must be numbers
+    for section, array in zip(PARAMETER_SECTIONS[3:], (extrude_corrections, shifts, heatings)):
+        checks.append((section, f"{section}_value", ERROR, ~np.isfinite(array),
+                       lambda values, row: f"{values[row]:g} is not a valid number", array))
+
+    # Any non-zero heating flag activates the heating phase, but it should be 0 or 1
+    heating_values = np.where(np.isfinite(heatings), heatings, 0)
+    checks.append(("heating", "heating_float", WARNING, np.trunc(heating_values) != heating_values,
+                   lambda values, row: "You enter a float value for the heating parameter. It has been converted "
+                                       "into int with a lossy conversion.", heatings))
+    checks.append(("heating", "heating_value", WARNING, (heating_values <= -1) | (heating_values >= 2),
+                   lambda values, row: "Any non-zero value activate the heating phase. However, we recommend to use "
+                                       "1 for an easier understanding", heatings))
+
+    # Collect the violations of every check
+    is_valid = np.ones(len(phases), dtype=bool)
+    violations = []
+    for section, code, severity, failed, message, values in checks:
+        set_indexes, rows = np.nonzero(failed)
+        if severity == ERROR:
+            is_valid[set_indexes] = False
+        violations.extend(ParameterViolation(int(set_index), section, int(row), code, severity,
+                                             message(values[set_index], row))
+                          for set_index, row in zip(set_indexes, rows))
+
+    # The sort is stable, the violations of a set keep the order of the checks
+    violations.sort(key=lambda violation: violation.set_index)
+
+    return ValidationResult(is_valid=is_valid, violations=violations)
+
+
+def print_violations(violations):
+    """Print violations found by validate_parameter_sets() as check_parameter() does.
+
+    Parameters
+    ----------
+    violations : A list of ParameterViolation.
+
+    Returns
+    -------
+
+    """
+
+    for violation in violations:
+        if violation.severity == ERROR:
+            print_error(violation.message)
+        else:
+            print_warning(violation.message)
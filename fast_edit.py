@@ -0,0 +1,108 @@
+from gcode_codecs import default_output_path, gcode_codec, gcode_metadata_blocks, open_gcode
+
+# Amount of edited lines gathered before writing them to the output file
+FAST_EDIT_BATCH_SIZE = 4096
+
+
+def edit_shift_speed_line(line, shift_x, shift_y, speed_mult):
+    """Shift the X and Y words and multiply the F word of a G1 line, like shift_position() and apply_speed_multiplier()
+    of gcode_editor.py, with plain string operations. The E word and the comment of the line are kept as they are.
+    apply_speed_multiplier() only reads the number at the start of the F word and gcode_editor.py splits the comment in
+    words : a line like "G1 F9600;_WIPE" keeps its comment here, and a comment with several spaces in a row keeps them.
+
+    Parameters
+    ----------
+    line : A G1 line of G-code.
+    shift_x : The shift of the workpiece on X axis.
+    shift_y : The shift of the workpiece on Y axis.
+    speed_mult : The speed multiplier in percent.
+
+    Returns
+    -------
+    modified_line : The modified line, tagged as modified.
+    """
+
+    # Split the words from the comment
+    code, separator, comment = line.partition(";")
+    modified_line_parts = code.split()
+
+    # Apply the shift and the speed multiplier word by word
+    for i in range(1, len(modified_line_parts)):
+        word = modified_line_parts[i]
+        if word[0] == "X":
+            modified_line_parts[i] = "X{:.3f}".format(float(word[1:]) + shift_x)
+        elif word[0] == "Y":
+            modified_line_parts[i] = "Y{:.3f}".format(float(word[1:]) + shift_y)
+        elif word[0] == "F":
+            modified_line_parts[i] = "F" + str(float(word[1:]) * speed_mult/100)
+
+    # Keep the comment, then tag line modified like tag_modified_line()
+    if separator:
+        modified_line_parts.append(separator + comment.rstrip("\r\n"))
+    modified_line_parts.append(" ;Modified\n")
+
+    return " ".join(modified_line_parts)
+
+
+def iter_shift_speed_blocks(input_lines, shift_x, shift_y, speed_mult, batch_size=FAST_EDIT_BATCH_SIZE):
+    """Edit the G1 lines of G-code with edit_shift_speed_line() and yield the G-code by blocks of lines. The other lines
+    are copied unchanged.
+
+    Parameters
+    ----------
+    input_lines : An iterable of G-code lines, like a file opened in text mode.
+    shift_x : The shift of the workpiece on X axis.
+    shift_y : The shift of the workpiece on Y axis.
+    speed_mult : The speed multiplier in percent.
+    batch_size : Amount of lines of each block.
+
+    Returns
+    -------
+    edited_blocks : A generator of edited G-code text.
+    """
+
+    output_lines = []
+
+    for line in input_lines:
+
+        # Only G1 moves are edited, not G10 or G11
+        if line.startswith("G1") and line[2:3] in (" ", "\t", "\n", ";"):
+            line = edit_shift_speed_line(line, shift_x, shift_y, speed_mult)
+        output_lines.append(line)
+
+        if len(output_lines) >= batch_size:
+            yield "".join(output_lines)
+            output_lines.clear()
+
+    if output_lines:
+        yield "".join(output_lines)
+
+
+def edit_shift_speed_file(gcode_file_path, shift_x=0, shift_y=0, speed_mult=100, output_file_path=None):
+    """Shift the workpiece and multiply the speed of a whole G-code file, without any parameter file. This is the fast
+    path of gcode_cli.py : it only needs the standard library, so that a process editing a small print does not pay
+    for loading NumPy. The temperature, the extrusion and the heating phase are not modified.
+
+    Parameters
+    ----------
+    gcode_file_path : The relative path of the G code file to edit.
+    shift_x : The shift of the workpiece on X axis in mm.
+    shift_y : The shift of the workpiece on Y axis in mm.
+    speed_mult : The speed multiplier in percent, applied to every G1 line.
+    output_file_path : The relative path of the new G code file, see default_output_path() if None.
+
+    Returns
+    -------
+    output_file_path : The relative path of the new G code file.
+    """
+
+    if output_file_path is None:
+        output_file_path = default_output_path(gcode_file_path)
+
+    # A binary G-code file keeps the metadata of the input
+    metadata_blocks = gcode_metadata_blocks(gcode_file_path) if gcode_codec(output_file_path) == "bgcode" else ()
+    with open_gcode(gcode_file_path) as input_file, \
+            open_gcode(output_file_path, "w", metadata_blocks) as output_file:
+        output_file.writelines(iter_shift_speed_blocks(input_file, shift_x, shift_y, speed_mult))
+
+    return output_file_path
@@ -0,0 +1,92 @@
+import argparse
+import sys
+
+
+def main(argv=None):
+    """Command line interface of the G-code editor. Only argparse is loaded at start : the fast path (a shift and a
+    speed multiplier without parameter file) runs edit_shift_speed_file() with the standard library, gcode_editor.py
+    with NumPy and its regular expressions is only imported for an edition with a parameter file.
+
+    Example :
+    python gcode_cli.py input/part.gcode parameter/example_parameter.txt --engine numpy
+    python gcode_cli.py input/part.gcode --shift 2 3 --speed 80
+
+    Parameters
+    ----------
+    argv : The command line arguments, sys.argv is used if None.
+
+    Returns
+    -------
+    exit_code : 0 if the new G-code file was written, 1 otherwise, for instance when a file cannot be read or written.
+    """
+
+    parser = argparse.ArgumentParser(description="Edit a G-code file with a parameter file, or only shift the part "
+                                                 "and multiply its speed.")
+    parser.add_argument("gcode", help="G-code file to edit")
+    parser.add_argument("parameter", nargs="?", help="Parameter file, omit it to only use --shift and --speed")
+    parser.add_argument("--shift", nargs=2, type=float, metavar=("X", "Y"),
+                        help="Shift of the part in mm, without parameter file")
+    parser.add_argument("--speed", type=float, metavar="PERCENT",
+                        help="Speed multiplier in percent, without parameter file")
+    parser.add_argument("--engine", default="regex", help="How G1 lines are edited : regex, split or numpy")
+    parser.add_argument("--single-pass", action="store_true", help="Read the G-code file only once")
+    parser.add_argument("--workers", type=int, default=1, help="Amount of processes editing ranges of layers")
+    parser.add_argument("--zero-copy", action="store_true", help="Copy the unchanged lines without decoding them")
+    parser.add_argument("--cache-dir", help="Folder of the cache of edited layers")
+    parser.add_argument("--heating-path", default="box", help="How the heating path is computed, see gcode_editor()")
+    parser.add_argument("--layers", nargs=2, type=int, metavar=("FIRST", "LAST"),
+                        help="Only edit the layers FIRST to LAST - 1")
+    parser.add_argument("--phase-mapping", default="layer",
+                        help="How the phases are placed on the part : layer or height")
+    parser.add_argument("--report", action="store_true", help="Print statistics of the edition")
+    parser.add_argument("--estimate", action="store_true", help="Estimate the print time and filament of the new file")
+    parser.add_argument("--acceleration", type=float, help="Acceleration of the moves in mm/s² for --estimate")
+    args = parser.parse_intermixed_args(argv)
+
+    # Fast path : no parameter file, NumPy is never loaded
+    if args.parameter is None:
+        if args.shift is None and args.speed is None:
+            parser.error("give a parameter file, or --shift and/or --speed")
+        if args.speed is not None and args.speed <= 0:
+            parser.error("--speed must be greater than 0")
+
+        from fast_edit import edit_shift_speed_file
+
+        shift_x, shift_y = args.shift or (0, 0)
+        speed_mult = 100 if args.speed is None else args.speed
+        try:
+            output_file_path = edit_shift_speed_file(args.gcode, shift_x, shift_y, speed_mult)
+        except OSError as e:
+            print(f"Edition canceled. {e}")
+            return 1
+        print(f"Edition finished. Find the new G code file {output_file_path}.")
+        return 0
+
+    if args.shift is not None or args.speed is not None:
+        parser.error("--shift and --speed are taken from the parameter file when it is given")
+
+    import gcode_editor as gce
+
+    on_estimate = None
+    if args.estimate:
+        from print_estimate import print_estimate_summary
+        on_estimate = print_estimate_summary
+
+    # A missing input or parameter file, or an output folder that cannot be written
+    try:
+        output_file_path = gce.gcode_editor(args.gcode, args.parameter, args.single_pass, args.engine,
+                                            workers=args.workers, zero_copy=args.zero_copy, cache_dir=args.cache_dir,
+                                            on_report=gce.print_edit_report if args.report else None,
+                                            heating_path=args.heating_path,
+                                            layer_range=tuple(args.layers) if args.layers else None,
+                                            phase_mapping=args.phase_mapping, on_estimate=on_estimate,
+                                            acceleration=args.acceleration)
+    except OSError as e:
+        print(f"Edition canceled. {e}")
+        return 1
+
+    return 0 if output_file_path is not None else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
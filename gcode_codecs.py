@@ -0,0 +1,931 @@
+import base64
+import functools
+import gzip
+import io
+import lzma
+import os
+import re
+import struct
+import zlib
+
+from collections import namedtuple
+
+# Codec of a G-code file by extension, see gcode_codec(). Any other file is plain text.
+GCODE_CODECS = {".gz": "gzip", ".xz": "xz", ".bgcode": "bgcode", ".bgc": "bgcode"}
+
+# File header of a binary G-code file : magic, version and checksum type
+BGCODE_MAGIC = b"GCDE"
+BGCODE_VERSION = 1
+BGCODE_HEADER = struct.Struct("<4sIH")
+BGCODE_CHECKSUM_NONE = 0
+BGCODE_CHECKSUM_CRC32 = 1
+
+# Block types of a binary G-code file
+BLOCK_FILE_METADATA = 0
+BLOCK_GCODE = 1
+BLOCK_SLICER_METADATA = 2
+BLOCK_PRINTER_METADATA = 3
+BLOCK_PRINT_METADATA = 4
+BLOCK_THUMBNAIL = 5
+
+# Order of the blocks written before the G-code blocks, as required by the specification of the format. Every metadata
+# block is written, even empty, the thumbnails are optional.
+BGCODE_BLOCK_ORDER = (BLOCK_FILE_METADATA, BLOCK_PRINTER_METADATA, BLOCK_THUMBNAIL, BLOCK_PRINT_METADATA,
+                      BLOCK_SLICER_METADATA)
+BGCODE_METADATA_BLOCKS = (BLOCK_FILE_METADATA, BLOCK_PRINTER_METADATA, BLOCK_PRINT_METADATA, BLOCK_SLICER_METADATA)
+
+# Compression of the data of a block. Heatshrink is given as (window bits, lookahead bits).
+COMPRESSION_NONE = 0
+COMPRESSION_DEFLATE = 1
+COMPRESSION_HEATSHRINK_11_4 = 2
+COMPRESSION_HEATSHRINK_12_4 = 3
+HEATSHRINK_PARAMETERS = {COMPRESSION_HEATSHRINK_11_4: (11, 4), COMPRESSION_HEATSHRINK_12_4: (12, 4)}
+
+# Encoding of the text of a G-code block
+GCODE_ENCODING_NONE = 0
+GCODE_ENCODING_MEATPACK = 1
+GCODE_ENCODING_MEATPACK_COMMENTS = 2
+
+# Block header : type, compression and uncompressed size, followed by the compressed size if the data is compressed
+BLOCK_HEADER = struct.Struct("<HHI")
+BLOCK_SIZE = struct.Struct("<I")
+CHECKSUM_SIZE = 4
+
+# Amount of bytes of G-code text in each G-code block written
+BGCODE_BLOCK_SIZE = 1 << 16
+
+# Keys of the printer metadata block, taken from the "; key = value" comments of a text G-code file
+BGCODE_PRINTER_METADATA_KEYS = ("printer_model", "filament_type", "nozzle_diameter", "bed_temperature", "brim_width",
+                                "fill_density", "layer_height", "temperature", "ironing", "support_material",
+                                "max_layer_z", "extruder_colour")
+
+# Keys of the print metadata block, taken from the "; key = value" comments written by the slicer after the G-code. The
+# slicer metadata block holds the "; key = value" comments of the configuration of the slicer.
+BGCODE_PRINT_METADATA_KEYS = ("filament used [mm]", "filament used [cm3]", "filament used [g]", "filament cost",
+                              "total filament used [g]", "total filament cost", "total layers count",
+                              "estimated printing time (normal mode)", "estimated printing time (silent mode)",
+                              "estimated first layer printing time (normal mode)",
+                              "estimated first layer printing time (silent mode)")
+SLICER_CONFIG_BEGIN = "; prusaslicer_config = begin"
+SLICER_CONFIG_END = "; prusaslicer_config = end"
+
+# Format of a thumbnail block by the name of its comments in a text G-code file : PNG, JPG or QOI
+THUMBNAIL_FORMATS = {"thumbnail": 0, "thumbnail_JPG": 1, "thumbnail_QOI": 2}
+THUMBNAIL_PARAMETERS = struct.Struct("<HHH")
+
+# The 15 characters packed in 4 bits by MeatPack, the code 0b1111 announces a full byte. In "no spaces" mode, "E"
+# takes the place of the space.
+MEATPACK_CHARACTERS = b"0123456789. \nGX"
+MEATPACK_NO_SPACES_CHARACTERS = b"0123456789.E\nGX"
+MEATPACK_FULL_BYTE = 0xF
+
+# The byte ending a line, which also ends a byte of MeatPack when it is the first character of a pair
+NEWLINE_BYTE = ord("\n")
+
+# MeatPack commands are sent as 0xFF 0xFF followed by the command byte
+MEATPACK_SIGNAL = b"\xff\xff"
+MEATPACK_ENABLE_PACKING = 0xFB
+MEATPACK_DISABLE_PACKING = 0xFA
+MEATPACK_RESET_ALL = 0xF9
+MEATPACK_ENABLE_NO_SPACES = 0xF7
+MEATPACK_DISABLE_NO_SPACES = 0xF6
+
+# The space between two words of a G line, removed by MeatPack in "no spaces" mode and put back when decoding. A word
+# ends with one of WORD_END_CHARACTERS and starts with one of WORD_START_CHARACTERS.
+WORD_START_PATTERN = re.compile(rb"(?<=[0-9.])(?=[A-Z])")
+G_COMMAND_PATTERN = re.compile(rb"^G[^;\n]*", re.MULTILINE)
+WORD_END_CHARACTERS = b"0123456789."
+WORD_START_CHARACTERS = b"ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+# A "; key = value" comment of a text G-code file
+METADATA_COMMENT_PATTERN = re.compile(r"; ([\w ()\[\]]+?) = (.*)")
+
+# The first line of a thumbnail of a text G-code file, followed by its base64 data in comments
+THUMBNAIL_BEGIN_PATTERN = re.compile(r"; (thumbnail(?:_JPG|_QOI)?) begin (\d+)x(\d+) \d+")
+
+# A block of a binary G-code file. The parameters are kept as bytes, the payload is the data as stored in the file.
+BgcodeBlock = namedtuple("BgcodeBlock", ["block_type", "compression", "uncompressed_size", "parameters", "payload"])
+
+
+def gcode_codec(gcode_file_path):
+    """Find how a G-code file is stored from its extension.
+
+    Parameters
+    ----------
+    gcode_file_path : The path of the G-code file.
+
+    Returns
+    -------
+    codec : "gzip", "xz", "bgcode" or "text".
+    """
+
+    return GCODE_CODECS.get(os.path.splitext(gcode_file_path)[1].lower(), "text")
+
+
+def text_gcode_path(gcode_file_path):
+    """Compute the name of a G-code file once decoded to text, like "part.gcode.gz" to "part.gcode" or "part.bgcode" to
+    "part.gcode".
+
+    Parameters
+    ----------
+    gcode_file_path : The path of the G-code file.
+
+    Returns
+    -------
+    text_file_path : The path with the extension of a text G-code file.
+    """
+
+    codec = gcode_codec(gcode_file_path)
+    root = os.path.splitext(gcode_file_path)[0]
+
+    if codec == "bgcode":
+        return root + ".gcode"
+    if codec != "text":
+        return root
+
+    return gcode_file_path
+
+
+def default_output_path(gcode_file_path):
+    """Compute the path of the new G-code file of gcode_editor(). The file name gets the prefix "modified-". A file in
+    a folder named "input" goes to the folder "output" next to it, like "input/part.gcode" to
+    "output/modified-part.gcode". Any other file stays in its folder. The new path is never the path of the input.
+
+    Parameters
+    ----------
+    gcode_file_path : The relative path of the G code file to edit.
+
+    Returns
+    -------
+    output_file_path : The relative path of the new G code file.
+    """
+
+    folder, file_name = os.path.split(gcode_file_path)
+
+    if os.path.basename(folder) == "input":
+        folder = os.path.join(os.path.dirname(folder), "output")
+
+    return os.path.join(folder, "modified-" + file_name)
+
+
+def open_gcode(gcode_file_path, mode="r", metadata_blocks=()):
+    """Open a G-code file like open(), decoding or encoding it on the fly according to gcode_codec(). Compressed and
+    binary G-code is never written to disk uncompressed.
+
+    Parameters
+    ----------
+    gcode_file_path : The path of the G-code file.
+    mode : "r" or "w" for text, "rb" or "wb" for bytes.
+    metadata_blocks : The BgcodeBlocks written before the G-code of a new binary G-code file, see
+    gcode_metadata_blocks().
+
+    Returns
+    -------
+    file : A file object of the G-code text.
+    """
+
+    codec = gcode_codec(gcode_file_path)
+    text = "b" not in mode
+    writing = mode[0] == "w"
+
+    if codec == "gzip":
+        return gzip.open(gcode_file_path, mode[0] + ("t" if text else "b"))
+    if codec == "xz":
+        return lzma.open(gcode_file_path, mode[0] + ("t" if text else "b"))
+    if codec == "text":
+        return open(gcode_file_path, mode)
+
+    if writing:
+        file = io.BufferedWriter(BgcodeWriter(open(gcode_file_path, "wb"), metadata_blocks))
+    else:
+        file = io.BufferedReader(ChunkStream(iter_bgcode_gcode(gcode_file_path)))
+
+    return io.TextIOWrapper(file) if text else file
+
+
+def iter_bgcode_gcode(gcode_file_path):
+    """Read the G-code text of a binary G-code file, one block at a time.
+
+    Parameters
+    ----------
+    gcode_file_path : The path of the binary G-code file.
+
+    Returns
+    -------
+    gcode_chunks : A generator of the decoded G-code of each G-code block, as bytes.
+    """
+
+    with open(gcode_file_path, "rb") as file:
+        for block in read_bgcode_blocks(file):
+            if block.block_type == BLOCK_GCODE:
+                yield decode_gcode_block(block)
+
+
+def gcode_metadata_blocks(gcode_file_path):
+    """Find the blocks to write before the G-code of a binary G-code file made from a G-code file. The metadata and
+    thumbnails of a binary G-code file are kept. For any other file, the metadata is taken from its "; key = value"
+    comments and the thumbnails from its "; thumbnail begin" comments.
+
+    Parameters
+    ----------
+    gcode_file_path : The path of the G-code file.
+
+    Returns
+    -------
+    metadata_blocks : A list of BgcodeBlocks, see complete_metadata_blocks().
+    """
+
+    # Keep every block before the G-code
+    if gcode_codec(gcode_file_path) == "bgcode":
+        metadata_blocks = []
+        with open(gcode_file_path, "rb") as file:
+            for block in read_bgcode_blocks(file):
+                if block.block_type == BLOCK_GCODE:
+                    break
+                metadata_blocks.append(block)
+        return complete_metadata_blocks(metadata_blocks)
+
+    # Collect the first value of each metadata key, and the thumbnails
+    producer = "gcode_editor"
+    printer_metadata, print_metadata, slicer_metadata = {}, {}, {}
+    thumbnail_blocks = []
+    thumbnail, thumbnail_data = None, []
+    slicer_config = False
+    with open_gcode(gcode_file_path) as file:
+        for line in file:
+            if not line.startswith(";"):
+                continue
+
+            # The base64 data of a thumbnail, up to its end comment
+            if thumbnail is not None:
+                if line.startswith(f"; {thumbnail[0]} end"):
+                    data = base64.b64decode("".join(thumbnail_data))
+                    thumbnail_blocks.append(BgcodeBlock(BLOCK_THUMBNAIL, COMPRESSION_NONE, len(data),
+                                                        THUMBNAIL_PARAMETERS.pack(*thumbnail[1:]), data))
+                    thumbnail, thumbnail_data = None, []
+                else:
+                    thumbnail_data.append(line[1:].strip())
+                continue
+            match = THUMBNAIL_BEGIN_PATTERN.match(line)
+            if match:
+                thumbnail = match.group(1), THUMBNAIL_FORMATS[match.group(1)], int(match.group(2)), int(match.group(3))
+                continue
+
+            if line.startswith("; generated by "):
+                producer = line[len("; generated by "):].split(" on ")[0].strip()
+                continue
+            if line.startswith((SLICER_CONFIG_BEGIN, SLICER_CONFIG_END)):
+                slicer_config = line.startswith(SLICER_CONFIG_BEGIN)
+                continue
+            match = METADATA_COMMENT_PATTERN.match(line)
+            if match is None:
+                continue
+            key, value = match.group(1), match.group(2).strip()
+            if slicer_config:
+                slicer_metadata.setdefault(key, value)
+            elif key in BGCODE_PRINT_METADATA_KEYS:
+                print_metadata.setdefault(key, value)
+            if key in BGCODE_PRINTER_METADATA_KEYS:
+                printer_metadata.setdefault(key, value)
+
+    return [new_metadata_block(BLOCK_FILE_METADATA, {"Producer": producer}),
+            new_metadata_block(BLOCK_PRINTER_METADATA, printer_metadata),
+            *thumbnail_blocks,
+            new_metadata_block(BLOCK_PRINT_METADATA, print_metadata),
+            new_metadata_block(BLOCK_SLICER_METADATA, slicer_metadata)]
+
+
+def complete_metadata_blocks(metadata_blocks):
+    """Put the blocks written before the G-code of a binary G-code file in the order of BGCODE_BLOCK_ORDER, with an
+    empty block for each missing metadata block. Blocks of other types are dropped.
+
+    Parameters
+    ----------
+    metadata_blocks : A list of BgcodeBlocks.
+
+    Returns
+    -------
+    metadata_blocks : A list of BgcodeBlocks, with one block of each type of BGCODE_METADATA_BLOCKS.
+    """
+
+    block_types = {block.block_type for block in metadata_blocks}
+    metadata_blocks = [block for block in metadata_blocks if block.block_type in BGCODE_BLOCK_ORDER]
+    metadata_blocks += [new_metadata_block(block_type, {}) for block_type in BGCODE_METADATA_BLOCKS
+                        if block_type not in block_types]
+
+    # The thumbnails keep their order
+    return sorted(metadata_blocks, key=lambda block: BGCODE_BLOCK_ORDER.index(block.block_type))
+
+
+def new_metadata_block(block_type, metadata):
+    """Build an uncompressed metadata block in INI encoding.
+
+    Parameters
+    ----------
+    block_type : One of the BLOCK_..._METADATA types.
+    metadata : A dictionary of the metadata.
+
+    Returns
+    -------
+    block : A BgcodeBlock.
+    """
+
+    payload = "".join(f"{key}={value}\n" for key, value in metadata.items()).encode()
+
+    return BgcodeBlock(block_type, COMPRESSION_NONE, len(payload), struct.pack("<H", 0), payload)
+
+
+def read_metadata_block(block):
+    """Read the metadata of a metadata block in INI encoding.
+
+    Parameters
+    ----------
+    block : A BgcodeBlock of one of the BLOCK_..._METADATA types.
+
+    Returns
+    -------
+    metadata : A dictionary of the metadata, in the order of the block.
+    """
+
+    payload = zlib.decompress(block.payload) if block.compression == COMPRESSION_DEFLATE else block.payload
+
+    return dict(line.split("=", 1) for line in payload.decode().splitlines() if "=" in line)
+
+
+def read_bgcode_blocks(file):
+    """Read the blocks of a binary G-code file, checking its header and the checksum of each block.
+
+    Parameters
+    ----------
+    file : The binary G-code file, opened in binary mode.
+
+    Returns
+    -------
+    blocks : A generator of BgcodeBlocks.
+    """
+
+    # Check the file header
+    header = file.read(BGCODE_HEADER.size)
+    if len(header) < BGCODE_HEADER.size:
+        raise ValueError(f"{file.name} is not a binary G-code file")
+    magic, version, checksum_type = BGCODE_HEADER.unpack(header)
+    if magic != BGCODE_MAGIC:
+        raise ValueError(f"{file.name} is not a binary G-code file")
+    if version != BGCODE_VERSION or checksum_type not in (BGCODE_CHECKSUM_NONE, BGCODE_CHECKSUM_CRC32):
+        raise ValueError(f"{file.name} : unsupported binary G-code version {version}")
+
+    while True:
+        block_header = file.read(BLOCK_HEADER.size)
+        if not block_header:
+            return
+        if len(block_header) < BLOCK_HEADER.size:
+            raise ValueError(f"{file.name} : truncated block")
+        block_type, compression, uncompressed_size = BLOCK_HEADER.unpack(block_header)
+
+        # The compressed size is only given for compressed data
+        data_size = uncompressed_size
+        if compression != COMPRESSION_NONE:
+            size_bytes = file.read(BLOCK_SIZE.size)
+            block_header += size_bytes
+            data_size = BLOCK_SIZE.unpack(size_bytes)[0]
+
+        # Thumbnails give their format, width and height, the other blocks their encoding
+        parameters = file.read(6 if block_type == BLOCK_THUMBNAIL else 2)
+        payload = file.read(data_size)
+        if len(payload) < data_size:
+            raise ValueError(f"{file.name} : truncated block")
+
+        if checksum_type == BGCODE_CHECKSUM_CRC32:
+            checksum = file.read(CHECKSUM_SIZE)
+            if checksum != struct.pack("<I", zlib.crc32(payload, zlib.crc32(parameters, zlib.crc32(block_header)))):
+                raise ValueError(f"{file.name} : wrong checksum of a block of type {block_type}")
+
+        yield BgcodeBlock(block_type, compression, uncompressed_size, parameters, payload)
+
+
+def encode_bgcode_block(block):
+    """Serialize a block of a binary G-code file with its CRC32 checksum.
+
+    Parameters
+    ----------
+    block : A BgcodeBlock.
+
+    Returns
+    -------
+    block_bytes : The bytes of the block in the file.
+    """
+
+    block_header = BLOCK_HEADER.pack(block.block_type, block.compression, block.uncompressed_size)
+    if block.compression != COMPRESSION_NONE:
+        block_header += BLOCK_SIZE.pack(len(block.payload))
+
+    checksum = zlib.crc32(block.payload, zlib.crc32(block.parameters, zlib.crc32(block_header)))
+
+    return b"".join((block_header, block.parameters, block.payload, struct.pack("<I", checksum)))
+
+
+def decode_gcode_block(block):
+    """Decompress and decode the G-code text of a G-code block.
+
+    Parameters
+    ----------
+    block : A BgcodeBlock of type BLOCK_GCODE.
+
+    Returns
+    -------
+    gcode : The G-code text as bytes.
+    """
+
+    # Decompress
+    if block.compression == COMPRESSION_NONE:
+        data = block.payload
+    elif block.compression == COMPRESSION_DEFLATE:
+        data = zlib.decompress(block.payload)
+    elif block.compression in HEATSHRINK_PARAMETERS:
+        data = heatshrink_decompress(block.payload, *HEATSHRINK_PARAMETERS[block.compression],
+                                     block.uncompressed_size)
+    else:
+        raise ValueError(f"Unsupported compression {block.compression} of a G-code block")
+
+    # Decode
+    encoding = struct.unpack("<H", block.parameters)[0]
+    if encoding == GCODE_ENCODING_NONE:
+        return data
+    if encoding in (GCODE_ENCODING_MEATPACK, GCODE_ENCODING_MEATPACK_COMMENTS):
+        return meatpack_decode(data)
+    raise ValueError(f"Unsupported encoding {encoding} of a G-code block")
+
+
+def encode_gcode_block(gcode, compression=COMPRESSION_HEATSHRINK_12_4, encoding=GCODE_ENCODING_MEATPACK_COMMENTS):
+    """Encode and compress G-code text in a G-code block.
+
+    Parameters
+    ----------
+    gcode : The G-code text as bytes, made of whole lines.
+    compression : One of the COMPRESSION_... values.
+    encoding : One of the GCODE_ENCODING_... values.
+
+    Returns
+    -------
+    block : A BgcodeBlock of type BLOCK_GCODE.
+    """
+
+    # Encode
+    data = gcode if encoding == GCODE_ENCODING_NONE else meatpack_encode(gcode)
+
+    # Compress
+    if compression == COMPRESSION_NONE:
+        payload = data
+    elif compression == COMPRESSION_DEFLATE:
+        payload = zlib.compress(data)
+    else:
+        payload = heatshrink_compress(data, *HEATSHRINK_PARAMETERS[compression])
+
+    return BgcodeBlock(BLOCK_GCODE, compression, len(data), struct.pack("<H", encoding), payload)
+
+
+def heatshrink_decompress(data, window_bits, lookahead_bits, size):
+    """Decompress Heatshrink data (LZSS with a window of 2**window_bits bytes). Each item starts with a tag bit : 1 for
+    a literal byte, 0 for a back-reference made of an offset of window_bits bits and a count of lookahead_bits bits.
+
+    Parameters
+    ----------
+    data : The compressed data.
+    window_bits : The base 2 logarithm of the window size.
+    lookahead_bits : The base 2 logarithm of the longest back-reference.
+    size : The amount of decompressed bytes.
+
+    Returns
+    -------
+    decompressed : The decompressed bytes.
+    """
+
+    # The window is filled with zeros before the first byte
+    window = 1 << window_bits
+    output = bytearray(window)
+    end = window + size
+    offset_mask = window - 1
+    count_mask = (1 << lookahead_bits) - 1
+    backref_bits = window_bits + lookahead_bits
+
+    bits = 0
+    bit_count = 0
+    position = 0
+    data_size = len(data)
+    while len(output) < end:
+        # Keep enough bits for the longest item
+        while bit_count <= 24 and position < data_size:
+            bits = (bits << 8) | data[position]
+            position += 1
+            bit_count += 8
+
+        if bit_count < 9:
+            break
+        bit_count -= 1
+        if bits >> bit_count & 1:
+            # Literal byte
+            bit_count -= 8
+            output.append(bits >> bit_count & 0xFF)
+        else:
+            # Back-reference, which may overlap the bytes it produces
+            if bit_count < backref_bits:
+                break
+            bit_count -= window_bits
+            distance = (bits >> bit_count & offset_mask) + 1
+            bit_count -= lookahead_bits
+            count = (bits >> bit_count & count_mask) + 1
+            start = len(output) - distance
+            if distance >= count:
+                output += output[start:start + count]
+            else:
+                for index in range(start, start + count):
+                    output.append(output[index])
+        bits &= (1 << bit_count) - 1
+
+    return bytes(output[window:end])
+
+
+def heatshrink_compress(data, window_bits, lookahead_bits):
+    """Compress data with Heatshrink, see heatshrink_decompress(). Each item is the longest match in the window at its
+    position, at its latest start, found for every position at once by find_heatshrink_matches(), or a literal byte.
+
+    Parameters
+    ----------
+    data : The bytes to compress.
+    window_bits : The base 2 logarithm of the window size.
+    lookahead_bits : The base 2 logarithm of the longest back-reference.
+
+    Returns
+    -------
+    compressed : The compressed bytes.
+    """
+
+    import numpy as np
+
+    longest, match = find_heatshrink_matches(data, window_bits, lookahead_bits)
+
+    # The start of each item, a match skipping the positions it covers
+    steps = np.maximum(longest, 1).tolist()
+    starts = []
+    position = 0
+    size = len(data)
+    while position < size:
+        starts.append(position)
+        position += steps[position]
+    starts = np.array(starts, dtype=np.int64)
+
+    # The bits of each item after its tag bit : a literal byte, or the offset and the count of a back-reference
+    counts = longest[starts]
+    literal = counts == 0
+    backref_bits = 1 + window_bits + lookahead_bits
+    values = np.where(literal, (1 << 8) | np.frombuffer(data, dtype=np.uint8)[starts],
+                      (starts - match[starts] - 1) << lookahead_bits | (counts - 1))
+    widths = np.where(literal, 9, backref_bits)
+
+    # Write the items one after the other, the last byte padded with zeros, too few bits for any item
+    shifts = np.arange(backref_bits - 1, -1, -1)
+    bits = values[:, None] >> shifts & 1
+    return np.packbits(bits[shifts < widths[:, None]].astype(np.uint8)).tobytes()
+
+
+def find_heatshrink_matches(data, window_bits, lookahead_bits):
+    """Find the longest match in the window of every position of data, for heatshrink_compress(). The positions are
+    sorted by their first 2 bytes, then 3 bytes and so on : two neighbors with the same bytes in this order are a match
+    of the latest start. The positions without any neighbor in the window are dropped, longer matches cannot have one.
+
+    Parameters
+    ----------
+    data : The bytes to compress.
+    window_bits : The base 2 logarithm of the window size.
+    lookahead_bits : The base 2 logarithm of the longest back-reference.
+
+    Returns
+    -------
+    longest : An array of the length of the longest match at each position, 0 for none (less than 2 bytes).
+    match : An array of the start of the latest longest match at each position.
+    """
+
+    import numpy as np
+
+    max_distance = (1 << window_bits) - 1
+    max_count = 1 << lookahead_bits
+    size = len(data)
+    position_bits = max(size.bit_length(), 1)
+    position_mask = (1 << position_bits) - 1
+    longest = np.zeros(size, dtype=np.int64)
+    match = np.zeros(size, dtype=np.int64)
+
+    # The bytes after the end are values which differ from any byte and from each other, they never match
+    values = np.concatenate((np.frombuffer(data, dtype=np.uint8), np.arange(256, 256 + max_count)))
+    positions = np.arange(size, dtype=np.int64)
+    ranks = values[:size].astype(np.int64)
+    for count in range(2, max_count + 1):
+        # Sort by the rank of the first count - 1 bytes and the next byte, then by position
+        keys = (ranks << 9 | values[positions + count - 1]) << position_bits | positions
+        keys.sort()
+        positions = keys & position_mask
+        groups = keys >> position_bits
+
+        # The matches of count bytes in the window
+        same = groups[1:] == groups[:-1]
+        near = same & (positions[1:] - positions[:-1] <= max_distance)
+        longest[positions[1:][near]] = count
+        match[positions[1:][near]] = positions[:-1][near]
+
+        # Keep the positions with a neighbor in the window, ranked by their count bytes
+        kept = np.zeros(len(positions), dtype=bool)
+        kept[1:] = near
+        kept[:-1] |= near
+        ranks = np.cumsum(np.concatenate(([0], ~same)))[kept]
+        positions = positions[kept]
+
+    return longest, match
+
+
+def meatpack_decode(data):
+    """Decode MeatPack data. Each byte packs two characters of MEATPACK_CHARACTERS, the first one in its low 4 bits,
+    or announces one or two full bytes. A newline ends the byte. The spaces omitted between the words of G lines are
+    put back.
+
+    Parameters
+    ----------
+    data : The MeatPack data.
+
+    Returns
+    -------
+    gcode : The G-code text as bytes.
+    """
+
+    output = bytearray()
+    characters = MEATPACK_CHARACTERS
+    packing = False
+    no_spaces = False
+
+    position = 0
+    size = len(data)
+    while position < size:
+        byte = data[position]
+        position += 1
+
+        # Command
+        if byte == 0xFF and data[position:position + 1] == b"\xff":
+            command = data[position + 1]
+            position += 2
+            if command == MEATPACK_ENABLE_PACKING:
+                packing = True
+            elif command == MEATPACK_DISABLE_PACKING:
+                packing = False
+            elif command == MEATPACK_ENABLE_NO_SPACES:
+                no_spaces = True
+            elif command == MEATPACK_DISABLE_NO_SPACES:
+                no_spaces = False
+            elif command == MEATPACK_RESET_ALL:
+                packing = no_spaces = False
+            characters = MEATPACK_NO_SPACES_CHARACTERS if no_spaces else MEATPACK_CHARACTERS
+            continue
+
+        if not packing:
+            output.append(byte)
+            continue
+
+        # First character, then second character unless the first one ends the line
+        low = byte & 0xF
+        high = byte >> 4
+        if low == MEATPACK_FULL_BYTE:
+            output.append(data[position])
+            position += 1
+        else:
+            output.append(characters[low])
+            if low == 12:
+                continue
+        if high == MEATPACK_FULL_BYTE:
+            output.append(data[position])
+            position += 1
+        else:
+            output.append(characters[high])
+
+    return G_COMMAND_PATTERN.sub(lambda match: WORD_START_PATTERN.sub(b" ", match.group()), bytes(output))
+
+
+def meatpack_encode(gcode):
+    """Encode G-code text with MeatPack in "no spaces" mode, see meatpack_decode(). The spaces between the words of G
+    lines are removed, comments are kept. Each line is packed on its own by pairs of characters, a newline ending the
+    byte. The characters are handled all at once as a numpy array.
+
+    Parameters
+    ----------
+    gcode : The G-code text as bytes.
+
+    Returns
+    -------
+    data : The MeatPack data.
+    """
+
+    import numpy as np
+
+    codes, word_ends, word_starts = meatpack_tables()
+
+    # Remove the spaces between two words of the G lines, before their comment
+    characters = np.frombuffer(gcode, dtype=np.uint8)
+    line_starts = find_line_starts(characters)
+    comments = np.concatenate(([0], np.cumsum(characters == ord(";"))))
+    spaces = np.flatnonzero(characters[1:-1] == ord(" ")) + 1
+    spaces = spaces[(characters[line_starts[spaces]] == ord("G")) &
+                    (comments[spaces] == comments[line_starts[spaces]]) &
+                    word_ends[characters[spaces - 1]] & word_starts[characters[spaces + 1]]]
+    if len(spaces):
+        characters = np.delete(characters, spaces)
+        line_starts = find_line_starts(characters)
+    size = len(characters)
+
+    # The first character of each pair, at an even offset in its line
+    indexes = np.arange(size)
+    firsts = indexes[(indexes - line_starts) % 2 == 0]
+
+    # A last character without newline cannot be followed by a second one
+    last = b""
+    if len(firsts) and firsts[-1] == size - 1 and characters[-1] != NEWLINE_BYTE:
+        last = MEATPACK_SIGNAL + bytes((MEATPACK_DISABLE_PACKING,)) + characters[-1:].tobytes()
+        firsts = firsts[:-1]
+
+    # A byte of two 4-bit codes, followed by the characters that have none. A newline alone ends the byte.
+    first_characters = characters[firsts]
+    alone = first_characters == NEWLINE_BYTE
+    second_characters = np.append(characters, NEWLINE_BYTE)[firsts + 1]
+    first_codes = codes[first_characters]
+    second_codes = np.where(alone, 0, codes[second_characters])
+    first_full = first_codes == MEATPACK_FULL_BYTE
+    second_full = second_codes == MEATPACK_FULL_BYTE
+
+    # Place the bytes of each pair after those of the pairs before it
+    sizes = 1 + first_full + second_full
+    starts = np.cumsum(sizes) - sizes
+    output = np.empty(starts[-1] + sizes[-1] if len(sizes) else 0, dtype=np.uint8)
+    output[starts] = first_codes | second_codes << 4
+    output[starts[first_full] + 1] = first_characters[first_full]
+    output[(starts + first_full)[second_full] + 1] = second_characters[second_full]
+
+    return (MEATPACK_SIGNAL + bytes((MEATPACK_ENABLE_PACKING,)) + MEATPACK_SIGNAL +
+            bytes((MEATPACK_ENABLE_NO_SPACES,)) + output.tobytes() + last)
+
+
+@functools.lru_cache(maxsize=None)
+def meatpack_tables():
+    """Build the tables of meatpack_encode(), indexed by byte. They are built once, NumPy is only loaded by the writer
+    of binary G-code files.
+
+    Returns
+    -------
+    codes : An array of the 4-bit code of each byte in "no spaces" mode, MEATPACK_FULL_BYTE for the bytes written as
+    they are.
+    word_ends : A boolean array, True for the bytes of WORD_END_CHARACTERS.
+    word_starts : A boolean array, True for the bytes of WORD_START_CHARACTERS.
+    """
+
+    import numpy as np
+
+    codes = np.full(256, MEATPACK_FULL_BYTE, dtype=np.uint8)
+    codes[list(MEATPACK_NO_SPACES_CHARACTERS)] = np.arange(len(MEATPACK_NO_SPACES_CHARACTERS))
+    word_ends = np.zeros(256, dtype=bool)
+    word_ends[list(WORD_END_CHARACTERS)] = True
+    word_starts = np.zeros(256, dtype=bool)
+    word_starts[list(WORD_START_CHARACTERS)] = True
+
+    return codes, word_ends, word_starts
+
+
+def find_line_starts(characters):
+    """Find the start of the line of each character of G-code text.
+
+    Parameters
+    ----------
+    characters : The G-code text as an array of bytes.
+
+    Returns
+    -------
+    line_starts : An array of the index of the first character of the line of each character.
+    """
+
+    import numpy as np
+
+    line_starts = np.zeros(len(characters), dtype=np.int64)
+    newlines = np.flatnonzero(characters[:-1] == NEWLINE_BYTE) + 1
+    line_starts[newlines] = newlines
+
+    return np.maximum.accumulate(line_starts) if len(line_starts) else line_starts
+
+
+class BgcodeWriter(io.RawIOBase):
+    """A write-only binary stream saving G-code text in a binary G-code file. The text is cut at line ends in G-code
+    blocks of about BGCODE_BLOCK_SIZE bytes, compressed with Heatshrink and encoded with MeatPack like PrusaSlicer does.
+    The metadata blocks are written with the first G-code block, until then update_metadata() can change them.
+    """
+
+    def __init__(self, file, metadata_blocks=(), compression=COMPRESSION_HEATSHRINK_12_4,
+                 encoding=GCODE_ENCODING_MEATPACK_COMMENTS):
+        self.file = file
+        self.compression = compression
+        self.encoding = encoding
+        self.pending = bytearray()
+        self.metadata_blocks = complete_metadata_blocks(metadata_blocks)
+
+    def metadata(self, block_type):
+        # The metadata of the block of the type, see read_metadata_block()
+        return read_metadata_block(next(block for block in self.metadata_blocks if block.block_type == block_type))
+
+    def update_metadata(self, block_type, metadata):
+        # Change or add values of the metadata block of the type, before it is written
+        if self.metadata_blocks is None:
+            raise ValueError("The metadata blocks are already written")
+        self.metadata_blocks = [new_metadata_block(block_type, {**read_metadata_block(block), **metadata})
+                                if block.block_type == block_type else block for block in self.metadata_blocks]
+
+    def write_metadata(self):
+        # The file header and the blocks before the G-code, once
+        if self.metadata_blocks is not None:
+            self.file.write(BGCODE_HEADER.pack(BGCODE_MAGIC, BGCODE_VERSION, BGCODE_CHECKSUM_CRC32))
+            for block in self.metadata_blocks:
+                self.file.write(encode_bgcode_block(block))
+            self.metadata_blocks = None
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.pending += data
+
+        # Write the full blocks, cut after their last newline
+        while len(self.pending) >= BGCODE_BLOCK_SIZE:
+            end = self.pending.rfind(b"\n", 0, BGCODE_BLOCK_SIZE) + 1 or BGCODE_BLOCK_SIZE
+            self.write_block(bytes(self.pending[:end]))
+            del self.pending[:end]
+
+        return len(data)
+
+    def write_block(self, gcode):
+        self.write_metadata()
+        self.file.write(encode_bgcode_block(encode_gcode_block(gcode, self.compression, self.encoding)))
+
+    def close(self):
+        if not self.closed:
+            try:
+                self.write_metadata()
+                if self.pending:
+                    self.write_block(bytes(self.pending))
+                    self.pending.clear()
+            finally:
+                self.file.close()
+        super().close()
+
+
+def find_bgcode_writer(file):
+    """Find the BgcodeWriter under a file opened for writing by open_gcode().
+
+    Parameters
+    ----------
+    file : A file object, in text or binary mode.
+
+    Returns
+    -------
+    bgcode_writer : The BgcodeWriter, None if the file is not a binary G-code file.
+    """
+
+    # Text files wrap a buffered file, which wraps a raw stream
+    for name in ("buffer", "raw"):
+        file = getattr(file, name, file)
+
+    return file if isinstance(file, BgcodeWriter) else None
+
+
+class ChunkStream(io.RawIOBase):
+    """A read-only binary stream reading an iterable of chunks, so that io.TextIOWrapper can decode it and split it in
+    lines. See iter_chunk_lines() in gcode_editor.py.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.chunk = memoryview(b"")
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        # Take the next non-empty chunk once the current one is read
+        while not self.chunk:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                return 0
+            self.chunk = memoryview(chunk.encode() if isinstance(chunk, str) else chunk).cast("B")
+
+        size = min(len(buffer), len(self.chunk))
+        buffer[:size] = self.chunk[:size]
+        self.chunk = self.chunk[size:]
+
+        return size
+
+    def close(self):
+        # Close a generator of chunks, and the file it reads
+        close = getattr(self.chunks, "close", None)
+        if close is not None:
+            close()
+        super().close()
@@ -1,8 +1,153 @@
+import functools
+import io
+import math
+import mmap
 import numpy as np
+import os
 import re
+import sys
+import time
+import zlib
+
+from collections import Counter, deque, namedtuple
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor
 
 from check import check_parameter
+from gcode_codecs import (BLOCK_PRINT_METADATA, COMPRESSION_DEFLATE, ChunkStream, default_output_path, gcode_codec,
+                          gcode_metadata_blocks, open_gcode)
+from layer_cache import (LAYER_CACHE_SIZE, evict_cached_layers, layer_cache_key, open_layer_cache, read_cached_layer,
+                         write_cached_layer)
+from layer_index import find_layer_index
+from print_estimate import EstimatingWriter
+
+# Available ways to edit G1 lines in gcode_editor()
+ENGINES = ("regex", "split", "numpy")
+
+# Ways to place the phases on the part in gcode_editor() : by layer number or by Z height
+PHASE_MAPPINGS = ("layer", "height")
+
+# Columns of the per-layer table built by compute_layer_table()
+LAYER_PHASE_NUM = 0
+LAYER_PHASE_PCT = 1
+LAYER_SPEED_MULT = 2
+LAYER_TEMPERATURE = 3
+LAYER_EXTRUDE_FACTOR = 4
+
+# A signed decimal number as written by slicers, for example "131.093", ".2" or "-.76"
+NUMBER_PATTERN = r"-?(?:\d+\.?\d*|\.\d+)"
+
+# A G1 instruction with its X, Y, Z, E and F words in the order used by PrusaSlicer. Each word is optional.
+G1_PATTERN = re.compile(r"G1(?:\s+X(?P<x>{0}))?(?:\s+Y(?P<y>{0}))?(?:\s+Z(?P<z>{0}))?(?:\s+E(?P<e>{0}))?"
+                        r"(?:\s+F(?P<f>{0}))?\s*\Z".format(NUMBER_PATTERN))
+
+# The G1 lines of a batch joined in a single text, with one match per line. A line that is not a standard G1 line (as
+# written by PrusaSlicer, with single spaces between words) only fills the last group.
+G1_BATCH_PATTERN = re.compile(r"^(?:G1(?: X({0}))?(?: Y({0}))?(?: Z({0}))?(?: E({0}))?(?: F({0}))? *|(.*))\n"
+                              .format(NUMBER_PATTERN), re.MULTILINE)
+
+# Format of a G1 line edited by rewrite_g1_batch() for each combination of present words. The index of a combination
+# has one bit per word, given by G1_WORD_BITS : 16 for X, 8 for Y, 4 for Z, 2 for E and 1 for F. Z is copied as text, F
+# is either copied as text or a float formatted like str().
+G1_WORD_BITS = np.array([16, 8, 4, 2, 1])
+G1_TEMPLATES = tuple("G1{}{}{}{}{}  ;Modified\n".format(" X%.3f" if code & 16 else "",
+                                                         " Y%.3f" if code & 8 else "", " Z%s" if code & 4 else "",
+                                                         " E%.3f" if code & 2 else "", " F%s" if code & 1 else "")
+                     for code in range(32))
+
+# Maximum number of G1 lines edited at once by the numpy engine inside a layer
+G1_BATCH_SIZE = 4096
+
+# Default amount of characters of whole layers kept in memory before writing them to the output file
+OUTPUT_BUFFER_SIZE = 1 << 20
+
+# Amount of bytes read at once when the layers out of the edited range are copied, see edit_layers_in_range()
+COPY_CHUNK_SIZE = 1 << 20
+
+# The byte ending each line of G-code, to count the lines of bytes, see StageTimer.count_lines()
+NEWLINE_BYTE = ord("\n")
+
+# Consecutive lines that edit_layer_range() may modify or uses for control. In zero-copy mode, only these lines are
+# decoded, the lines between them are copied to the output as they are, see iter_mapped_lines().
+EDITED_LINE_PATTERN = re.compile(rb"(?:^(?:;(?:LAYER_CHANGE|BEFORE_LAYER_CHANGE|TYPE:External perimeter|WIPE_START)|"
+                                 rb"G1|M104|M109).*\n?)+", re.MULTILINE)
+
+# A line which is not a comment, searched in the unchanged lines of zero-copy mode
+NON_COMMENT_PATTERN = re.compile(rb"^[^;]", re.MULTILINE)
+
+# Each line of a run of decoded lines with its newline, cut at "\n" only like the lines of a file opened in text mode
+# (str.splitlines() also cuts at "\x0c", "\x1c" or "\x85")
+RUN_LINE_PATTERN = re.compile(r"[^\n]*\n|[^\n]+\Z")
+
+# Amount of bytes read at the end of a text G-code file to find the statistics written by the slicer after the G-code,
+# see find_slicer_layer_count()
+FOOTER_SIZE = 1 << 18
+
+# The amount of layers written by the slicer, as a "; key = value" comment of a text G-code file or as a "key=value"
+# line of the print metadata of a binary G-code file
+LAYER_COUNT_PATTERN = re.compile(rb"^(?:; )?total layers count ?= ?(\d+)", re.MULTILINE)
+
+# In parallel mode, the layers are split in this amount of ranges per worker to balance the load
+RANGES_PER_WORKER = 4
+
+# Available ways to compute the parallel lines of the heating phase, see find_heating_path()
+HEATING_PATHS = ("box", "grid", "box-optimized", "grid-optimized")
+
+# Heating paths computed by set_grid_heating_path(), which need the external perimeters separated by PERIMETER_SEPARATOR
+GRID_HEATING_PATHS = ("grid", "grid-optimized")
+
+# Heating paths whose moves are reordered and merged by optimize_heating_moves() and written with HEATING_FEEDRATE
+OPTIMIZED_HEATING_PATHS = ("box-optimized", "grid-optimized")
+
+# Feedrate in mm/min of the moves of the optimized heating paths
+HEATING_FEEDRATE = 3000
+
+# The F word of a move (G0 to G3). F is modal : the feedrate of the last one before an optimized heating phase is set
+# again after its moves, see find_layer_feedrate().
+FEEDRATE_PATTERN = re.compile(r"^G[0-3](?!\d)[^;\n]*?F({0})".format(NUMBER_PATTERN), re.MULTILINE)
+FEEDRATE_BYTES_PATTERN = re.compile(FEEDRATE_PATTERN.pattern.encode(), re.MULTILINE)
+
+# A point closer than this distance in mm to the move joining its neighbours is dropped, see merge_collinear_moves()
+COLLINEAR_TOLERANCE = 0.001
+
+# Distance in mm between two parallel lines of the heating phase
+HEATING_LINE_SPACING = 0.4
+
+# Side in mm of the cells of the grid used by the "grid" heating path, see set_grid_heating_path()
+HEATING_CELL_SIZE = 2.0
+
+# Collected between two external perimeters by the "grid" heating path, so that they are not joined by a segment
+PERIMETER_SEPARATOR = [math.nan, math.nan]
+
+# Initial amount of points of a CoordinateBuffer
+COORD_BUFFER_SIZE = 1024
+
+# Everything gcode_editor() computes once per job and that is needed to edit the lines, see edit_layer_range().
+# feedrate is the text of the feedrate in effect before the first line (see find_modal_feedrates()), set again after
+# an optimized heating path when a layer has no move with an F word. None for a whole file.
+EditJob = namedtuple("EditJob", ["parameter_array", "layer_rows", "shift_x", "shift_y", "activate_heating",
+                                 "heating_path", "engine", "buffer_size", "zero_copy", "stats", "feedrate"])
+
+# Statistics collected during an edition when they are requested, see new_edit_stats(). counts and seconds are
+# collections.Counter giving, for each kind of line or each stage, the amount of lines and the time spent.
+EditStats = namedtuple("EditStats", ["counts", "seconds"])
+
+# The number at the start of a word value, text stuck after it (like ";_WIPE" in "F9600;_WIPE") is ignored
+VALUE_PATTERN = re.compile(NUMBER_PATTERN)
+
+# Parameter files compiled by compile_parameter_file() kept in memory
+PARAMETER_CACHE_SIZE = 64
 
+# A parameter file parsed and checked by load_parameter_file(). parameter_array is the list of arrays returned by
+# extract_values_from_file(), the other fields are taken from it once : the phases, the temperatures and the speeds as
+# arrays of (phase number, value), the extrusion correction in percent, the shift in mm, the heating flag and the
+# extrusion correction ratio of each phase (see evaluate_extrude_ratio()).
+ParameterSet = namedtuple("ParameterSet", ["parameter_array", "phases", "temperatures", "speeds", "extrude_correction",
+                                           "shift_x", "shift_y", "activate_heating", "extrude_ratio_array"])
+
+# X and Y words anywhere in a G-code line
+X_PATTERN = re.compile(r"X({0})".format(NUMBER_PATTERN))
+Y_PATTERN = re.compile(r"Y({0})".format(NUMBER_PATTERN))
 
 def extract_values_from_file(parameter_file_path):
     """This function extracts the parameters that were entered by the user in the parameter file
@@ -21,6 +166,27 @@ def extract_values_from_file(parameter_file_path):
     with open(parameter_file_path, 'r') as file:
         content = file.read()
 
+    try:
+        return parse_parameter_content(content)
+    except ValueError as e:
+        # Stop execution and indicates to the user the parameter is the wrong type
+        print(f"{e}. Stop execution")
+        exit()
+
+
+def parse_parameter_content(content):
+    """Extract the parameters from the content of a parameter file. Same as extract_values_from_file() but a value
+    which is not a float raises an error instead of stopping the execution.
+
+    Parameters
+    ----------
+    content : The text of the parameter file.
+
+    Returns
+    -------
+    extracted_data : Extracted parameters in a list of numpy arrays for each type of parameter.
+    """
+
     # Split the content for each type of parameter
     sections = content.split('------------------------------------------------------------------')
 
@@ -58,22 +224,13 @@ def extract_values_from_file(parameter_file_path):
                     # Extract the number of phases
                     phase_number = int(key.split(' ')[1])
 
-                    try:
-                        # Append phase number and value to the array
-                        values.append((phase_number, float(value)))
-                    except Exception as e:
-                        # Stop execution and indicates to the user the parameter is the wrong type
-                        print(f"{e} : Invalid input, cannot be converted into a float. Stop execution")
-                        exit()
+                    # Append phase number and value to the array
+                    values.append((phase_number, parse_parameter_value(value)))
 
                 # Global parameter used for the whole workpiece.
                 else:
                     # Append phase number and value to the array
-                    try:
-                        values.append(float(value))
-                    except Exception as e:
-                        print(f"{e} : Invalid input, cannot be converted into a float. Stop execution")
-                        exit()
+                    values.append(parse_parameter_value(value))
 
         # Append array to the list of arrays
         extracted_data.append(np.array(values))
@@ -81,9 +238,104 @@ def extract_values_from_file(parameter_file_path):
     return extracted_data
 
 
+def parse_parameter_value(value):
+    """Convert a value of a parameter file into a float.
+
+    Parameters
+    ----------
+    value : The text after the ":" of a parameter line.
+
+    Returns
+    -------
+    value : The value as a float. A ValueError tells the user the parameter is the wrong type.
+    """
+
+    try:
+        return float(value)
+    except ValueError as e:
+        raise ValueError(f"{e} : Invalid input, cannot be converted into a float") from e
+
+
+def load_parameter_file(parameter_file_path):
+    """Load a parameter file as a ParameterSet. The file is only parsed and checked again when its modification time or
+    its size changed, so that editing many G-code files with the same parameter file pays for it once.
+
+    Parameters
+    ----------
+    parameter_file_path : The relative path of the parameter file to load.
+
+    Returns
+    -------
+    parameter_set : A ParameterSet.
+    """
+
+    stat = os.stat(parameter_file_path)
+
+    return compile_parameter_file(os.path.abspath(parameter_file_path), stat.st_mtime_ns, stat.st_size)
+
+
+@functools.lru_cache(maxsize=PARAMETER_CACHE_SIZE)
+def compile_parameter_file(parameter_file_path, mtime_ns, size):
+    """Parse and check a parameter file, then compute everything that only depends on the parameters. Use
+    load_parameter_file(), the modification time and the size of the file are only part of the key of the cache.
+
+    Parameters
+    ----------
+    parameter_file_path : The absolute path of the parameter file.
+    mtime_ns : The modification time of the file in nanoseconds.
+    size : The size of the file in bytes.
+
+    Returns
+    -------
+    parameter_set : A ParameterSet, whose arrays are read-only.
+    """
+
+    with open(parameter_file_path, 'r') as file:
+        content = file.read()
+
+    parameter_array = parse_parameter_content(content)
+
+    # Check there are no nonsensical values in parameters (Example a negative speed)
+    if not check_parameter(parameter_array):
+        raise ValueError(f"Invalid parameters in {parameter_file_path}")
+
+    return new_parameter_set(parameter_array)
+
+
+def new_parameter_set(parameter_array):
+    """Compute everything that only depends on parameters already checked, for example generated parameters checked
+    with validate_parameter_sets().
+
+    Parameters
+    ----------
+    parameter_array : User parameters in the form of a list of numpy arrays, see extract_values_from_file().
+
+    Returns
+    -------
+    parameter_set : A ParameterSet, whose arrays are read-only.
+    """
+
+    # The arrays are shared by every user of the parameter set
+    for array in parameter_array:
+        array.flags.writeable = False
+    extrude_ratio_array = evaluate_extrude_ratio(parameter_array)
+    extrude_ratio_array.flags.writeable = False
+
+    return ParameterSet(parameter_array=tuple(parameter_array),
+                        phases=parameter_array[0],
+                        temperatures=parameter_array[1],
+                        speeds=parameter_array[2],
+                        extrude_correction=float(parameter_array[3]),
+                        shift_x=float(parameter_array[4][0]),
+                        shift_y=float(parameter_array[4][1]),
+                        activate_heating=bool(parameter_array[-1]),
+                        extrude_ratio_array=extrude_ratio_array)
+
+
 def find_layer_info(gcode_file_path):
     """Given a G-code file sliced with software like PrusaSlicer, this function will parse the G-code and return the
-    layer information.
+    layer information. A text file is scanned once, the next calls read the layer index saved next to it (see
+    find_layer_index()).
 
     Parameters
     ----------
@@ -96,12 +348,17 @@ def find_layer_info(gcode_file_path):
     layer_count   : Total amount of layers.
     """
 
+    # Take the information from the layer index
+    if gcode_codec(gcode_file_path) == "text":
+        index = find_layer_index(gcode_file_path)
+        return index.layer_height, index.layer_height * len(index.offsets), len(index.offsets)
+
     # Initialize variables
     layer_height = 0
     layer_count = 0
 
     # Open G-code and read each line individually
-    with open(gcode_file_path, "r") as file:
+    with open_gcode(gcode_file_path) as file:
         for line in file:
 
             # Extract layer height
@@ -118,6 +375,111 @@ def find_layer_info(gcode_file_path):
     return layer_height, total_height, layer_count
 
 
+def find_slicer_layer_count(gcode_file_path):
+    """Find the amount of layers written by the slicer, without reading the G-code : in the statistics at the end of a
+    text G-code file, read from the last FOOTER_SIZE bytes, or in the print metadata block of a binary G-code file.
+    PrusaSlicer writes it since version 2.6, it counts the ";LAYER_CHANGE" lines like find_layer_info().
+
+    Parameters
+    ----------
+    gcode_file_path : The relative path of the G code file to parse.
+
+    Returns
+    -------
+    layer_count : Total amount of layers, None if the slicer did not write it or if the file is compressed.
+    """
+
+    codec = gcode_codec(gcode_file_path)
+    if codec == "text":
+        # Seek to the end of the file
+        with open(gcode_file_path, "rb") as file:
+            file.seek(max(0, os.path.getsize(gcode_file_path) - FOOTER_SIZE))
+            footer = file.read()
+    elif codec == "bgcode":
+        # The print metadata block is written before the G-code
+        footer = b"".join(zlib.decompress(block.payload) if block.compression == COMPRESSION_DEFLATE else block.payload
+                          for block in gcode_metadata_blocks(gcode_file_path)
+                          if block.block_type == BLOCK_PRINT_METADATA)
+    else:
+        return None
+
+    matches = LAYER_COUNT_PATTERN.findall(footer)
+
+    return int(matches[-1]) if matches else None
+
+
+def find_layer_heights(gcode_file_path):
+    """Find the Z height of each layer of a G-code file, given by its ";Z:" comment or else by its first "G1 Z" line.
+    The heights of a text file are taken from its layer index (see find_layer_index()).
+
+    Parameters
+    ----------
+    gcode_file_path : The relative path of the G code file to parse.
+
+    Returns
+    -------
+    layer_heights : An array with the Z height of each layer, NaN for a layer without any.
+    """
+
+    if gcode_codec(gcode_file_path) == "text":
+        return find_layer_index(gcode_file_path).z_heights
+
+    with open_gcode(gcode_file_path) as file:
+        return find_layer_heights_in_lines(file)
+
+
+def find_layer_heights_in_lines(input_lines):
+    """Same as find_layer_heights() for any iterable of G-code lines.
+
+    Parameters
+    ----------
+    input_lines : An iterable of G-code lines, like a file opened in text mode.
+
+    Returns
+    -------
+    layer_heights : An array with the Z height of each layer, NaN for a layer without any.
+    """
+
+    # The heights of the ";Z:" comments and of the first moves along Z, by layer
+    comment_heights = []
+    move_heights = []
+
+    for line in input_lines:
+        if line.startswith(";LAYER_CHANGE"):
+            comment_heights.append(math.nan)
+            move_heights.append(math.nan)
+        elif not comment_heights:
+            continue
+        elif line.startswith(";Z:") and math.isnan(comment_heights[-1]):
+            comment_heights[-1] = float(line[3:])
+        elif line.startswith("G1 Z") and math.isnan(move_heights[-1]):
+            move_heights[-1] = float(line.split(";")[0].split()[1][1:])
+
+    comment_heights = np.array(comment_heights, dtype=np.float64)
+
+    return np.where(np.isnan(comment_heights), move_heights, comment_heights)
+
+
+def find_layer_offsets(gcode_file_path):
+    """Find the byte offset of each ";LAYER_CHANGE" line of a G-code file. They are taken from the layer index of the
+    file (see find_layer_index()), which is only built by scanning the file if it is missing or out of date.
+
+    Parameters
+    ----------
+    gcode_file_path : The relative path of the G code file to parse.
+
+    Returns
+    -------
+    layer_offsets : A list with the byte offset of each ";LAYER_CHANGE" line. Its length is the amount of layers.
+    external_flags : A list with, for each ";LAYER_CHANGE" line, True if coordinates of the external perimeter are
+    being collected at this line (a ";TYPE:External perimeter" line was met after the last ";WIPE_START" line).
+    """
+
+    index = find_layer_index(gcode_file_path)
+
+    return index.offsets.tolist(), index.external_flags.tolist()
+
+
 def find_phase(height_pct, parameter_array):
     """Given the user parameters and current height percentage vs total height, this function will determine in which
      phase we are and of far in the phase we are (in percent).
@@ -183,12 +545,176 @@ def evaluate_extrude_ratio(parameter_array):
     # Find the worst expansion (absolute value)
     worst_abs_expansion = np.max(np.abs(theory_expansion))
 
+    # The same expansion in every phase needs no correction, nor a division by zero
+    if worst_abs_expansion == 0:
+        return np.zeros_like(theory_expansion)
+
     # Compute new correction ratio for extrusion
     extrude_ratio_array = user_extrude_correction*(theory_expansion/worst_abs_expansion)
 
     return extrude_ratio_array
 
 
+def interpolate_phase_value(phase_values, phase_num, phase_pct):
+    """Compute the value of a parameter described by phase (temperature, speed) at our progress in the current phase.
+    The evolution is linear between the value of the previous phase and the value of the current phase.
+
+    Parameters
+    ----------
+    phase_values : An array of (phase number, value) for each phase, like parameter_array[1] or parameter_array[2].
+    phase_num : The number of the current phase. Must be greater than 0.
+    phase_pct : How far we are in the current phase.
+
+    Returns
+    -------
+    value : The interpolated value.
+    """
+
+    value_start = phase_values[phase_num - 1, 1]
+    value_end = phase_values[phase_num, 1]
+
+    return (value_end - value_start) * phase_pct + value_start
+
+
+def find_phases(height_pcts, parameter_array):
+    """Same as find_phase() for an array of height percentages at once. The phase of each height is found with
+    np.searchsorted() in the end percentages of the phases.
+
+    Parameters
+    ----------
+    height_pcts : An array of heights vs total part height in percent.
+    parameter_array : User parameters in the form of a list of numpy arrays.
+
+    Returns
+    -------
+    phase_nums : An array of the phase of each height, 0 for a height out of the phases.
+    phase_pcts : An array of how far each height is in its phase, 0 for a height out of the phases.
+    """
+
+    phase_ends = parameter_array[0][:, 1]
+    num_phases = len(phase_ends)
+
+    # Like find_phase(), a height at the end of a phase is in the next phase, and the last phase includes its end
+    phase_nums = np.searchsorted(phase_ends, height_pcts, side="right")
+    phase_nums[(phase_nums == num_phases) & (height_pcts == phase_ends[-1])] = num_phases - 1
+    in_phase = (phase_nums >= 1) & (phase_nums < num_phases)
+    phase_nums[~in_phase] = 0
+
+    # Progress in the phase, from its start to its end
+    phase_start = phase_ends[np.maximum(phase_nums - 1, 0)]
+    phase_end = phase_ends[phase_nums]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        phase_pcts = np.where(in_phase, (height_pcts - phase_start) / (phase_end - phase_start), 0)
+
+    return phase_nums, phase_pcts
+
+
+def layer_height_pcts(total_layers, layer_heights=None):
+    """Compute the height of each layer vs total part height in percent, for each row of the layer table.
+
+    Parameters
+    ----------
+    total_layers : Total amount of layers.
+    layer_heights : The Z height of each layer (see find_layer_heights()), None to take the layer number as the height.
+
+    Returns
+    -------
+    height_pcts : An array of total_layers + 1 percentages, from the layer before the first one (0) to the last layer.
+    """
+
+    if layer_heights is not None:
+        layer_heights = np.asarray(layer_heights, dtype=np.float64)
+        known = ~np.isnan(layer_heights)
+
+    # Same percentage of current height to total height as in the main loop, without any known height
+    if layer_heights is None or not total_layers or not known.any() or layer_heights[known].max() <= 0:
+        if not total_layers:
+            return np.zeros(total_layers + 1)
+        return (np.arange(total_layers + 1) / total_layers) * 100
+
+    # Layers without a known height are interpolated between their neighbours
+    layer_numbers = np.arange(total_layers)
+    layer_heights = np.interp(layer_numbers, layer_numbers[known], layer_heights[known])
+
+    # Heights in whole micrometres, the resolution of the G-code. With constant layer heights, each ratio is then the
+    # same fraction as the ratio of layer numbers and gives exactly the same percentage.
+    layer_heights = np.rint(layer_heights * 1000)
+
+    return np.concatenate(([0], (layer_heights / layer_heights.max()) * 100))
+
+
+def compute_layer_table(parameter_array, extrude_ratio_array, total_layers, layer_heights=None):
+    """Compute once per job everything that only depends on the layer number : the phase, the progress in the phase,
+    the speed multiplier, the target temperature and the extrusion factor. The main loop of gcode_editor() then only
+    has to look up the row of the current layer instead of calling find_phase() for each line.
+
+    Parameters
+    ----------
+    parameter_array : User parameters in the form of a list of numpy arrays.
+    extrude_ratio_array : An array of correction ratio for each phase to use to edit G-code.
+    total_layers : Total amount of layers.
+    layer_heights : The Z height of each layer, so that the phases follow the real height of the part. None to place
+    the phases by layer number.
+
+    Returns
+    -------
+    layer_table : An array with one row per layer number (from 0 to total_layers) and the columns LAYER_PHASE_NUM,
+    LAYER_PHASE_PCT, LAYER_SPEED_MULT, LAYER_TEMPERATURE and LAYER_EXTRUDE_FACTOR. Speed multiplier and extrusion
+    factor are in percent. In phase 0 the temperature is not defined (NaN).
+    """
+
+    layer_table = np.zeros((total_layers + 1, 5))
+
+    # Find the phase of each layer and how far we are in the phase
+    phase_nums, phase_pcts = find_phases(layer_height_pcts(total_layers, layer_heights), parameter_array)
+    layer_table[:, LAYER_PHASE_NUM] = phase_nums
+    layer_table[:, LAYER_PHASE_PCT] = phase_pcts
+
+    # Speed and temperature are only modified after phase 0, with the same interpolation as interpolate_phase_value()
+    modified = phase_nums > 0
+    previous_phases = np.maximum(phase_nums - 1, 0)
+    for column, phase_values, unmodified_value in ((LAYER_SPEED_MULT, parameter_array[2], 100),
+                                                   (LAYER_TEMPERATURE, parameter_array[1], np.nan)):
+        value_start = phase_values[previous_phases, 1]
+        value_end = phase_values[phase_nums, 1]
+        layer_table[:, column] = np.where(modified, (value_end - value_start) * phase_pcts + value_start,
+                                          unmodified_value)
+
+    # The extrusion is corrected in every phase
+    layer_table[:, LAYER_EXTRUDE_FACTOR] = 100 + extrude_ratio_array[phase_nums]
+
+    return layer_table
+
+
+def apply_speed_multiplier(modified_line_parts, speed_mult):
+    """Multiply the speed inside a G code line.
+
+    Parameters
+    ----------
+    modified_line_parts : A split G code string.
+    speed_mult : The speed multiplier in percent.
+
+    Returns
+    -------
+
+    """
+
+    # Iterate through each argument in the line
+    for i in range(len(modified_line_parts)):
+
+        # Check if it is a speed argument
+        if modified_line_parts[i].startswith("F"):
+
+            # Extract current speed
+            current_speed = float(VALUE_PATTERN.match(modified_line_parts[i], 1).group())
+
+            # Apply speed multiplier
+            new_speed = current_speed * speed_mult/100
+
+            # Apply new speed to line
+            modified_line_parts[i] = "F" + str(new_speed)
+
+
 def modify_speed(modified_line_parts, parameter_array, phase_num, phase_pct):
     """Modify speed inside a G code line according to user parameters.
 
@@ -207,26 +733,11 @@ def modify_speed(modified_line_parts, parameter_array, phase_num, phase_pct):
     # Check if we are not in phase 0
     if phase_num > 0:
 
-        # Iterate through each argument in the line
-        for i in range(len(modified_line_parts)):
-
-            # Check if it is a speed argument *********** Make it extract only nums instead of str ***************
-            if modified_line_parts[i].startswith("F"):
+        # Calculate speed multiplier
+        speed_mult = interpolate_phase_value(parameter_array[2], phase_num, phase_pct)
 
-                # Extract current speed
-                current_speed = re.findall(r'\d+', modified_line_parts[i])
-                current_speed = int(current_speed[0])
-
-                # Calculate speed multiplier
-                mult_start = parameter_array[2][phase_num-1, 1]
-                mult_end = parameter_array[2][phase_num, 1]
-                speed_mult = (mult_end-mult_start)*phase_pct + mult_start
-
-                # Apply speed multiplier
-                new_speed = current_speed * speed_mult/100
-
-                # Apply new speed to line
-                modified_line_parts[i] = "F" + str(new_speed)
+        # Apply speed multiplier
+        apply_speed_multiplier(modified_line_parts, speed_mult)
 
 
 def modify_temperature(modified_line_parts, parameter_array, phase_num, phase_pct):
@@ -248,9 +759,7 @@ def modify_temperature(modified_line_parts, parameter_array, phase_num, phase_pc
     if phase_num > 0:
 
         # Calculate new temp
-        temp_start = parameter_array[1][phase_num - 1, 1]
-        temp_end = parameter_array[1][phase_num, 1]
-        new_temp = (temp_end - temp_start) * phase_pct + temp_start
+        new_temp = interpolate_phase_value(parameter_array[1], phase_num, phase_pct)
 
         # Apply new temp to line
         if modified_line_parts[0].startswith("M104"):
@@ -259,16 +768,44 @@ def modify_temperature(modified_line_parts, parameter_array, phase_num, phase_pc
             re.sub(r'[R]\d+', f'R{new_temp}', modified_line_parts[1])
 
 
+def format_temperature_setup(new_temp):
+    """Format the G code instructions setting the nozzle temperature and waiting for it.
+
+    Parameters
+    ----------
+    new_temp : The temperature to set in degree Celsius.
+
+    Returns
+    -------
+    temperature_gcode : The G-code instructions as text.
+    """
+
+    return "M104 S{0:.3f}\nM109 R{0:.3f}\n".format(new_temp)
+
+
+def write_temperature_setup(output_file, new_temp):
+    """Write the G code instructions setting the nozzle temperature and waiting for it.
+
+    Parameters
+    ----------
+    output_file : The file in which to write G-code instructions.
+    new_temp : The temperature to set in degree Celsius.
+
+    Returns
+    -------
+
+    """
+
+    output_file.write(format_temperature_setup(new_temp))
+
+
 def add_temperature_setup(output_file, parameter_array, phase_num, phase_pct):
     # Check if we are not in phase 0
     if phase_num > 0:
 
         # Calculate new temp
-        temp_start = parameter_array[1][phase_num - 1, 1]
-        temp_end = parameter_array[1][phase_num, 1]
-        new_temp = (temp_end - temp_start) * phase_pct + temp_start
-        output_file.write("M104 S{:.3f}\n".format(new_temp))
-        output_file.write("M109 R{:.3f}\n".format(new_temp))
+        new_temp = interpolate_phase_value(parameter_array[1], phase_num, phase_pct)
+        write_temperature_setup(output_file, new_temp)
 
 
 def modify_extrusion_amounts(modified_line_parts, extrude_ratio_array, phase_num):
@@ -286,30 +823,46 @@ def modify_extrusion_amounts(modified_line_parts, extrude_ratio_array, phase_num
     """
 
     # Modify the extrusion amounts for each line to be modified (for gcode line with "G1 E")
-    for i in range(1, len(modified_line_parts)):
-        if modified_line_parts[i].startswith("E"):
-            extrusion_value = float(modified_line_parts[i][1:])
-            modified_line_parts[i] = "E" + "{:.3f}".format(extrusion_value * (100 + extrude_ratio_array[phase_num])/100)
+    apply_extrude_factor(modified_line_parts, 100 + extrude_ratio_array[phase_num])
 
 
-def shift_position(modified_line_parts, shift_x, shift_y):
-    """Shift the part position in the X and Y axes according to user parameters.
+def apply_extrude_factor(modified_line_parts, extrude_factor):
+    """Multiply the extrusion amounts inside a G code line.
 
     Parameters
     ----------
     modified_line_parts : A split G code string.
-    shift_x : The shift of the workpiece on X axis.
-    shift_y : The shift of the workpiece on Y axis.
+    extrude_factor : The extrusion factor in percent.
 
     Returns
     -------
 
     """
 
-    # Apply the shift by adding the shift value on X and Y line coordinates
-    for i in range(len(modified_line_parts)):
-        if modified_line_parts[i].startswith("X"):
-            x_value = float(modified_line_parts[i][1:])
+    for i in range(1, len(modified_line_parts)):
+        if modified_line_parts[i].startswith("E"):
+            extrusion_value = float(modified_line_parts[i][1:])
+            modified_line_parts[i] = "E" + "{:.3f}".format(extrusion_value * extrude_factor/100)
+
+
+def shift_position(modified_line_parts, shift_x, shift_y):
+    """Shift the part position in the X and Y axes according to user parameters.
+
+    Parameters
+    ----------
+    modified_line_parts : A split G code string.
+    shift_x : The shift of the workpiece on X axis.
+    shift_y : The shift of the workpiece on Y axis.
+
+    Returns
+    -------
+
+    """
+
+    # Apply the shift by adding the shift value on X and Y line coordinates
+    for i in range(len(modified_line_parts)):
+        if modified_line_parts[i].startswith("X"):
+            x_value = float(modified_line_parts[i][1:])
             modified_line_parts[i] = "X" + "{:.3f}".format(x_value + shift_x)
         elif modified_line_parts[i].startswith("Y"):
             y_value = float(modified_line_parts[i][1:])
@@ -330,18 +883,67 @@ def get_coordinate(line):
     """
 
     # Try to extract X and Y values from the line
-    x_coord = re.findall(r'[X]\d+', line)
-    y_coord = re.findall(r'[Y]\d+', line)
+    x_coord = X_PATTERN.search(line)
+    y_coord = Y_PATTERN.search(line)
 
     # If coordinates found convert into floats
     if x_coord and y_coord:
-        x_coord = float(x_coord[0][1:])
-        y_coord = float(y_coord[0][1:])
+        x_coord = float(x_coord.group(1))
+        y_coord = float(y_coord.group(1))
         return [x_coord, y_coord]
     else:
         return None
 
 
+class CoordinateBuffer:
+    """The X, Y coordinates of the external perimeter collected for the heating phase, in a float64 numpy array of
+    two columns. The array grows by doubling and is kept when the buffer is cleared, so that collecting the points of a
+    new layer allocates nothing once the densest layer has been seen.
+    """
+
+    __slots__ = ("array", "flat", "size")
+
+    def __init__(self, capacity=COORD_BUFFER_SIZE):
+        self.array = np.empty((capacity, 2))
+        self.flat = self.array.reshape(-1)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def reserve(self, size):
+        # Double the capacity until it holds size points
+        if size > len(self.array):
+            capacity = len(self.array)
+            while capacity < size:
+                capacity *= 2
+            array = np.empty((capacity, 2))
+            array[:self.size] = self.array[:self.size]
+            self.array = array
+            self.flat = array.reshape(-1)
+
+    def append(self, x, y):
+        if self.size == len(self.array):
+            self.reserve(self.size + 1)
+        self.flat[2 * self.size] = x
+        self.flat[2 * self.size + 1] = y
+        self.size += 1
+
+    def extend(self, coords):
+        # coords is an array of [x, y] rows or a list of [x, y]
+        if len(coords):
+            self.reserve(self.size + len(coords))
+            self.array[self.size:self.size + len(coords)] = coords
+            self.size += len(coords)
+
+    def clear(self):
+        self.size = 0
+
+    def view(self):
+        # The collected points, without copy. The view is only valid until the buffer changes.
+        return self.array[:self.size]
+
+
 def set_heating_path(coord_array):
     """Compute coordinates of points/ends of the parallel lines for the heating phase.
 
@@ -355,26 +957,262 @@ def set_heating_path(coord_array):
     lower_coord : An array which contains lower coordinates of parallel line.
     """
 
+    x_min, x_max, y_min, y_max = find_heating_box(coord_array)
+
+    # We create a "grid" of points that will be used to define the parallel lines that the nozzle must
+    # follow for the heating phase.
+    nb_parallel_line = round((y_max - y_min)/HEATING_LINE_SPACING)
+    upper_coord = np.linspace((x_max, y_min), (x_max, y_max), nb_parallel_line)
+    lower_coord = np.linspace((x_min, y_min), (x_min, y_max), nb_parallel_line)
+
+    return upper_coord.round(decimals=3), lower_coord.round(decimals=3)
+
+
+def find_heating_box(coord_array):
+    """Compute the rectangle covered by the heating phase : the bounding box of the external perimeter extended by 5%.
+
+    Parameters
+    ----------
+    coord_array : A numpy array which contains X, Y coordinates of all instructions related to the external perimeter.
+    Rows of NaN (PERIMETER_SEPARATOR) are ignored.
+
+    Returns
+    -------
+    x_min, x_max, y_min, y_max : The limits of the rectangle.
+    """
+
     # Find extremum values for coordinates, these extremums are used to describe a perimeter that covers the layer.
-    x_max, y_max = np.max(coord_array, axis=0)
-    x_min, y_min = np.min(coord_array, axis=0)
+    x_max, y_max = np.nanmax(coord_array, axis=0)
+    x_min, y_min = np.nanmin(coord_array, axis=0)
 
     # We extend this perimeter by 5%
     x_offset = 5*(x_max - x_min)/100
     y_offset = 5*(y_max - y_min)/100
 
-    x_max, x_min = x_max+x_offset, x_min-x_offset
-    y_max, y_min = y_max+y_offset, y_min-y_offset
+    return x_min - x_offset, x_max + x_offset, y_min - y_offset, y_max + y_offset
 
-    # We create a "grid" of points that will be used to define the parallel lines that the nozzle must
-    # follow for the heating phase.
-    nb_parallel_line = round((y_max - y_min)/0.4)
-    upper_coord = np.linspace((x_max, y_min), (x_max, y_max), nb_parallel_line)
-    lower_coord = np.linspace((x_min, y_min), (x_min, y_max), nb_parallel_line)
+
+def set_grid_heating_path(coord_array, cell_size=HEATING_CELL_SIZE):
+    """Compute the parallel lines of the heating phase over the part only, instead of its whole bounding box. The
+    bounding box of set_heating_path() is divided in square cells. The cells crossed by the external perimeter and the
+    cells it encloses are occupied. Each parallel line of set_heating_path() is cut to the runs of occupied cells of
+    its row. The lines of each group of connected cells are swept in a zigzag, and the groups are taken one after the
+    other, the nearest first, so that the nozzle does not go back and forth between distant objects.
+
+    Parameters
+    ----------
+    coord_array : A numpy array which contains X, Y coordinates of all instructions related to the external perimeter.
+    A row of NaN (PERIMETER_SEPARATOR) separates two perimeters.
+    cell_size : Side of the cells in mm.
+
+    Returns
+    -------
+    upper_coord : An array which contains upper coordinates of parallel line.
+    lower_coord : An array which contains lower coordinates of parallel line.
+    """
+
+    finite = np.isfinite(coord_array).all(axis=1) if coord_array.size else np.zeros(0, dtype=bool)
+    if not finite.any():
+        return np.empty((0, 2)), np.empty((0, 2))
+
+    # The parallel lines of set_heating_path()
+    x_min, x_max, y_min, y_max = find_heating_box(coord_array)
+    nb_parallel_line = round((y_max - y_min)/HEATING_LINE_SPACING)
+    line_y = np.linspace(y_min, y_max, nb_parallel_line)
+
+    # Grid covering the box
+    nb_columns = max(1, math.ceil((x_max - x_min)/cell_size))
+    nb_rows = max(1, math.ceil((y_max - y_min)/cell_size))
+    occupied = np.zeros((nb_rows, nb_columns), dtype=bool)
+
+    # Segments of the perimeters, a segment touching a separator is not a segment
+    valid = finite[:-1] & finite[1:]
+    starts, vectors = coord_array[:-1][valid], np.diff(coord_array, axis=0)[valid]
+
+    # Each perimeter is a loop, but the travel to its start comes before its ";TYPE:External perimeter" line : close it
+    perimeter_points = coord_array[finite]
+    perimeter_firsts = np.flatnonzero(np.diff(np.cumsum(~finite)[finite], prepend=-1))
+    perimeter_lasts = np.append(perimeter_firsts[1:] - 1, len(perimeter_points) - 1)
+    starts = np.concatenate((starts, perimeter_points[perimeter_lasts]))
+    vectors = np.concatenate((vectors, perimeter_points[perimeter_firsts] - perimeter_points[perimeter_lasts]))
+
+    # Sample the segments every half cell
+    nb_samples = np.ceil(np.hypot(vectors[:, 0], vectors[:, 1])/(cell_size/2)).astype(int) + 1
+    segment_index = np.repeat(np.arange(len(starts)), nb_samples)
+    sample_rank = np.arange(len(segment_index)) - np.repeat(np.cumsum(nb_samples) - nb_samples, nb_samples)
+    fractions = sample_rank/np.repeat(np.maximum(nb_samples - 1, 1), nb_samples)
+    points = np.concatenate((starts[segment_index] + vectors[segment_index]*fractions[:, None], perimeter_points))
+
+    # Mark the cells of the perimeter
+    columns = np.clip(((points[:, 0] - x_min)/cell_size).astype(int), 0, nb_columns - 1)
+    rows = np.clip(((points[:, 1] - y_min)/cell_size).astype(int), 0, nb_rows - 1)
+    occupied[rows, columns] = True
+
+    # Mark the cells enclosed by the perimeter : cells with occupied cells on their left, right, bottom and top
+    occupied |= (np.maximum.accumulate(occupied, axis=1) & np.maximum.accumulate(occupied[:, ::-1], axis=1)[:, ::-1] &
+                 np.maximum.accumulate(occupied, axis=0) & np.maximum.accumulate(occupied[::-1], axis=0)[::-1])
+
+    # Runs of occupied cells in each row, from run_starts to run_ends (excluded), in row order
+    padded = np.zeros((nb_rows, nb_columns + 2), dtype=np.int8)
+    padded[:, 1:-1] = occupied
+    changes = np.diff(padded, axis=1)
+    run_rows, run_starts = np.nonzero(changes == 1)
+    run_ends = np.nonzero(changes == -1)[1]
+    run_groups = np.array(group_cell_runs(run_rows.tolist(), run_starts.tolist(), run_ends.tolist()))
+
+    # Cut each parallel line to the runs of its row
+    line_rows = np.minimum(((line_y - y_min)/cell_size).astype(int), nb_rows - 1)
+    first_runs = np.searchsorted(run_rows, line_rows, "left")
+    nb_runs = np.searchsorted(run_rows, line_rows, "right") - first_runs
+    cut_line = np.repeat(np.arange(len(line_y)), nb_runs)
+    cut_run = (np.arange(len(cut_line)) - np.repeat(np.cumsum(nb_runs) - nb_runs, nb_runs) +
+               np.repeat(first_runs, nb_runs))
+    cut_x0 = x_min + run_starts[cut_run]*cell_size
+    cut_x1 = np.minimum(x_min + run_ends[cut_run]*cell_size, x_max)
+    cut_group = run_groups[cut_run] if len(cut_run) else cut_run
+
+    # The corners from which each group of cells can be swept : the ends of its first and last lines
+    group_corners = {}
+    for group in set(cut_group.tolist()):
+        in_group = cut_group == group
+        corners = []
+        for from_top, line in ((False, cut_line[in_group].min()), (True, cut_line[in_group].max())):
+            on_line = in_group & (cut_line == line)
+            corners.append((cut_x0[on_line].min(), line_y[line], from_top, False))
+            corners.append((cut_x1[on_line].max(), line_y[line], from_top, True))
+        group_corners[group] = corners
+
+    # Sweep the groups of cells, starting each one from its corner nearest from the nozzle
+    position = perimeter_points[-1].tolist()
+    start_coords, end_coords = [], []
+    while group_corners:
+        _, group, from_top, from_right = min((math.dist(position, (x, y)), group, from_top, from_right)
+                                             for group, corners in group_corners.items()
+                                             for x, y, from_top, from_right in corners)
+        del group_corners[group]
+        in_group = cut_group == group
+        group_start, group_end = sweep_cut_lines(line_y, cut_line[in_group], cut_x0[in_group], cut_x1[in_group],
+                                                 from_top, from_right)
+        start_coords.append(group_start)
+        end_coords.append(group_end)
+        position = group_end[-1].tolist()
+
+    start_coord = np.concatenate(start_coords) if start_coords else np.empty((0, 2))
+    end_coord = np.concatenate(end_coords) if end_coords else np.empty((0, 2))
+
+    # format_heating_gcode() goes from upper to lower on even lines and from lower to upper on odd lines
+    even = (np.arange(len(start_coord)) % 2 == 0)[:, None]
+    upper_coord = np.where(even, start_coord, end_coord)
+    lower_coord = np.where(even, end_coord, start_coord)
 
     return upper_coord.round(decimals=3), lower_coord.round(decimals=3)
 
 
+def group_cell_runs(run_rows, run_starts, run_ends):
+    """Group runs of occupied cells which touch each other, from one row to the next, see set_grid_heating_path().
+
+    Parameters
+    ----------
+    run_rows : The row of each run, in increasing order.
+    run_starts : The first column of each run.
+    run_ends : The column after the last column of each run.
+
+    Returns
+    -------
+    run_groups : The group of each run, as the index of one of its runs.
+    """
+
+    # Union-find : each run points to a run of its group, up to the run representing the group
+    parent = list(range(len(run_rows)))
+    previous_runs, current_runs = [], []
+
+    for i, row in enumerate(run_rows):
+        if i == 0 or row != run_rows[i - 1]:
+            previous_runs = current_runs if i > 0 and row == run_rows[i - 1] + 1 else []
+            current_runs = []
+
+        # Join the runs of the previous row which overlap this run
+        for j in previous_runs:
+            if run_starts[j] < run_ends[i] and run_starts[i] < run_ends[j]:
+                parent[find_run_group(parent, i)] = find_run_group(parent, j)
+
+        current_runs.append(i)
+
+    return [find_run_group(parent, i) for i in range(len(run_rows))]
+
+
+def find_run_group(parent, i):
+    """Find the run representing the group of a run, see group_cell_runs().
+
+    Parameters
+    ----------
+    parent : The run each run points to.
+    i : The index of the run.
+
+    Returns
+    -------
+    group : The index of the run representing the group.
+    """
+
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+
+    return i
+
+
+def sweep_cut_lines(line_y, cut_line, cut_x0, cut_x1, from_top, from_right):
+    """Order the parallel lines of a group of cells in a zigzag, starting from one of its corners.
+
+    Parameters
+    ----------
+    line_y : The Y coordinate of each parallel line.
+    cut_line : The parallel line of each cut line of the group.
+    cut_x0 : The left X coordinate of each cut line.
+    cut_x1 : The right X coordinate of each cut line.
+    from_top : True to start from the last parallel line.
+    from_right : True to start the first line on its right end.
+
+    Returns
+    -------
+    start_coord : The [x, y] start of each cut line, in the order they are swept.
+    end_coord : The [x, y] end of each cut line, in the order they are swept.
+    """
+
+    # Rank of the parallel line from the start, its parity gives the direction of the line
+    rank = (cut_line.max() - cut_line) if from_top else (cut_line - cut_line.min())
+    direction = np.where((rank % 2 == 0) != from_right, 1.0, -1.0)
+
+    order = np.lexsort((cut_x0*direction, rank))
+    y, x0, x1, direction = line_y[cut_line[order]], cut_x0[order], cut_x1[order], direction[order]
+
+    start_coord = np.column_stack((np.where(direction > 0, x0, x1), y))
+    end_coord = np.column_stack((np.where(direction > 0, x1, x0), y))
+
+    return start_coord, end_coord
+
+
+def find_heating_path(data_coord, heating_path="box"):
+    """Compute the parallel lines of the heating phase of a layer.
+
+    Parameters
+    ----------
+    data_coord : An array of [x, y] coordinates of the external perimeter of the layer.
+    heating_path : How the lines are computed, one of HEATING_PATHS. "box" sweeps the whole bounding box of the
+    perimeter (set_heating_path()), "grid" only sweeps the cells covered by the part (set_grid_heating_path()).
+
+    Returns
+    -------
+    upper_coord : An array which contains upper coordinates of parallel line.
+    lower_coord : An array which contains lower coordinates of parallel line.
+    """
+
+    if heating_path in GRID_HEATING_PATHS:
+        return set_grid_heating_path(np.asarray(data_coord, dtype=float))
+
+    return set_heating_path(np.asarray(data_coord))
+
+
 def edit_heating_gcode(output_file, upper_coord, lower_coord):
     """Write G code associate to heating phase. It generates code which moves the die along parallel lines without
     extrusion in order to heat up the last printed layer.
@@ -390,178 +1228,1641 @@ def edit_heating_gcode(output_file, upper_coord, lower_coord):
 
     """
 
+    output_file.write(format_heating_gcode(upper_coord, lower_coord))
+
+
+def format_heating_gcode(upper_coord, lower_coord):
+    """Format the G code associated to the heating phase in a single text, see edit_heating_gcode().
+
+    Parameters
+    ----------
+    upper_coord : An array which contains upper coordinates of parallel line.
+    lower_coord : An array which contains lower coordinates of parallel line.
+
+    Returns
+    -------
+    heating_gcode : The G-code instructions of the heating phase as text.
+    """
+
+    # Convert coordinates to floats once instead of formatting numpy scalars one at a time
+    upper_coord = upper_coord.tolist()
+    lower_coord = lower_coord.tolist()
+
     # A comment to indicate the start of the heating phase
-    output_file.write(";HEATING_PHASE\n")
+    heating_lines = [";HEATING_PHASE\n"]
 
     # Parallels lines are on X axis
     for i in range(len(upper_coord)):
         if i % 2 == 0:
-            output_file.write(f"G0 X{upper_coord[i][0]} Y{upper_coord[i][1]}\n")  # Linear move of the die
             # Go from upper to lower
-            output_file.write(f"G0 X{lower_coord[i][0]} Y{lower_coord[i][1]}\n")  # Linear move of the die
+            heating_lines.append("G0 X{0[0]} Y{0[1]}\nG0 X{1[0]} Y{1[1]}\n".format(upper_coord[i], lower_coord[i]))
         else:
-            output_file.write(f"G0 X{lower_coord[i][0]} Y{lower_coord[i][1]}\n")  # Linear move of the die
             # Go from lower to upper
-            output_file.write(f"G0 X{upper_coord[i][0]} Y{upper_coord[i][1]}\n")  # Linear move of the die
+            heating_lines.append("G0 X{0[0]} Y{0[1]}\nG0 X{1[0]} Y{1[1]}\n".format(lower_coord[i], upper_coord[i]))
 
     # A comment to indicate the end of the heating phase
-    output_file.write(";END_HEATING_PHASE\n")
+    heating_lines.append(";END_HEATING_PHASE\n")
 
+    return "".join(heating_lines)
 
-def tag_modified_line(line):
-    """This function will add a suffix comment to a G-code line.
+
+def format_heating_phase(data_coord, heating_path="box", feedrate=None):
+    """Compute the heating path of a layer and format its G-code. The optimized heating paths go through
+    optimize_heating_moves() and format_heating_moves(), the others through format_heating_gcode().
 
     Parameters
     ----------
-    line : A line of G-code to modify.
+    data_coord : An array of [x, y] coordinates of the external perimeter of the layer.
+    heating_path : How the heating path is computed, one of HEATING_PATHS.
+    feedrate : The text of the feedrate in effect at the end of the edited layer (see find_layer_feedrate()), set again
+    after the moves of an optimized heating path. None if no move before sets one.
 
     Returns
     -------
+    heating_gcode : The G-code instructions of the heating phase as text.
+    """
+
+    upper, lower = find_heating_path(data_coord, heating_path)
+    if heating_path not in OPTIMIZED_HEATING_PATHS:
+        return format_heating_gcode(upper, lower)
+
+    # The nozzle stands at the end of the last external perimeter
+    data_coord = np.asarray(data_coord, dtype=float).reshape(-1, 2)
+    finite = np.flatnonzero(np.isfinite(data_coord).all(axis=1))
+    position = data_coord[finite[-1]] if len(finite) else None
+
+    return format_heating_moves(optimize_heating_moves(upper, lower, position), HEATING_FEEDRATE, feedrate)
+
+
+def optimize_heating_moves(upper_coord, lower_coord, position=None):
+    """Chain the parallel lines of the heating phase in the zigzag which travels the least from the nozzle position,
+    then merge the collinear moves. The zigzag of format_heating_gcode() can be swept from its first or its last line,
+    and each line can start on its upper or its lower end : the start corner and the sweep direction are those
+    minimizing the travel to the first point plus the moves between the lines.
+
+    Parameters
+    ----------
+    upper_coord : An array which contains upper coordinates of parallel line.
+    lower_coord : An array which contains lower coordinates of parallel line.
+    position : The [x, y] position of the nozzle before the heating phase, or None if it is unknown.
 
+    Returns
+    -------
+    points : An array of the [x, y] points the nozzle goes through, in order.
     """
 
-    # Add suffix
-    line.append(" ;Modified\n")
+    upper_coord = np.asarray(upper_coord, dtype=float).reshape(-1, 2)
+    lower_coord = np.asarray(lower_coord, dtype=float).reshape(-1, 2)
 
+    # The zigzag of format_heating_gcode() goes from upper to lower on even lines, the mirrored one from lower to upper
+    even = (np.arange(len(upper_coord)) % 2 == 0)[:, None]
+    zigzag = np.stack((np.where(even, upper_coord, lower_coord), np.where(even, lower_coord, upper_coord)), axis=1)
+    mirrored = zigzag[:, ::-1]
+    candidates = [zigzag.reshape(-1, 2), mirrored.reshape(-1, 2)]
+    candidates += [points[::-1] for points in candidates]
 
-def gcode_editor(gcode_file_path, parameter_file_path):
-    """This function will call all other functions from this file to modify the G-code according to the input parameter
-    file. The function will save the modified G-code in a new file with prefix "modified_" followed by the original
-    file name.
+    # Travel of each candidate : to its first point, then from the end of each line to the start of the next one
+    best_points, best_travel = candidates[0], math.inf
+    for points in candidates:
+        if not len(points):
+            break
+        travel = np.hypot(*(points[2::2] - points[1:-1:2]).T).sum()
+        if position is not None:
+            travel += math.dist(position, points[0])
+        if travel < best_travel:
+            best_points, best_travel = points, travel
+
+    return merge_collinear_moves(best_points)
+
+
+def merge_collinear_moves(points):
+    """Remove the moves of zero length and the points lying on the move between their neighbours, when the nozzle
+    goes on in the same direction, so that successive collinear moves become a single move.
+
+    Parameters
+    ----------
+    points : An array of the [x, y] points the nozzle goes through, in order.
+
+    Returns
+    -------
+    points : The points which are kept, in order.
+    """
+
+    # Remove the points equal to the previous one
+    if len(points) > 1:
+        points = points[np.concatenate(([True], (np.diff(points, axis=0) != 0).any(axis=1)))]
+    if len(points) < 3:
+        return points
+
+    # Distance from each inner point to the move joining its neighbours, and direction of the nozzle at this point
+    before = points[1:-1] - points[:-2]
+    after = points[2:] - points[1:-1]
+    cross = before[:, 0]*after[:, 1] - before[:, 1]*after[:, 0]
+    chord = np.hypot(*(points[2:] - points[:-2]).T)
+    on_line = (np.abs(cross) <= COLLINEAR_TOLERANCE*chord) & ((before*after).sum(axis=1) > 0)
+
+    return points[np.concatenate(([True], ~on_line, [True]))]
+
+
+def format_heating_moves(points, feedrate=HEATING_FEEDRATE, restored_feedrate=None):
+    """Format the G code of a heating phase given as a sequence of points, see optimize_heating_moves(). The feedrate
+    is set on the first move. As F is modal, the feedrate of the slicer is set again after the last move, so that its
+    next moves without an F word keep their speed. It is not known when no move of the file set one before.
 
     Parameters
+    ----------
+    points : An array of the [x, y] points the nozzle goes through, in order.
+    feedrate : The feedrate of the moves in mm/min.
+    restored_feedrate : The text of the feedrate in effect before the heating phase, None if it is not known.
+
+    Returns
+    -------
+    heating_gcode : The G-code instructions of the heating phase as text.
+    """
+
+    points = points.tolist()
+
+    # A comment to indicate the start of the heating phase
+    heating_lines = [";HEATING_PHASE\n"]
+
+    heating_lines.extend("G0 X{0[0]} Y{0[1]}\n".format(point) for point in points)
+    if points:
+        heating_lines[1] = "G0 X{0[0]} Y{0[1]} F{1}\n".format(points[0], feedrate)
+        if restored_feedrate is not None:
+            heating_lines.append("G1 F{0}\n".format(restored_feedrate))
+
+    # A comment to indicate the end of the heating phase
+    heating_lines.append(";END_HEATING_PHASE\n")
+
+    return "".join(heating_lines)
+
+
+def find_layer_feedrate(layer_gcode, feedrate=None):
+    """Find the feedrate in effect at the end of an edited layer, given by the last move with an F word from its
+    ";LAYER_CHANGE" line. Only the layer itself is searched, the feedrate carried from the layers before it is given.
+
+    Parameters
+    ----------
+    layer_gcode : The edited G-code up to the end of the layer, as a list of texts, bytes or memoryviews (lines or
+    spans of lines) in order. The search stops at the last ";LAYER_CHANGE" line.
+    feedrate : The text of the feedrate in effect before the layer, None if it is not known.
+
+    Returns
+    -------
+    feedrate : The text of the F value, the given feedrate if the layer has no move with an F word.
+    """
+
+    for part in reversed(layer_gcode):
+        if type(part) is str:
+            pattern, layer_change = FEEDRATE_PATTERN, ";LAYER_CHANGE"
+        else:
+            part = bytes(part) if type(part) is memoryview else part
+            pattern, layer_change = FEEDRATE_BYTES_PATTERN, b";LAYER_CHANGE"
+
+        # Only the part of the layer, from its ";LAYER_CHANGE" line
+        layer_start = part.rfind(layer_change)
+        match = None
+        for match in pattern.finditer(part, max(layer_start, 0)):
+            pass
+
+        if match:
+            layer_feedrate = match.group(1)
+            return layer_feedrate if type(layer_feedrate) is str else layer_feedrate.decode()
+        if layer_start >= 0:
+            return feedrate
+
+    return feedrate
+
+
+def find_modal_feedrates(gcode_file_path, layer_offsets, edit_job):
+    """Find the feedrate in effect at each ";LAYER_CHANGE" line of the edited G-code, given by the last move with an F
+    word before it. The moves are searched backwards in the input file, one layer at a time, and the one found is
+    edited with the row of its layer. The modes which edit ranges of layers apart set the same feedrate again after
+    an optimized heating path as iter_edited_range() on the whole file.
+
+    Parameters
+    ----------
     gcode_file_path : The relative path of the G code file to edit.
-    parameter_file_path : The relative path of the parameters file to use for the edition.
+    layer_offsets : The byte offset of each ";LAYER_CHANGE" line, see find_layer_offsets().
+    edit_job : An EditJob for the whole file.
 
     Returns
     -------
+    feedrates : A list with the text of the feedrate at each ";LAYER_CHANGE" line, then at the end of the file. None
+    before the first move with an F word, and everywhere if the heating path is not optimized.
+    """
+
+    feedrates = [None] * (len(layer_offsets) + 1)
+    if not edit_job.activate_heating or edit_job.heating_path not in OPTIMIZED_HEATING_PATHS:
+        return feedrates
+
+    with open(gcode_file_path, "rb") as file:
+        # An empty file cannot be memory-mapped
+        if not os.fstat(file.fileno()).st_size:
+            return feedrates
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            feedrate = None
+
+            # The lines after the i-th ";LAYER_CHANGE" line use the row i of the layer table
+            for i, (start, end) in enumerate(zip([0] + layer_offsets, layer_offsets + [len(data)])):
+                end = data.rfind(b"F", start, end)
+                while end >= 0:
+                    line_start = data.rfind(b"\n", 0, end) + 1
+                    line_end = data.find(b"\n", end)
+                    line = data[line_start:len(data) if line_end < 0 else line_end + 1]
+                    if FEEDRATE_BYTES_PATTERN.match(line):
+                        feedrate = FEEDRATE_PATTERN.match(edit_feedrate_line(line.decode(), edit_job.layer_rows[i],
+                                                                             edit_job.shift_x,
+                                                                             edit_job.shift_y)).group(1)
+                        break
+                    end = data.rfind(b"F", start, line_start)
+                feedrates[i] = feedrate
+
+    return feedrates
+
+
+def edit_feedrate_line(line, layer_entry, shift_x, shift_y):
+    """Edit a move with an F word like iter_edited_range(). Only the G1 lines are edited, the other moves are copied.
 
+    Parameters
+    ----------
+    line : The line of the move.
+    layer_entry : The row of the layer table of the line, see compute_layer_table().
+    shift_x : The shift of the workpiece on X axis.
+    shift_y : The shift of the workpiece on Y axis.
+
+    Returns
+    -------
+    modified_line : The edited line.
     """
 
-    # Extract data from the parameter text file to a list of numpy arrays
-    parameter_array = extract_values_from_file(parameter_file_path)
+    if not line.startswith("G1"):
+        return line
 
-    # Check there are no nonsensical values in parameters (Example a negative speed)
-    if check_parameter(parameter_array):
+    return rewrite_g1_line(line, layer_entry, shift_x, shift_y) or edit_g1_line(line, layer_entry, shift_x, shift_y)
 
-        # Get parameter related to the heating phase
-        activate_heating = parameter_array[-1]
 
-        # Get parameter related to shift position
-        shift_x = parameter_array[4][0]
-        shift_y = parameter_array[4][1]
+def tag_modified_line(line):
+    """This function will add a suffix comment to a G-code line.
 
-        # Get extrude ratio array
-        extrude_ratio_array = evaluate_extrude_ratio(parameter_array)
+    Parameters
+    ----------
+    line : A line of G-code to modify.
 
-        # Find the layer height info
-        layer_info = find_layer_info(gcode_file_path)
-        layer_height = layer_info[0]    # Unused
-        total_height = layer_info[1]    # Unused
-        total_layers = layer_info[2]
+    Returns
+    -------
+
+    """
+
+    # Add suffix
+    line.append(" ;Modified\n")
+
+
+def edit_g1_line(line, layer_entry, shift_x, shift_y):
+    """Apply the speed, extrusion and shift modifications to a G1 line by splitting it in words and calling each
+    modification function in turn. This works for any G1 line, whatever the order of its words.
+
+    Parameters
+    ----------
+    line : A G1 line of G-code.
+    layer_entry : The row of the layer table (see compute_layer_table()) for the current layer.
+    shift_x : The shift of the workpiece on X axis.
+    shift_y : The shift of the workpiece on Y axis.
+
+    Returns
+    -------
+    modified_line : The modified line, tagged as modified.
+    """
 
-        # Initialize output file
-        output_file_path = re.sub("input/", "output/modified-", gcode_file_path)
+    # Convert line to a list
+    modified_line_parts = line.split()
 
-        # Read file
-        with open(gcode_file_path, "r") as input_file, open(output_file_path, "w") as output_file:
+    # Tag line modified by our gcode editor
+    tag_modified_line(modified_line_parts)
 
-            # Initialize counters and variables
-            layer_counter = 0
-            height_pct = 0
-            external_coord = False
-            data_coord = []
+    # Apply speed modifications
+    if layer_entry[LAYER_PHASE_NUM] > 0:
+        apply_speed_multiplier(modified_line_parts, layer_entry[LAYER_SPEED_MULT])
 
-            # Process each line individually
-            for line in input_file:
+    # Apply extrusion amounts modification
+    apply_extrude_factor(modified_line_parts, layer_entry[LAYER_EXTRUDE_FACTOR])
 
-                modified_line = line  # Unchanged line are also rewrite
+    # Apply shift position modification
+    shift_position(modified_line_parts, shift_x, shift_y)
 
-                # A comment. We used some of them for control.
-                if line[0] == ";":
+    # Reformat line to text
+    return " ".join(modified_line_parts)
 
-                    if line.startswith(";LAYER_CHANGE"):
-                        # Heat current layer before start the next
-                        if layer_counter > 0 and activate_heating:
-                            upper, lower = set_heating_path(np.array(data_coord))
-                            edit_heating_gcode(output_file, upper, lower)
-                            data_coord = []  # Now we are sure a new layer starts, thus we reset data_coord
 
-                        # Update layer counter
-                        layer_counter += 1
+def edit_g1_line_timed(line, layer_entry, shift_x, shift_y, stats):
+    """Same as edit_g1_line(), but the time spent in each modification function is added to the statistics.
 
-                        # Update the percentage of current height to total height
-                        height_pct = (layer_counter / total_layers) * 100
+    Parameters
+    ----------
+    line : A G1 line of G-code.
+    layer_entry : The row of the layer table (see compute_layer_table()) for the current layer.
+    shift_x : The shift of the workpiece on X axis.
+    shift_y : The shift of the workpiece on Y axis.
+    stats : An EditStats.
 
-                    elif line.startswith(";BEFORE_LAYER_CHANGE"):
-                        # Add a G-code instruction to set temperature. These instructions are not always existent for
-                        # each layer
-                        add_temperature_setup(output_file, parameter_array, phase_num, phase_pct)
+    Returns
+    -------
+    modified_line : The modified line, tagged as modified.
+    """
 
-                    # Detect external perimeter and enable to get coordinates for future heating phase
-                    elif line.startswith(";TYPE:External perimeter") and activate_heating:
-                        external_coord = True
+    # Convert line to a list and tag it
+    modified_line_parts = line.split()
+    tag_modified_line(modified_line_parts)
 
-                    # If we meet this comment, we are sure that external perimeter is finished.
-                    # It's not a perfect method because it seems some movements associated to external perimeter
-                    # are outside this section for unknown reasons
-                    elif external_coord and line.startswith(";WIPE_START"):
-                        external_coord = False
+    # Apply speed modifications
+    start_time = time.perf_counter()
+    if layer_entry[LAYER_PHASE_NUM] > 0:
+        apply_speed_multiplier(modified_line_parts, layer_entry[LAYER_SPEED_MULT])
 
-                # A normal G-code line. We have to edit some of them.
-                else:
-                    # Find the current phase and how far we are in the phase
-                    phase_num, phase_pct = find_phase(height_pct, parameter_array)
+    # Apply extrusion amounts modification
+    speed_time = time.perf_counter()
+    apply_extrude_factor(modified_line_parts, layer_entry[LAYER_EXTRUDE_FACTOR])
 
-                    # Validate if the gcode line operation is a G1
-                    if line.startswith("G1"):
+    # Apply shift position modification
+    extrude_time = time.perf_counter()
+    shift_position(modified_line_parts, shift_x, shift_y)
+    shift_time = time.perf_counter()
 
-                        # ******************************* Apply line modifications here *******************************
+    stats.seconds["apply_speed_multiplier"] += speed_time - start_time
+    stats.seconds["apply_extrude_factor"] += extrude_time - speed_time
+    stats.seconds["shift_position"] += shift_time - extrude_time
+    stats.counts["g1_lines_split"] += 1
 
-                        # Convert line to a list
-                        modified_line_parts = line.split()
+    # Reformat line to text
+    return " ".join(modified_line_parts)
 
-                        # Tag line modified by our gcode editor
-                        tag_modified_line(modified_line_parts)
 
-                        # Apply speed modifications
-                        modify_speed(modified_line_parts, parameter_array, phase_num, phase_pct)
+def rewrite_g1_line(line, layer_entry, shift_x, shift_y, coord_buffer=None):
+    """Apply the speed, extrusion and shift modifications to a G1 line in a single step. The line is parsed with
+    G1_PATTERN and the modified line is formatted at once. The result is the same as edit_g1_line().
 
-                        # Apply extrusion amounts modification
-                        modify_extrusion_amounts(modified_line_parts, extrude_ratio_array, phase_num)
+    Parameters
+    ----------
+    line : A G1 line of G-code.
+    layer_entry : The row of the layer table (see compute_layer_table()) for the current layer.
+    shift_x : The shift of the workpiece on X axis.
+    shift_y : The shift of the workpiece on Y axis.
+    coord_buffer : A CoordinateBuffer receiving the X, Y coordinates of the modified line, as written in it, if it has
+    both. None to not collect them.
 
-                        # Apply shift position modification
-                        shift_position(modified_line_parts, shift_x, shift_y)
+    Returns
+    -------
+    modified_line : The modified line, tagged as modified, or None if the line does not match G1_PATTERN (a comment
+    after the instruction, words in another order...). In that case edit_g1_line() must be used.
+    """
 
-                        # Reformat line to text
-                        modified_line = " ".join(modified_line_parts)
+    match = G1_PATTERN.match(line)
+    if match is None:
+        return None
 
-                        # ********************************* Get data for heating *********************************
+    x, y, z, e, f = match.groups()
 
-                        if external_coord and (coord := get_coordinate(modified_line)):  # Opérateur de Walrus
-                            data_coord.append(coord)
+    # Apply shift position modification
+    if x is not None:
+        x = float(x) + shift_x
+    if y is not None:
+        y = float(y) + shift_y
 
-                    # If there is already a line to set temperature we modify its value
-                    if line.startswith(("M104", "M109")):
+    # Get data for heating. round() gives the value written with 3 decimals.
+    if coord_buffer is not None and x is not None and y is not None:
+        coord_buffer.append(round(x, 3), round(y, 3))
 
-                        # ******************************* Apply line modifications here *******************************
+    # Speed is only modified after phase 0
+    if f is not None and layer_entry[LAYER_PHASE_NUM] > 0:
+        f = str(float(f) * layer_entry[LAYER_SPEED_MULT]/100)
 
-                        # Convert line to a list
-                        modified_line_parts = line.split()
+    return "G1{}{}{}{}{}  ;Modified\n".format(
+        "" if x is None else " X{:.3f}".format(x),
+        "" if y is None else " Y{:.3f}".format(y),
+        "" if z is None else " Z" + z,
+        "" if e is None else " E{:.3f}".format(float(e) * layer_entry[LAYER_EXTRUDE_FACTOR]/100),
+        "" if f is None else " F" + f)
 
-                        # Tag line modified by our gcode editor
-                        tag_modified_line(modified_line_parts)
 
-                        # Apply temperature modifications
-                        modify_temperature(modified_line_parts, parameter_array, phase_num, phase_pct)
+def parse_word_values(values):
+    """Convert the values of a word (X, Y, E...) taken from many G-code lines into a numpy array at once.
 
-                        # Reformat line to text
-                        modified_line = " ".join(modified_line_parts)
+    Parameters
+    ----------
+    values : A list of word values as text. The value is empty or None when the word is absent from the line.
 
-                # Write the modified lines to the output file
-                output_file.write(modified_line)
+    Returns
+    -------
+    value_array : An array of floats, NaN for the absent words.
+    """
 
-        print(f"Edition finished. Find the new G code file {output_file_path}.")
+    return np.fromstring(" ".join([value or "nan" for value in values]), sep=" ")
 
-    else:
-        print(f"Edition canceled. Please check your parameters file.")
+
+def rewrite_g1_batch(g1_lines, g1_external, layer_entry, shift_x, shift_y):
+    """Vectorized version of rewrite_g1_line() for many G1 lines of the same layer. The words of all lines are parsed
+    in a single regex call, the shift, extrusion factor and speed multiplier are applied on whole numpy arrays, then
+    the lines with the same words are formatted at once. The result is the same as editing each line with
+    rewrite_g1_line() or edit_g1_line().
+
+    Parameters
+    ----------
+    g1_lines : A list of G1 lines of G-code.
+    g1_external : A list of booleans, True for the lines which belong to the external perimeter.
+    layer_entry : The row of the layer table (see compute_layer_table()) for the current layer.
+    shift_x : The shift of the workpiece on X axis.
+    shift_y : The shift of the workpiece on Y axis.
+
+    Returns
+    -------
+    modified_lines : The list of modified lines, tagged as modified.
+    coords : An array of [x, y] coordinates of the modified lines of the external perimeter, as written in them.
+    """
+
+    # Parse the words of all lines with a single regex call. Only the last line of a file may miss its end of line.
+    g1_text = "".join(g1_lines)
+    if not g1_text.endswith("\n"):
+        g1_text += "\n"
+    x_text, y_text, z_text, e_text, f_text, other_text = zip(*G1_BATCH_PATTERN.findall(g1_text))
+
+    # Apply shift position and extrusion amounts modification on whole arrays
+    x_array = parse_word_values(x_text) + shift_x
+    y_array = parse_word_values(y_text) + shift_y
+    e_array = parse_word_values(e_text) * layer_entry[LAYER_EXTRUDE_FACTOR]/100
+
+    # Speed is only modified after phase 0
+    if layer_entry[LAYER_PHASE_NUM] > 0:
+        f_array = parse_word_values(f_text) * layer_entry[LAYER_SPEED_MULT]/100
+        f_present = ~np.isnan(f_array)
+    else:
+        f_array = np.array(f_text, dtype=object)
+        f_present = f_array != ""
+
+    # Find the combination of present words of each line
+    z_array = np.array(z_text, dtype=object)
+    word_columns = (x_array, y_array, z_array, e_array, f_array)
+    word_present = np.column_stack((~np.isnan(x_array), ~np.isnan(y_array), z_array != "", ~np.isnan(e_array),
+                                    f_present))
+    word_codes = word_present @ G1_WORD_BITS
+
+    # Format the lines of each combination with a single operation, their values being interleaved by numpy, and put
+    # them back in place
+    modified_lines = np.empty(len(word_codes), dtype=object)
+    for code in np.unique(word_codes).tolist():
+        line_index = np.flatnonzero(word_codes == code)
+        columns = [column[line_index] for column, bit in zip(word_columns, G1_WORD_BITS) if code & bit]
+        values = tuple(np.column_stack(columns).ravel().tolist()) if columns else ()
+        modified_lines[line_index] = ((G1_TEMPLATES[code] * len(line_index)) % values).splitlines(keepends=True)
+    modified_lines = modified_lines.tolist()
+
+    # Lines that are not standard G1 lines are edited word by word
+    for i in [i for i, other in enumerate(other_text) if other]:
+        modified_lines[i] = edit_g1_line(g1_lines[i], layer_entry, shift_x, shift_y)
+
+    # Get data for heating. The coordinates of the standard lines are formatted with 3 decimals and read back at once,
+    # which gives the values written in them.
+    external = np.array(g1_external, dtype=bool)
+    other_present = np.array(other_text, dtype=object) != ""
+    coord_index = np.flatnonzero(external & ~other_present & ~np.isnan(x_array) & ~np.isnan(y_array))
+    coord_values = tuple(np.column_stack((x_array[coord_index], y_array[coord_index])).ravel().tolist())
+    coords = np.fromstring(("%.3f %.3f " * len(coord_index)) % coord_values, sep=" ").reshape(-1, 2)
+
+    # The other lines are parsed again, their coordinates are put back in the order of the lines
+    other_coords = [(i, get_coordinate(modified_lines[i])) for i in np.flatnonzero(external & other_present).tolist()]
+    other_coords = [(i, coord) for i, coord in other_coords if coord]
+    if other_coords:
+        other_index, other_values = zip(*other_coords)
+        line_order = np.argsort(np.concatenate((coord_index, other_index)), kind="stable")
+        coords = np.concatenate((coords, np.array(other_values).reshape(-1, 2)))[line_order]
+
+    return modified_lines, coords
+
+
+def edit_g1_batch(pending_lines, g1_batch, layer_entry, shift_x, shift_y):
+    """Edit the G1 lines kept aside by the numpy engine with rewrite_g1_batch() and put them back in place. The batch
+    is emptied.
+
+    Parameters
+    ----------
+    pending_lines : A list of lines waiting to be written. The G1 lines to edit are None.
+    g1_batch : A list of (index in pending_lines, G1 line, external perimeter flag) for each G1 line to edit.
+    layer_entry : The row of the layer table (see compute_layer_table()) for the layer of the G1 lines.
+    shift_x : The shift of the workpiece on X axis.
+    shift_y : The shift of the workpiece on Y axis.
+
+    Returns
+    -------
+    coords : An array of [x, y] coordinates of the modified lines of the external perimeter.
+    """
+
+    coords = []
+
+    if g1_batch:
+        g1_index, g1_lines, g1_external = zip(*g1_batch)
+        modified_lines, coords = rewrite_g1_batch(g1_lines, g1_external, layer_entry, shift_x, shift_y)
+        for i, modified_line in zip(g1_index, modified_lines):
+            pending_lines[i] = modified_line
+
+    g1_batch.clear()
+
+    return coords
+
+
+def iter_mapped_runs(data, start, end):
+    """Split the G-code of a memory-mapped file in runs of consecutive lines matching EDITED_LINE_PATTERN, decoded and
+    split in lines, and spans of unchanged lines, kept as memoryviews on the mapped bytes.
+
+    Parameters
+    ----------
+    data : The bytes of the G-code file, like an mmap.mmap.
+    start : The byte offset of the first line.
+    end : The byte offset after the last line.
+
+    Returns
+    -------
+    runs : A generator of lists of lines as text and of 1-tuples holding a memoryview.
+    """
+
+    view = memoryview(data)
+    position = start
+
+    for match in EDITED_LINE_PATTERN.finditer(data, start, end):
+
+        # Unchanged lines before the run
+        if match.start() > position:
+            yield view[position:match.start()],
+
+        yield RUN_LINE_PATTERN.findall(match.group().decode())
+        position = match.end()
+
+    # Unchanged lines after the last run
+    if end > position:
+        yield view[position:end],
+
+
+def iter_mapped_lines(data, start=0, end=None):
+    """Iterate over the G-code of a memory-mapped file for edit_layer_range() in zero-copy mode. Only the lines matching
+    EDITED_LINE_PATTERN are decoded, each run of them at once. The lines between them are given as a single memoryview
+    on the mapped bytes, so that they are copied to the output without being decoded, split and encoded again.
+
+    Parameters
+    ----------
+    data : The bytes of the G-code file, like an mmap.mmap.
+    start : The byte offset of the first line.
+    end : The byte offset after the last line, None to go up to the end of data.
+
+    Returns
+    -------
+    lines : An iterator of G-code lines as text and of memoryviews of unchanged lines.
+    """
+
+    if end is None:
+        end = len(data)
+
+    # Lines are taken from the runs without going through a generator for each line
+    return chain.from_iterable(iter_mapped_runs(data, start, end))
+
+
+def edit_layer_range(input_lines, output_file, edit_job, external_coord=False):
+    """Edit G-code lines with iter_edited_range() and write them to the output file.
+
+    Parameters
+    ----------
+    input_lines : An iterable of G-code lines, see iter_edited_range().
+    output_file : The file in which to write G-code instructions, opened in binary mode in zero-copy mode.
+    edit_job : An EditJob, see iter_edited_range().
+    external_coord : True if the coordinates of the external perimeter are being collected before the first line.
+
+    Returns
+    -------
+    data_coord : An array of [x, y] coordinates of the external perimeter collected since the last heating phase, see
+    iter_edited_range().
+    """
+
+    edited_blocks = iter_edited_range(input_lines, edit_job, external_coord)
+    timer = new_stage_timer(edit_job.stats)
+
+    while True:
+        try:
+            edited_block = next(edited_blocks)
+        except StopIteration as stop:
+            return stop.value
+
+        timer.start()
+        output_file.write(edited_block)
+        timer.lap("output_write")
+
+
+def iter_edited_range(input_lines, edit_job, external_coord=False):
+    """Edit G-code lines and yield the edited G-code by blocks of whole layers. The lines are either a whole file or a
+    range of layers starting with a ";LAYER_CHANGE" line. This is the core of the edition, used by every mode.
+
+    Parameters
+    ----------
+    input_lines : An iterable of G-code lines, like a file opened in text mode. In zero-copy mode, the iterable given
+    by iter_mapped_lines(), where the unchanged lines come as memoryviews.
+    edit_job : An EditJob. Its layer_rows must start with the row of the layer before the first line, which is
+    layer 0 for a whole file.
+    external_coord : True if the coordinates of the external perimeter are being collected before the first line.
+
+    Returns
+    -------
+    edited_blocks : A generator of edited G-code, as text or as bytes in zero-copy mode. Each block holds whole layers,
+    of at least edit_job.buffer_size characters except the last one. When the generator is exhausted, its return value
+    is an array of [x, y] coordinates of the external perimeter collected since the last heating phase. As the layer
+    counter starts at 0, the heating phase of the layer before the first line is not written, it is left to the
+    caller.
+    """
+
+    # Get what is needed to edit the lines
+    (parameter_array, layer_rows, shift_x, shift_y, activate_heating, heating_path, engine, buffer_size, zero_copy,
+     stats, feedrate) = edit_job
+    find_feedrate = activate_heating and heating_path in OPTIMIZED_HEATING_PATHS
+
+    # Initialize counters and variables
+    timer = new_stage_timer(stats)
+    line_number = 0
+    layer_counter = 0
+    layer_entry = layer_rows[0]
+    data_coord = CoordinateBuffer()
+
+    # Lines of the current layer, moved to the output buffer at the next layer change
+    layer_lines = []
+    output_buffer = io.BytesIO() if zero_copy else io.StringIO()
+
+    # G1 lines kept aside by the numpy engine, see edit_g1_batch()
+    g1_batch = []
+
+    # Process each line individually
+    for line_number, line in enumerate(input_lines, 1):
+
+        # Unchanged lines of zero-copy mode are kept as they are
+        if type(line) is memoryview:
+            timer.count_lines(line, 1)
+            # Like other lines which are not comments, they make the current layer the one used for the next edits
+            if layer_entry is not layer_rows[layer_counter] and NON_COMMENT_PATTERN.search(line):
+                layer_entry = layer_rows[layer_counter]
+            layer_lines.append(line)
+            continue
+
+        modified_line = line  # Unchanged line are also rewrite
+
+        # A comment. We used some of them for control.
+        if line[0] == ";":
+
+            if line.startswith(";LAYER_CHANGE"):
+                timer.start()
+
+                # The G1 lines of the numpy engine must be edited before the layer changes
+                if g1_batch:
+                    data_coord.extend(edit_g1_batch(layer_lines, g1_batch, layer_entry, shift_x, shift_y))
+                timer.lap("g1_rewrite")
+
+                # F is modal : the feedrate set again after an optimized heating path is carried across the layers
+                if find_feedrate:
+                    feedrate = find_layer_feedrate(layer_lines, feedrate)
+
+                # Heat current layer before start the next
+                if layer_counter > 0 and activate_heating:
+                    layer_lines.append(format_heating_phase(data_coord.view(), heating_path, feedrate))
+                    data_coord.clear()  # Now we are sure a new layer starts, thus we reset data_coord
+                    timer.count("heating_phases")
+                timer.lap("heating_path")
+
+                # The layer is complete
+                edited_block = flush_layer(output_buffer, layer_lines, buffer_size)
+                timer.lap("output_write", "layers")
+
+                if edited_block:
+                    yield edited_block
+
+                # Update layer counter
+                layer_counter += 1
+
+            elif line.startswith(";BEFORE_LAYER_CHANGE"):
+                # Add a G-code instruction to set temperature. These instructions are not always existent for
+                # each layer
+                if layer_entry[LAYER_PHASE_NUM] > 0:
+                    layer_lines.append(format_temperature_setup(layer_entry[LAYER_TEMPERATURE]))
+                    timer.count("temperature_setups")
+
+            # Detect external perimeter and enable to get coordinates for future heating phase
+            elif line.startswith(";TYPE:External perimeter") and activate_heating:
+                # The grid heating path must not join the end of a perimeter to the start of the next one
+                if heating_path in GRID_HEATING_PATHS:
+                    if g1_batch:
+                        data_coord.extend(edit_g1_batch(layer_lines, g1_batch, layer_entry, shift_x, shift_y))
+                    if data_coord:
+                        data_coord.append(*PERIMETER_SEPARATOR)
+                external_coord = True
+
+            # If we meet this comment, we are sure that external perimeter is finished.
+            # It's not a perfect method because it seems some movements associated to external perimeter
+            # are outside this section for unknown reasons
+            elif external_coord and line.startswith(";WIPE_START"):
+                external_coord = False
+
+        # A normal G-code line. We have to edit some of them.
+        else:
+            # Look up the phase, speed, temperature and extrusion of the current layer
+            layer_entry = layer_rows[layer_counter]
+
+            # Validate if the gcode line operation is a G1
+            if line.startswith("G1"):
+
+                # ******************************* Apply line modifications here *******************************
+
+                timer.start()
+                modified_line = None
+                if engine == "numpy":
+                    # Kept aside to be edited with the other G1 lines of the layer
+                    if len(g1_batch) >= G1_BATCH_SIZE:
+                        data_coord.extend(edit_g1_batch(layer_lines, g1_batch, layer_entry, shift_x, shift_y))
+                    g1_batch.append((len(layer_lines), line, external_coord))
+                else:
+                    # The regex engine collects the coordinates for the heating phase from the values it parsed
+                    if engine == "regex":
+                        modified_line = rewrite_g1_line(line, layer_entry, shift_x, shift_y,
+                                                        data_coord if external_coord else None)
+                    if modified_line is None:
+                        if stats is None:
+                            modified_line = edit_g1_line(line, layer_entry, shift_x, shift_y)
+                        else:
+                            modified_line = edit_g1_line_timed(line, layer_entry, shift_x, shift_y, stats)
+
+                        # ******************************* Get data for heating *******************************
+
+                        if external_coord and (coord := get_coordinate(modified_line)):  # Opérateur de Walrus
+                            data_coord.append(*coord)
+
+                timer.lap("g1_rewrite", "g1_lines")
+
+            # If there is already a line to set temperature we modify its value
+            if line.startswith(("M104", "M109")):
+
+                # ******************************* Apply line modifications here *******************************
+
+                timer.start()
+
+                # Convert line to a list
+                modified_line_parts = line.split()
+
+                # Tag line modified by our gcode editor
+                tag_modified_line(modified_line_parts)
+
+                # Apply temperature modifications
+                modify_temperature(modified_line_parts, parameter_array, int(layer_entry[LAYER_PHASE_NUM]),
+                                   layer_entry[LAYER_PHASE_PCT])
+
+                # Reformat line to text
+                modified_line = " ".join(modified_line_parts)
+
+                timer.lap("modify_temperature", "temperature_lines")
+
+        # Keep the modified line with the other lines of the layer
+        layer_lines.append(modified_line)
+
+    # Write the last layer and everything left in the output buffer
+    timer.start()
+    if g1_batch:
+        data_coord.extend(edit_g1_batch(layer_lines, g1_batch, layer_entry, shift_x, shift_y))
+    timer.lap("g1_rewrite")
+    edited_block = flush_layer(output_buffer, layer_lines, 0)
+    timer.lap("output_write")
+    timer.count("input_lines", line_number)
+    if edited_block:
+        yield edited_block
+
+    return data_coord.view()
+
+
+def edit_layer_range_from_file(gcode_file_path, start, end, edit_job, external_coord):
+    """Read a range of layers from a G-code file and edit it with edit_layer_range(). This is the task run by each
+    worker in parallel mode.
+
+    Parameters
+    ----------
+    gcode_file_path : The relative path of the G code file to edit.
+    start : The byte offset of the first line of the range.
+    end : The byte offset after the last line of the range, None to read up to the end of the file.
+    edit_job : An EditJob whose layer_rows start with the row of the layer before the range.
+    external_coord : True if the coordinates of the external perimeter are being collected at the start of the range.
+
+    Returns
+    -------
+    range_text : The edited G-code of the range, as bytes in zero-copy mode.
+    data_coord : An array of [x, y] coordinates of the external perimeter collected in the last layer of the range.
+    stats : The EditStats of the range, None if statistics are not collected. The worker cannot update the statistics
+    of the main process.
+    """
+
+    if edit_job.zero_copy:
+        # Map the file and edit the range in memory without decoding its unchanged lines
+        output_file = io.BytesIO()
+        with open(gcode_file_path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            data_coord = edit_layer_range(iter_mapped_lines(data, start, end), output_file, edit_job, external_coord)
+        return output_file.getvalue(), data_coord, edit_job.stats
+
+    # Read the range
+    with open(gcode_file_path, "rb") as file:
+        file.seek(start)
+        range_bytes = file.read() if end is None else file.read(end - start)
+
+    range_text, data_coord = edit_range_bytes(range_bytes, edit_job, external_coord)
+
+    return range_text, data_coord, edit_job.stats
+
+
+def edit_range_bytes(range_bytes, edit_job, external_coord):
+    """Edit a range of layers already read from a G-code file with edit_layer_range(), in memory.
+
+    Parameters
+    ----------
+    range_bytes : The bytes of the range, starting with a ";LAYER_CHANGE" line or at the start of the file.
+    edit_job : An EditJob whose layer_rows start with the row of the layer before the range.
+    external_coord : True if the coordinates of the external perimeter are being collected at the start of the range.
+
+    Returns
+    -------
+    range_text : The edited G-code of the range, as bytes in zero-copy mode.
+    data_coord : An array of [x, y] coordinates of the external perimeter collected in the last layer of the range.
+    """
+
+    if edit_job.zero_copy:
+        # Only decode the lines to edit
+        output_file = io.BytesIO()
+        input_lines = iter_mapped_lines(range_bytes)
+    else:
+        # Decode the range like a file opened in text mode
+        output_file = io.StringIO()
+        input_lines = io.TextIOWrapper(io.BytesIO(range_bytes))
+
+    # Edit the range in memory
+    data_coord = edit_layer_range(input_lines, output_file, edit_job, external_coord)
+
+    return output_file.getvalue(), data_coord
+
+
+def edit_layers_in_parallel(gcode_file_path, output_file, edit_job, layer_offsets, external_flags, workers):
+    """Split a G-code file in ranges of layers at its ";LAYER_CHANGE" lines, edit the ranges in a pool of processes and
+    write them to the output file in order. The heating phase between two ranges is written here, from the
+    coordinates collected in the last layer of the previous range.
+
+    Parameters
+    ----------
+    gcode_file_path : The relative path of the G code file to edit.
+    output_file : The file in which to write G-code instructions, opened in binary mode in zero-copy mode.
+    edit_job : An EditJob for the whole file.
+    layer_offsets : The byte offset of each ";LAYER_CHANGE" line, see find_layer_offsets().
+    external_flags : The external perimeter flag at each ";LAYER_CHANGE" line, see find_layer_offsets().
+    workers : The amount of processes.
+
+    Returns
+    -------
+
+    """
+
+    # Split the layers in ranges, several per worker to balance the load. The first range also holds the lines
+    # before the first layer.
+    total_layers = len(layer_offsets)
+    layers_per_range = max(1, math.ceil(total_layers / (workers * RANGES_PER_WORKER)))
+    range_layers = list(range(0, total_layers, layers_per_range)) or [0]
+    feedrates = find_modal_feedrates(gcode_file_path, layer_offsets, edit_job)
+
+    with ProcessPoolExecutor(workers) as executor:
+
+        # Keep a limited amount of ranges in progress, so that edited ranges do not pile up in memory
+        pending_ranges = deque()
+        data_coord = None
+
+        for i, first_layer in enumerate(range_layers):
+
+            # Each range gets the rows of the layer table from the layer before its first line
+            last_layer = range_layers[i + 1] if i + 1 < len(range_layers) else total_layers
+            range_job = edit_job._replace(layer_rows=edit_job.layer_rows[first_layer:last_layer + 1],
+                                          stats=None if edit_job.stats is None else new_edit_stats(),
+                                          feedrate=feedrates[first_layer] if i > 0 else None)
+            start = layer_offsets[first_layer] if i > 0 else 0
+            end = layer_offsets[last_layer] if last_layer < total_layers else None
+            external_coord = external_flags[first_layer] if i > 0 else False
+
+            pending_ranges.append((first_layer, executor.submit(edit_layer_range_from_file, gcode_file_path, start,
+                                                                end, range_job, external_coord)))
+
+            # Write the oldest range once enough ranges are in progress, or all the ranges at the end
+            while len(pending_ranges) > 2 * workers or (i + 1 == len(range_layers) and pending_ranges):
+                range_layer, pending_range = pending_ranges.popleft()
+                range_text, range_coord, range_stats = pending_range.result()
+                if range_stats is not None:
+                    merge_edit_stats(edit_job.stats, range_stats)
+
+                # Heat the last layer of the previous range before the first layer of this range
+                if data_coord is not None and edit_job.activate_heating:
+                    heating_gcode = format_heating_timed(data_coord, edit_job.heating_path, edit_job.stats,
+                                                         feedrates[range_layer])
+                    output_file.write(heating_gcode.encode() if edit_job.zero_copy else heating_gcode)
+
+                output_file.write(range_text)
+                data_coord = range_coord
+
+
+def edit_layers_with_cache(gcode_file_path, output_file, edit_job, layer_offsets, external_flags, cache):
+    """Edit a G-code file layer by layer and write it to the output file, taking the layers already edited with the
+    same parameters from an on-disk cache. Each layer is edited like a range of edit_layers_in_parallel() and the
+    heating phase of a layer is cached with it.
+
+    Parameters
+    ----------
+    gcode_file_path : The relative path of the G code file to edit.
+    output_file : The file in which to write G-code instructions, opened in binary mode.
+    edit_job : An EditJob for the whole file.
+    layer_offsets : The byte offset of each ";LAYER_CHANGE" line, see find_layer_offsets().
+    external_flags : The external perimeter flag at each ";LAYER_CHANGE" line, see find_layer_offsets().
+    cache : A LayerCache, see open_layer_cache().
+
+    Returns
+    -------
+    nb_cached : The amount of layers taken from the cache.
+    """
+
+    # Each layer ends at the next ";LAYER_CHANGE" line. The first layer also holds the lines before it.
+    total_layers = len(layer_offsets)
+    layer_starts = [0] + layer_offsets[1:]
+    layer_ends = layer_offsets[1:] + [None]
+
+    feedrates = find_modal_feedrates(gcode_file_path, layer_offsets, edit_job)
+    timer = new_stage_timer(edit_job.stats)
+    nb_cached = 0
+    heating_gcode = None
+
+    with open(gcode_file_path, "rb") as input_file:
+        for i, (start, end) in enumerate(zip(layer_starts, layer_ends)):
+
+            # Read the layer
+            input_file.seek(start)
+            layer_bytes = input_file.read() if end is None else input_file.read(end - start)
+
+            # The layer uses the rows of the layer table from the layer before it
+            layer_rows = edit_job.layer_rows[i:min(i + 1, total_layers) + 1]
+            external_coord = external_flags[i] if i > 0 else False
+            key = layer_cache_key(layer_bytes, layer_rows, edit_job.shift_x, edit_job.shift_y,
+                                  edit_job.activate_heating, edit_job.heating_path, external_coord, edit_job.zero_copy,
+                                  feedrates[i + 1])
+
+            # Take the layer from the cache, or edit it and save it in the cache
+            layer_gcode, layer_heating_gcode = read_cached_layer(cache, key)
+            if layer_gcode is None:
+                layer_job = edit_job._replace(layer_rows=layer_rows, feedrate=feedrates[i] if i > 0 else None)
+                layer_gcode, data_coord = edit_range_bytes(layer_bytes, layer_job, external_coord)
+                if not edit_job.zero_copy:
+                    layer_gcode = layer_gcode.encode()
+                layer_heating_gcode = b""
+                if edit_job.activate_heating:
+                    layer_heating_gcode = format_heating_timed(data_coord, edit_job.heating_path, edit_job.stats,
+                                                               feedrates[i + 1]).encode()
+                write_cached_layer(cache, key, layer_gcode, layer_heating_gcode)
+            else:
+                nb_cached += 1
+                timer.count("cached_layers")
+                timer.count_lines(layer_bytes)
+
+            # Heat the previous layer before this one
+            if heating_gcode:
+                output_file.write(heating_gcode)
+            output_file.write(layer_gcode)
+            heating_gcode = layer_heating_gcode
+
+    # Keep the cache under its maximum size
+    evict_cached_layers(cache)
+
+    return nb_cached
+
+
+def edit_layers_in_range(gcode_file_path, output_file, edit_job, layer_offsets, external_flags, first_layer,
+                         last_layer):
+    """Edit a range of layers of a G-code file and copy the other layers to the output file unchanged. The range is
+    edited like a range of edit_layers_in_parallel(), with the heating phase of its last layer written after it.
+
+    Parameters
+    ----------
+    gcode_file_path : The relative path of the G code file to edit.
+    output_file : The file in which to write G-code instructions, opened in binary mode.
+    edit_job : An EditJob for the whole file.
+    layer_offsets : The byte offset of each ";LAYER_CHANGE" line, see find_layer_offsets().
+    external_flags : The external perimeter flag at each ";LAYER_CHANGE" line, see find_layer_offsets().
+    first_layer : The number of the first edited layer, from 0. Layer 0 also holds the lines before it.
+    last_layer : The number of the layer after the range.
+
+    Returns
+    -------
+
+    """
+
+    total_layers = len(layer_offsets)
+    start = layer_offsets[first_layer] if first_layer > 0 else 0
+    end = layer_offsets[last_layer] if last_layer < total_layers else None
+    timer = new_stage_timer(edit_job.stats)
+
+    with open(gcode_file_path, "rb") as input_file:
+
+        # Copy the layers before the range
+        copy_file_range(input_file, output_file, start, timer)
+
+        # Edit the range, which uses the rows of the layer table from the layer before it
+        range_bytes = input_file.read() if end is None else input_file.read(end - start)
+        feedrates = find_modal_feedrates(gcode_file_path, layer_offsets, edit_job)
+        range_job = edit_job._replace(layer_rows=edit_job.layer_rows[first_layer:last_layer + 1],
+                                      feedrate=feedrates[first_layer] if first_layer > 0 else None)
+        external_coord = external_flags[first_layer] if first_layer > 0 else False
+        range_text, data_coord = edit_range_bytes(range_bytes, range_job, external_coord)
+        output_file.write(range_text if edit_job.zero_copy else range_text.encode())
+
+        # Heat the last layer of the range before the next one, then copy the layers after the range
+        if end is not None:
+            if edit_job.activate_heating:
+                output_file.write(format_heating_timed(data_coord, edit_job.heating_path, edit_job.stats,
+                                                       feedrates[last_layer]).encode())
+            copy_file_range(input_file, output_file, math.inf, timer)
+
+
+def copy_file_range(input_file, output_file, size, timer):
+    """Copy bytes from the current position of a file to another file, by chunks, counting the copied lines.
+
+    Parameters
+    ----------
+    input_file : The file to copy from, opened in binary mode.
+    output_file : The file to copy to, opened in binary mode.
+    size : The amount of bytes to copy, math.inf to copy up to the end of the file.
+    timer : The StageTimer of the edition, see new_stage_timer().
+
+    Returns
+    -------
+
+    """
+
+    while size > 0:
+        chunk = input_file.read(min(size, COPY_CHUNK_SIZE))
+        if not chunk:
+            break
+        output_file.write(chunk)
+        timer.count_lines(chunk)
+        size -= len(chunk)
+
+
+def format_heating_timed(data_coord, heating_path, stats, feedrate=None):
+    """Compute the heating path of a layer and format its G-code, adding the time spent to the statistics. Used for
+    the heating phases written outside edit_layer_range().
+
+    Parameters
+    ----------
+    data_coord : An array of [x, y] coordinates of the external perimeter of the layer.
+    heating_path : How the heating path is computed, one of HEATING_PATHS.
+    stats : An EditStats, or None if statistics are not collected.
+    feedrate : The text of the feedrate in effect at the end of the layer (see find_modal_feedrates()), set again after
+    an optimized heating path.
+
+    Returns
+    -------
+    heating_gcode : The G-code of the heating phase.
+    """
+
+    timer = new_stage_timer(stats)
+    heating_gcode = format_heating_phase(data_coord, heating_path, feedrate)
+    timer.lap("heating_path", "heating_phases")
+
+    return heating_gcode
+
+
+class StageTimer:
+    """Adds the time spent in the stages of an edition and the amount of lines of each kind to an EditStats. A lap gives
+    the time since the previous lap, or since start(), to a stage, so that consecutive stages share their clock
+    readings. NULL_STAGE_TIMER does nothing, it is used when statistics are not collected.
+    """
+
+    __slots__ = ("stats", "last_time")
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.last_time = time.perf_counter()
+
+    def start(self):
+        self.last_time = time.perf_counter()
+
+    def lap(self, stage, kind=None):
+        # Give the time since the last reading to the stage, and count a line or an event of the kind
+        now = time.perf_counter()
+        self.stats.seconds[stage] += now - self.last_time
+        self.last_time = now
+        if kind is not None:
+            self.stats.counts[kind] += 1
+
+    def count(self, kind, amount=1):
+        self.stats.counts[kind] += amount
+
+    def count_lines(self, data, counted=0):
+        # Count the input lines of G-code bytes (or of a memoryview), a last line without "\n" included. counted is
+        # the amount of these lines already counted.
+        amount = np.count_nonzero(np.frombuffer(data, dtype=np.uint8) == NEWLINE_BYTE)
+        if len(data) and data[-1] != NEWLINE_BYTE:
+            amount += 1
+        self.stats.counts["input_lines"] += amount - counted
+
+
+class NullStageTimer(StageTimer):
+    """A StageTimer which does nothing, without any cost for the edition but the calls."""
+
+    __slots__ = ()
+
+    def __init__(self):
+        pass
+
+    def start(self):
+        pass
+
+    def lap(self, stage, kind=None):
+        pass
+
+    def count(self, kind, amount=1):
+        pass
+
+    def count_lines(self, data, counted=0):
+        pass
+
+
+# The timer used when statistics are not collected
+NULL_STAGE_TIMER = NullStageTimer()
+
+
+def new_stage_timer(stats):
+    """Get the timer collecting the statistics of an edition, see StageTimer.
+
+    Parameters
+    ----------
+    stats : An EditStats, or None if statistics are not collected.
+
+    Returns
+    -------
+    timer : A StageTimer adding to stats, NULL_STAGE_TIMER if stats is None.
+    """
+
+    return NULL_STAGE_TIMER if stats is None else StageTimer(stats)
+
+
+def new_edit_stats():
+    """Create empty statistics, to collect with edit_gcode_file().
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    stats : An EditStats.
+    """
+
+    return EditStats(Counter(), Counter())
+
+
+def merge_edit_stats(stats, other_stats):
+    """Add statistics collected apart, in a worker for example, to other statistics.
+
+    Parameters
+    ----------
+    stats : The EditStats to update.
+    other_stats : The EditStats to add.
+
+    Returns
+    -------
+
+    """
+
+    stats.counts.update(other_stats.counts)
+    stats.seconds.update(other_stats.seconds)
+
+
+def build_edit_report(stats, seconds, gcode_file_path, output_file_path):
+    """Build the report of an edition from its statistics.
+
+    Parameters
+    ----------
+    stats : The EditStats collected by edit_gcode_file().
+    seconds : The duration of the whole edition.
+    gcode_file_path : The relative path of the edited G code file.
+    output_file_path : The relative path of the new G code file.
+
+    Returns
+    -------
+    report : A dictionary with the duration ("seconds"), the sizes of the files ("input_bytes", "output_bytes"), the
+    amount of input lines ("lines"), the throughput ("lines_per_second", "mb_per_second" of input), the amount of lines
+    of each kind ("counts"), the time spent in each stage ("stage_seconds") and the peak memory of the process and of
+    its workers in MB ("peak_memory_mb", None if unknown).
+    """
+
+    input_bytes = os.path.getsize(gcode_file_path)
+    output_bytes = os.path.getsize(output_file_path)
+
+    # The input lines are counted while they are edited
+    lines = stats.counts["input_lines"]
+
+    return {"seconds": seconds,
+            "input_bytes": input_bytes,
+            "output_bytes": output_bytes,
+            "lines": lines,
+            "lines_per_second": lines / seconds if seconds else None,
+            "mb_per_second": input_bytes / 1e6 / seconds if seconds else None,
+            "counts": dict(stats.counts),
+            "stage_seconds": dict(stats.seconds),
+            "peak_memory_mb": get_peak_memory()}
+
+
+def get_peak_memory():
+    """Get the peak memory used by the process and by its finished workers.
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    peak_memory_mb : The peak resident memory in MB, None if the system does not give it (Windows).
+    """
+
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak_memory = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                      resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+    # Linux gives kilobytes, macOS gives bytes
+    return peak_memory / (1e6 if sys.platform == "darwin" else 1e3)
+
+
+def print_edit_report(report):
+    """Print the report of an edition. It can be given as on_report to gcode_editor().
+
+    Parameters
+    ----------
+    report : A report built by build_edit_report().
+
+    Returns
+    -------
+
+    """
+
+    print(f"Edited {report['lines']} lines ({report['input_bytes'] / 1e6:.1f} MB) in {report['seconds']:.3f} s : "
+          f"{report['lines_per_second']:.0f} lines/s, {report['mb_per_second']:.2f} MB/s")
+    for stage, seconds in sorted(report["stage_seconds"].items(), key=lambda item: -item[1]):
+        print(f"  {stage:<24} {seconds:8.3f} s")
+    for kind, count in sorted(report["counts"].items()):
+        print(f"  {kind:<24} {count:8d}")
+    if report["peak_memory_mb"] is not None:
+        print(f"  Peak memory : {report['peak_memory_mb']:.1f} MB")
+
+
+def flush_layer(output_buffer, layer_lines, buffer_size):
+    """Add the lines of a whole layer to the output buffer and empty the buffer once it holds at least buffer_size
+    characters, so that it is written to the output with a single write. The list of layer lines is emptied.
+
+    Parameters
+    ----------
+    output_buffer : An io.StringIO holding the layers not yet written, or an io.BytesIO in zero-copy mode.
+    layer_lines : The list of lines of the layer. In zero-copy mode, the edited lines are encoded and the unchanged
+    lines (memoryviews) are copied once, directly into the buffer.
+    buffer_size : Amount of characters from which the buffer is emptied. Use 0 to empty it immediately.
+
+    Returns
+    -------
+    edited_block : The content of the buffer to write, or None if the buffer is kept.
+    """
+
+    if type(output_buffer) is io.BytesIO:
+        output_buffer.write(b"".join([line.encode() if type(line) is str else line for line in layer_lines]))
+    else:
+        output_buffer.write("".join(layer_lines))
+    layer_lines.clear()
+
+    if output_buffer.tell() >= buffer_size:
+        edited_block = output_buffer.getvalue()
+        output_buffer.seek(0)
+        output_buffer.truncate()
+        return edited_block
+
+    return None
+
+
+def edit_gcode_file(gcode_file_path, output_file_path, parameter_set, single_pass=False, engine="regex",
+                    buffer_size=OUTPUT_BUFFER_SIZE, workers=1, zero_copy=False, cache_dir=None,
+                    cache_size=LAYER_CACHE_SIZE, stats=None, heating_path="box", layer_range=None,
+                    phase_mapping="layer", estimate=False, acceleration=None):
+    """Edit a G-code file with parameters already extracted and checked, and save the modified G-code in a new file.
+    See gcode_editor() for the description of the options.
+
+    Parameters
+    ----------
+    gcode_file_path : The relative path of the G code file to edit.
+    output_file_path : The relative path of the new G code file.
+    parameter_set : User parameters as a ParameterSet, see load_parameter_file().
+    single_pass : Take the amount of layers from the statistics of the slicer, see find_slicer_layer_count().
+    engine : How G1 lines are edited, one of ENGINES.
+    buffer_size : Amount of characters of whole layers kept in memory before writing them.
+    workers : Amount of processes editing ranges of layers in parallel.
+    zero_copy : Memory-map the input file and copy its unchanged lines without decoding them.
+    cache_dir : The folder of the cache of edited layers, None to edit every layer.
+    cache_size : The maximum amount of bytes of the cache of edited layers.
+    stats : An EditStats (see new_edit_stats()) in which to collect statistics, None to not collect them.
+    heating_path : How the heating path is computed, one of HEATING_PATHS.
+    layer_range : A (first, last) pair to only edit the layers first to last - 1, None to edit every layer.
+    phase_mapping : How the phases are placed on the part, one of PHASE_MAPPINGS.
+    estimate : Estimate the print time and filament of the new file while it is written, and replace the estimates of
+    the slicer at its end and the remaining times of its M73 progress lines (see EstimatingWriter). A binary G-code
+    file is always estimated, to give the new estimates to its print metadata.
+    acceleration : The acceleration of the moves for the estimation in mm/s², None to only limit them by their
+    feedrate.
+
+    Returns
+    -------
+    print_estimate : A PrintEstimate of the new file, None if it is not estimated.
+    """
+
+    # The print time and filament are estimated on the edited G-code as it is written. The print metadata of a binary
+    # G-code file is written before the G-code, with the estimates.
+    input_codec = gcode_codec(gcode_file_path)
+    output_codec = gcode_codec(output_file_path)
+    if estimate or output_codec == "bgcode":
+        open_output = functools.partial(EstimatingWriter, acceleration=acceleration)
+    else:
+        open_output = lambda output_file: output_file
+
+    # A memory map cannot be empty, there is nothing to copy anyway
+    if zero_copy and not os.path.getsize(gcode_file_path):
+        zero_copy = False
+
+    # Compressed and binary G-code is decoded and encoded on the fly, it is edited as a stream of lines
+    if input_codec != "text" or output_codec != "text":
+        if layer_range is not None:
+            raise ValueError("Only the layers of a text G-code file can be edited by range")
+        workers, zero_copy, cache_dir = 1, False, None
+
+    # Find the layer height info
+    if layer_range is not None or workers > 1 or zero_copy or cache_dir is not None:
+        # Only the ";LAYER_CHANGE" lines are needed to split the file in ranges of layers, or to count the layers
+        # without decoding the file
+        layer_offsets, external_flags = find_layer_offsets(gcode_file_path)
+        layer_info = 0, 0, len(layer_offsets)
+        input_lines = None
+    elif single_pass:
+        # Take the amount of layers written by the slicer, so that the file is only read while it is edited. Without
+        # it, the layers are counted like in the default mode, with the layer index of a text file.
+        layer_count = find_slicer_layer_count(gcode_file_path)
+        layer_info = find_layer_info(gcode_file_path) if layer_count is None else (0, 0, layer_count)
+        input_lines = open_gcode(gcode_file_path)
+    else:
+        layer_info = find_layer_info(gcode_file_path)
+        input_lines = open_gcode(gcode_file_path)
+    layer_height = layer_info[0]    # Unused
+    total_height = layer_info[1]    # Unused
+    total_layers = layer_info[2]
+
+    # The real height of each layer, to place the phases by height
+    layer_heights = None
+    if phase_mapping == "height":
+        layer_heights = find_layer_heights(gcode_file_path)
+
+    # Everything needed to edit the lines
+    edit_job = new_edit_job(parameter_set, total_layers, engine, buffer_size, zero_copy, stats, heating_path,
+                            layer_heights)
+
+    if layer_range is not None:
+        # Edit the layers of the range and copy the others
+        first_layer, last_layer = layer_range
+        if not 0 <= first_layer < last_layer <= total_layers:
+            raise ValueError(f"Invalid layer range {layer_range}, the file has {total_layers} layers")
+        with open_output(open(output_file_path, "wb")) as output_file:
+            edit_layers_in_range(gcode_file_path, output_file, edit_job, layer_offsets, external_flags, first_layer,
+                                 last_layer)
+    elif cache_dir is not None:
+        # Edit layer by layer, reusing the layers already edited with the same parameters
+        with open_output(open(output_file_path, "wb")) as output_file:
+            edit_layers_with_cache(gcode_file_path, output_file, edit_job, layer_offsets, external_flags,
+                                   open_layer_cache(cache_dir, cache_size))
+    elif workers > 1:
+        # Edit ranges of layers in parallel
+        with open_output(open(output_file_path, "wb" if zero_copy else "w")) as output_file:
+            edit_layers_in_parallel(gcode_file_path, output_file, edit_job, layer_offsets, external_flags, workers)
+    elif zero_copy:
+        # Map the file and only decode the lines to edit
+        with open(gcode_file_path, "rb") as input_file, open_output(open(output_file_path, "wb")) as output_file, \
+                mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            edit_layer_range(iter_mapped_lines(data), output_file, edit_job)
+    else:
+        # Read file and write the edited G-code streamed by edit_gcode_stream(). A binary G-code file keeps the
+        # metadata of the input, with the new estimates.
+        metadata_blocks = gcode_metadata_blocks(gcode_file_path) if output_codec == "bgcode" else ()
+        with input_lines as input_file, open_output(open_gcode(output_file_path, "w", metadata_blocks)) as output_file:
+            output_file.writelines(edit_gcode_stream(input_file, parameter_set, total_layers, engine, buffer_size,
+                                                     stats, heating_path, layer_heights))
+
+    return output_file.estimate() if estimate else None
+
+
+def new_edit_job(parameter_set, total_layers, engine="regex", buffer_size=OUTPUT_BUFFER_SIZE, zero_copy=False,
+                 stats=None, heating_path="box", layer_heights=None):
+    """Compute everything needed to edit the lines of a G-code file.
+
+    Parameters
+    ----------
+    parameter_set : User parameters as a ParameterSet, see load_parameter_file().
+    total_layers : Total amount of layers of the G-code.
+    engine : How G1 lines are edited, one of ENGINES.
+    buffer_size : Amount of characters of whole layers kept in memory before writing them.
+    zero_copy : True if the lines come from iter_mapped_lines().
+    stats : An EditStats in which to collect statistics, None to not collect them.
+    heating_path : How the heating path is computed, one of HEATING_PATHS.
+    layer_heights : The Z height of each layer to place the phases by height, None to place them by layer number.
+
+    Returns
+    -------
+    edit_job : An EditJob for the whole G-code.
+    """
+
+    # Compute phase, speed, temperature and extrusion of each layer once. Rows are converted to lists of floats
+    # for a fast lookup in the main loop.
+    layer_rows = compute_layer_table(parameter_set.parameter_array, parameter_set.extrude_ratio_array,
+                                     total_layers, layer_heights).tolist()
+
+    return EditJob(parameter_set.parameter_array, layer_rows, parameter_set.shift_x, parameter_set.shift_y,
+                   parameter_set.activate_heating, heating_path, engine, buffer_size, zero_copy, stats, None)
+
+
+def edit_gcode_stream(input_lines, parameter_set, total_layers=None, engine="regex", buffer_size=OUTPUT_BUFFER_SIZE,
+                      stats=None, heating_path="box", layer_heights=None):
+    """Edit G-code coming from any iterable of lines and yield the edited G-code, without any file. For example, the
+    output of a slicer can be edited and sent to a printer as it comes.
+
+    Example :
+    for edited_block in edit_gcode_stream(iter_chunk_lines(response_chunks), load_parameter_file(path), 250):
+        upload.send(edited_block.encode())
+
+    Parameters
+    ----------
+    input_lines : An iterable of G-code lines with their end of line, like a file opened in text mode. Use
+    iter_chunk_lines() for chunks of bytes.
+    parameter_set : User parameters as a ParameterSet, see load_parameter_file().
+    total_layers : Total amount of layers of the G-code (amount of ";LAYER_CHANGE" lines). The phases depend on it. If
+    None, the whole input is kept in memory to count them before the edition starts.
+    engine : How G1 lines are edited, one of ENGINES.
+    buffer_size : Amount of characters of whole layers gathered in each yielded block, 0 to yield each layer.
+    stats : An EditStats in which to collect statistics, None to not collect them.
+    heating_path : How the heating path is computed, one of HEATING_PATHS.
+    layer_heights : The Z height of each layer (see find_layer_heights_in_lines()) to place the phases by height, None
+    to place them by layer number. Its length gives the amount of layers if total_layers is None.
+
+    Returns
+    -------
+    edited_blocks : A generator of edited G-code text, by blocks of whole layers.
+    """
+
+    if total_layers is None and layer_heights is not None:
+        total_layers = len(layer_heights)
+    elif total_layers is None:
+        input_lines = list(input_lines)
+        total_layers = sum(line.startswith(";LAYER_CHANGE") for line in input_lines)
+
+    edit_job = new_edit_job(parameter_set, total_layers, engine, buffer_size, False, stats, heating_path,
+                            layer_heights)
+
+    yield from iter_edited_range(input_lines, edit_job)
+
+
+def iter_chunk_lines(chunks, encoding=None):
+    """Split chunks of G-code in lines, like a file opened in text mode. A line may be split between two chunks.
+
+    Parameters
+    ----------
+    chunks : An iterable of bytes or str chunks of any size.
+    encoding : The encoding of the bytes, the default encoding of open() if None.
+
+    Returns
+    -------
+    input_lines : An iterator of G-code lines, see edit_gcode_stream().
+    """
+
+    return io.TextIOWrapper(io.BufferedReader(ChunkStream(chunks)), encoding=encoding)
+
+
+def gcode_editor(gcode_file_path, parameter_file_path, single_pass=False, engine="regex",
+                 buffer_size=OUTPUT_BUFFER_SIZE, workers=1, zero_copy=False, cache_dir=None,
+                 cache_size=LAYER_CACHE_SIZE, on_report=None, heating_path="box", layer_range=None,
+                 phase_mapping="layer", on_estimate=None, acceleration=None):
+    """This function will call all other functions from this file to modify the G-code according to the input parameter
+    file. The function will save the modified G-code in a new file with prefix "modified-" followed by the original
+    file name, in the folder "output" if the file is in a folder "input" (see default_output_path()).
+
+    Files ending with ".gz" or ".xz" are read and written compressed, files ending with ".bgcode" as binary G-code (see
+    gcode_codecs.py). They are decoded and encoded on the fly, the new file keeps the format of the input. workers,
+    zero_copy and cache_dir need a text file and are ignored for them.
+
+    Parameters
+    gcode_file_path : The relative path of the G code file to edit.
+    parameter_file_path : The relative path of the parameters file to use for the edition.
+    single_pass : If True, the amount of layers is taken from the statistics written by the slicer at the end of the
+    file (see find_slicer_layer_count()) instead of a first scan of the file with find_layer_info(), so that the input
+    file is only read while it is edited. It is streamed like in the default mode, never loaded in memory. A file
+    without these statistics is scanned first, and the layer heights of phase_mapping "height" are always found first.
+    The output is identical.
+    engine : How G1 lines are edited. "regex" uses rewrite_g1_line() and falls back on edit_g1_line() for the lines it
+    cannot parse, "split" always uses edit_g1_line(), "numpy" edits the G1 lines of a layer by batches with
+    rewrite_g1_batch(). The output is identical.
+    buffer_size : Whole layers, heating phase included, are kept in memory and written to the output file with a single
+    write once they hold at least this amount of characters.
+    workers : If greater than 1, the file is split in ranges of layers at its ";LAYER_CHANGE" lines and the ranges are
+    edited in this amount of processes with edit_layers_in_parallel(). The output is identical.
+    zero_copy : If True, the input file is memory-mapped and only the lines to edit are decoded (see
+    iter_mapped_lines()). The other lines are copied to the output as bytes, by contiguous spans. The output is
+    identical, except that unchanged lines keep their original line endings.
+    cache_dir : If given, each edited layer is saved in this folder, keyed by its input bytes and the parameters that
+    apply to it (see layer_cache_key()). The next editions take the layers whose key did not change from the cache
+    instead of editing them again, so that a change of parameters only edits the layers it affects. The layers are
+    edited in a single process. The output is identical.
+    cache_size : Once the cache holds more than this amount of bytes, the least recently used layers are removed.
+    on_report : If given, statistics are collected during the edition : the time spent in each stage and modification
+    function, the amount of lines of each kind and the throughput. This function is then called with the report built
+    by build_edit_report(). Use print_edit_report to print it. The per-function times of speed, extrusion and shift
+    modifications are measured for the lines edited with edit_g1_line(), the regex and numpy engines apply them at once.
+    heating_path : How the parallel lines of the heating phase are computed. "box" sweeps the whole bounding box of the
+    external perimeter. "grid" only sweeps the cells of a grid covered by the part, object by object, which saves
+    travel on sparse or multi-object plates (see set_grid_heating_path()). "box-optimized" and "grid-optimized" sweep
+    the same lines from the corner nearest to the end of the last external perimeter, merge the collinear moves and
+    set the feedrate HEATING_FEEDRATE, then set the feedrate in effect at the end of the layer again, carried from the
+    layers before if needed (see optimize_heating_moves() and find_layer_feedrate()).
+    layer_range : If given, a (first, last) pair of layer numbers : only the layers first to last - 1 are edited, the
+    other layers are copied unchanged. Layer numbers start at 0 with the first ";LAYER_CHANGE" line, layer 0 also holds
+    the lines before it. The layers are found with the layer index of the file (see find_layer_index()), the other
+    options of edition apply to the edited layers.
+    phase_mapping : How the percentages of the phases are placed on the part. "layer" takes the number of the layer vs
+    the amount of layers. "height" takes the real Z height of the layer vs the height of the last layer (see
+    find_layer_heights()), so that the phases stay at the same physical height with variable layer heights. Both are
+    the same for constant layer heights.
+    on_estimate : If given, the print time and the filament of the new file are estimated while it is written, from
+    the length and the feedrate of its moves, layer by layer, and the estimates written by the slicer at its end are
+    replaced, with the remaining times of its M73 progress lines (see EstimatingWriter). This function is then called
+    with the PrintEstimate. Use print_estimate_summary to print it.
+    acceleration : The acceleration of the moves in mm/s² for the estimation. Each move then starts and ends at a
+    standstill. None to only limit the moves by their feedrate.
+
+    Returns
+    -------
+    output_file_path : The relative path of the new G code file, None if the edition is canceled.
+    """
+
+    if engine not in ENGINES:
+        print(f"Edition canceled. Unknown engine {engine}, use one of {ENGINES}.")
+        return
+
+    if heating_path not in HEATING_PATHS:
+        print(f"Edition canceled. Unknown heating path {heating_path}, use one of {HEATING_PATHS}.")
+        return
+
+    if phase_mapping not in PHASE_MAPPINGS:
+        print(f"Edition canceled. Unknown phase mapping {phase_mapping}, use one of {PHASE_MAPPINGS}.")
+        return
+
+    # Extract data from the parameter text file and check there are no nonsensical values in parameters (Example a
+    # negative speed). The file is only parsed again if it changed since the last call.
+    try:
+        parameter_set = load_parameter_file(parameter_file_path)
+    except ValueError as e:
+        print(e)
+        print(f"Edition canceled. Please check your parameters file.")
+        return
+
+    # Initialize output file
+    output_file_path = default_output_path(gcode_file_path)
+
+    # Check the layer range against the layers of the file
+    if layer_range is not None:
+        if gcode_codec(gcode_file_path) != "text":
+            print(f"Edition canceled. Only the layers of a text G-code file can be edited by range.")
+            return
+        total_layers = find_layer_info(gcode_file_path)[2]
+        if not 0 <= layer_range[0] < layer_range[1] <= total_layers:
+            print(f"Edition canceled. Invalid layer range {layer_range}, the file has {total_layers} layers.")
+            return
+
+    # Edit the G-code
+    stats = None if on_report is None else new_edit_stats()
+    start_time = time.perf_counter()
+    print_estimate = edit_gcode_file(gcode_file_path, output_file_path, parameter_set, single_pass, engine, buffer_size,
+                                     workers, zero_copy, cache_dir, cache_size, stats, heating_path, layer_range,
+                                     phase_mapping, on_estimate is not None, acceleration)
+
+    if on_report is not None:
+        on_report(build_edit_report(stats, time.perf_counter() - start_time, gcode_file_path, output_file_path))
+
+    if on_estimate is not None:
+        on_estimate(print_estimate)
+
+    print(f"Edition finished. Find the new G code file {output_file_path}.")
+
+    return output_file_path
@@ -0,0 +1,536 @@
+import numpy as np
+import os
+import re
+import zipfile
+
+from collections import namedtuple
+
+from gcode_codecs import open_gcode
+
+# Extension added to the name of a G-code file to get the name of its saved IR, see find_gcode_ir()
+GCODE_IR_EXTENSION = ".ir.npz"
+
+# Part of every saved IR. Change it when the content of the IR changes, so that older files are parsed again.
+GCODE_IR_VERSION = 1
+
+# Opcodes of the lines of a GcodeIR
+OP_TEXT = 0
+OP_COMMENT = 1
+OP_G0 = 2
+OP_G1 = 3
+OP_M104 = 4
+OP_M109 = 5
+
+# Opcode of a line given by its first word, OP_TEXT for the others
+COMMAND_OPCODES = {b"G0": OP_G0, b"G1": OP_G1, b"M104": OP_M104, b"M109": OP_M109}
+
+# Words of the moves, in the order of the columns of a GcodeIR and of PrusaSlicer
+AXES = "XYZEF"
+
+# A number written so that formatting its float value back gives the same text : at most 9 digits before the point
+# (no leading zero) and 6 after it, so that the float keeps every digit
+IR_NUMBER_PATTERN = rb"-?(?:(?:0|[1-9]\d{0,8})(?:\.\d{0,6})?|\.\d{1,6})"
+
+# Every line of a G-code file, with one match per line. A move written as a G0 or G1 command followed by any of its
+# X, Y, Z, E and F words in this order, separated by single spaces, fills the first groups. It is rebuilt from the
+# columns of the IR, the other lines only fill the last group and are kept as text.
+IR_LINE_PATTERN = re.compile(rb"^(?:(G[01])" + b"".join(rb"(?: " + axis.encode() + rb"(" + IR_NUMBER_PATTERN + rb"))?"
+                                                         for axis in AXES) + rb"$|(.*)$)", re.MULTILINE)
+
+# A word of a move kept as text, to fill the columns of the IR anyway
+IR_WORD_PATTERN = re.compile(rb"\s([XYZEF])(-?(?:\d+\.?\d*|\.\d+))")
+
+# Bits of the format of a word in a GcodeIR, -1 for an absent word. The lowest bits give the amount of decimals.
+FORMAT_DECIMALS = 7
+FORMAT_POINT = 8
+FORMAT_NO_LEADING_ZERO = 16
+
+# Amount of bytes of whole lines parsed at once by parse_gcode_ir()
+IR_PARSE_BLOCK_SIZE = 1 << 20
+
+# Amount of lines formatted at once by write_gcode_ir()
+IR_BLOCK_LINES = 1 << 16
+
+# A parsed G-code program, one row per line in columns. opcodes gives the kind of each line (OP_...). x, y, z, e and f
+# hold the words of the G0 and G1 lines, NaN when a word is absent. The lines rebuilt from these columns have the
+# format of each word in formats (see FORMAT_POINT...) and -1 in text_index. The other lines, comments and passthrough
+# commands, are kept as bytes : line i is text_bytes[text_offsets[text_index[i]]:text_offsets[text_index[i] + 1]]. The
+# lines are stored without their newline, final_newline tells if the last one had one. layer_starts gives the line of
+# each ";LAYER_CHANGE" comment.
+GcodeIR = namedtuple("GcodeIR", ["opcodes", "x", "y", "z", "e", "f", "formats", "text_index", "text_bytes",
+                                 "text_offsets", "layer_starts", "final_newline"])
+
+
+def parse_gcode_ir(data):
+    """Parse G-code into a GcodeIR. The text is parsed by blocks of lines with parse_ir_block(), so that the Python
+    objects made by the regex for each line never pile up.
+
+    Parameters
+    ----------
+    data : The G-code as bytes.
+
+    Returns
+    -------
+    gcode_ir : A GcodeIR.
+    """
+
+    final_newline = data.endswith(b"\n")
+    blocks = []
+    start = 0
+
+    # Cut the blocks at a newline. The last one may end with an empty line, which is only kept without a final newline.
+    while True:
+        end = data.find(b"\n", start + IR_PARSE_BLOCK_SIZE)
+        if end < 0:
+            blocks.append(parse_ir_block(data, start, len(data), drop_last_line=final_newline or not data))
+            break
+        blocks.append(parse_ir_block(data, start, end))
+        start = end + 1
+
+    # Join the blocks, the text indexes and offsets of each block follow those of the previous ones
+    nb_lines = np.cumsum([0] + [len(block.opcodes) for block in blocks])
+    nb_texts = np.cumsum([0] + [len(block.text_offsets) - 1 for block in blocks])
+    text_sizes = np.cumsum([0] + [len(block.text_bytes) for block in blocks])
+    text_index = np.concatenate([np.where(block.text_index >= 0, block.text_index + nb_texts[i], -1)
+                                 for i, block in enumerate(blocks)]).astype(np.int32)
+    text_offsets = np.concatenate([[0]] + [block.text_offsets[1:] + text_sizes[i] for i, block in enumerate(blocks)])
+
+    return GcodeIR(opcodes=np.concatenate([block.opcodes for block in blocks]),
+                   x=np.concatenate([block.x for block in blocks]), y=np.concatenate([block.y for block in blocks]),
+                   z=np.concatenate([block.z for block in blocks]), e=np.concatenate([block.e for block in blocks]),
+                   f=np.concatenate([block.f for block in blocks]),
+                   formats=np.concatenate([block.formats for block in blocks]), text_index=text_index,
+                   text_bytes=np.concatenate([block.text_bytes for block in blocks]),
+                   text_offsets=text_offsets.astype(np.int64),
+                   layer_starts=np.concatenate([block.layer_starts + nb_lines[i] for i, block in enumerate(blocks)]),
+                   final_newline=final_newline)
+
+
+def parse_ir_block(data, start, end, drop_last_line=False):
+    """Parse a block of lines of G-code into a GcodeIR. Every line is matched by a single regex call over the block,
+    the words of the moves are converted and their format is found on whole arrays.
+
+    Parameters
+    ----------
+    data : The G-code as bytes.
+    start : The byte offset of the first line of the block.
+    end : The byte offset of the newline after the last line, or of the end of data.
+    drop_last_line : Remove the last line, the empty line after the final newline of data.
+
+    Returns
+    -------
+    gcode_ir : A GcodeIR of the block, final_newline is not set.
+    """
+
+    # One match per line
+    rows = IR_LINE_PATTERN.findall(data, start, end)
+    if drop_last_line:
+        rows.pop()
+    nb_lines = len(rows)
+    commands, *words, texts = zip(*rows) if rows else [()] * (len(AXES) + 2)
+    commands = np.array(commands, dtype=bytes)
+
+    # The moves rebuilt from the columns, their words and the format of each word
+    moves = commands != b""
+    columns = []
+    formats = np.full((nb_lines, len(AXES)), -1, dtype=np.int8)
+    for i, word_texts in enumerate(words):
+        values, formats[:, i] = parse_ir_words(word_texts)
+        columns.append(values)
+    if not nb_lines:
+        columns = [np.empty(0)] * len(AXES)
+
+    # Opcodes of the lines kept as text, and the words of their moves
+    opcodes = np.where(commands == b"G1", OP_G1, OP_G0).astype(np.int8)
+    text_lines = np.flatnonzero(~moves)
+    text_list = [texts[i] for i in text_lines.tolist()]
+    for i, text in zip(text_lines.tolist(), text_list):
+        if text.startswith(b";"):
+            opcodes[i] = OP_COMMENT
+            continue
+        command = text.split(None, 1)[0] if text.strip() else b""
+        opcodes[i] = COMMAND_OPCODES.get(command, OP_TEXT)
+        if opcodes[i] in (OP_G0, OP_G1):
+            for axis, value in IR_WORD_PATTERN.findall(text.split(b";")[0]):
+                columns[AXES.index(axis.decode())][i] = float(value)
+
+    # The lines kept as text, one after the other
+    text_index = np.full(nb_lines, -1, dtype=np.int32)
+    text_index[text_lines] = np.arange(len(text_lines))
+    text_offsets = np.zeros(len(text_lines) + 1, dtype=np.int64)
+    text_offsets[1:] = np.cumsum(np.array([len(text) for text in text_list], dtype=np.int64))
+
+    layer_starts = np.array([i for i, text in zip(text_lines.tolist(), text_list) if text.startswith(b";LAYER_CHANGE")],
+                            dtype=np.int64)
+
+    return GcodeIR(opcodes=opcodes, x=columns[0], y=columns[1], z=columns[2], e=columns[3], f=columns[4],
+                   formats=formats, text_index=text_index,
+                   text_bytes=np.frombuffer(b"".join(text_list), dtype=np.uint8), text_offsets=text_offsets,
+                   layer_starts=layer_starts, final_newline=False)
+
+
+def parse_ir_words(word_texts):
+    """Convert the texts of a word of many lines into floats and find how each one is written.
+
+    Parameters
+    ----------
+    word_texts : A list of word values as bytes, empty when the word is absent.
+
+    Returns
+    -------
+    values : An array of floats, NaN for the absent words.
+    formats : An array of formats (see FORMAT_POINT...), -1 for the absent words.
+    """
+
+    values = np.full(len(word_texts), np.nan)
+    formats = np.full(len(word_texts), -1, dtype=np.int8)
+
+    # The characters of each text in a row of bytes, padded with zeros
+    text_array = np.array(word_texts, dtype=bytes)
+    present = text_array != b""
+    if not present.any():
+        return values, formats
+    text_array = text_array[present]
+    values[present] = text_array.astype(np.float64)
+    characters = text_array.view(np.uint8).reshape(len(text_array), -1)
+
+    # Amount of decimals after the point
+    lengths = (characters != 0).sum(axis=1)
+    has_point = (characters == ord(".")).any(axis=1)
+    point_position = (characters == ord(".")).argmax(axis=1)
+    decimals = np.where(has_point, lengths - point_position - 1, 0)
+
+    # ".5" and "-.5" have no leading zero
+    no_leading_zero = (characters[:, 0] == ord(".")) | ((characters[:, 0] == ord("-")) & (point_position == 1))
+
+    formats[present] = decimals + FORMAT_POINT * has_point + FORMAT_NO_LEADING_ZERO * no_leading_zero
+
+    return values, formats
+
+
+def ir_word_templates(axis):
+    """Compute the text of a word of a move for each format, with its placeholders.
+
+    Parameters
+    ----------
+    axis : The letter of the word.
+
+    Returns
+    -------
+    word_templates : An array of bytes indexed by format + 1, empty for an absent word. A word without leading zero
+    takes its sign and its decimals as an integer, the others take their value.
+    """
+
+    word_templates = np.full(FORMAT_NO_LEADING_ZERO * 2 + 1, b"", dtype=object)
+    letter = axis.encode()
+
+    for word_format in range(FORMAT_NO_LEADING_ZERO * 2):
+        decimals = word_format & FORMAT_DECIMALS
+        if word_format & FORMAT_NO_LEADING_ZERO:
+            word_templates[word_format + 1] = b" %s%%s.%%0%dd" % (letter, decimals)
+        elif word_format & FORMAT_POINT and not decimals:
+            word_templates[word_format + 1] = b" %s%%.0f." % letter
+        else:
+            word_templates[word_format + 1] = b" %s%%.%df" % (letter, decimals)
+
+    return word_templates
+
+
+# Text of each word of a move for each format, see ir_word_templates()
+IR_WORD_TEMPLATES = [ir_word_templates(axis) for axis in AXES]
+
+# Text of the command of a move, by opcode
+IR_COMMAND_TEMPLATES = np.array([b"", b"", b"G0", b"G1", b"", b""], dtype=object)
+
+
+def format_ir_lines(gcode_ir, start, end):
+    """Rebuild lines of a GcodeIR as they were written. The moves are formatted from the columns with a single
+    operation, the other lines are taken from the text.
+
+    Parameters
+    ----------
+    gcode_ir : A GcodeIR.
+    start : The first line.
+    end : The line after the last line.
+
+    Returns
+    -------
+    lines : A list of lines as bytes, without their newline.
+    """
+
+    lines = np.empty(end - start, dtype=object)
+    text_index = gcode_ir.text_index[start:end]
+    is_text = text_index >= 0
+
+    # The lines kept as text are contiguous in text_bytes
+    text_rows = text_index[is_text]
+    if len(text_rows):
+        text_start, text_end = gcode_ir.text_offsets[[text_rows[0], text_rows[-1] + 1]]
+        text = gcode_ir.text_bytes[text_start:text_end].tobytes()
+        bounds = (gcode_ir.text_offsets[text_rows[0]:text_rows[-1] + 2] - text_start).tolist()
+        lines[is_text] = [text[line_start:line_end] for line_start, line_end in zip(bounds, bounds[1:])]
+
+    # The moves, one template and the values of its words for each line
+    move_lines = np.flatnonzero(~is_text) + start
+    if len(move_lines):
+        formats = gcode_ir.formats[move_lines].astype(np.int64)
+        templates = IR_COMMAND_TEMPLATES[gcode_ir.opcodes[move_lines]]
+        word_values = np.empty((len(move_lines), 2 * len(AXES)), dtype=object)
+        word_present = np.zeros(word_values.shape, dtype=bool)
+        for i, column in enumerate((gcode_ir.x, gcode_ir.y, gcode_ir.z, gcode_ir.e, gcode_ir.f)):
+            templates = templates + IR_WORD_TEMPLATES[i][formats[:, i] + 1]
+            values = column[move_lines]
+            no_leading_zero = (formats[:, i] >= 0) & (formats[:, i] & FORMAT_NO_LEADING_ZERO > 0)
+            word_present[:, 2 * i] = formats[:, i] >= 0
+            word_present[:, 2 * i + 1] = no_leading_zero
+            word_values[:, 2 * i] = values
+            word_values[no_leading_zero, 2 * i] = np.where(np.signbit(values[no_leading_zero]), b"-", b"").tolist()
+            word_values[no_leading_zero, 2 * i + 1] = np.rint(np.abs(values[no_leading_zero]) *
+                                                              10.0 ** (formats[no_leading_zero, i] &
+                                                                       FORMAT_DECIMALS)).astype(np.int64).tolist()
+        move_text = b"\n".join(templates.tolist()) % tuple(word_values[word_present].tolist())
+        lines[~is_text] = move_text.split(b"\n")
+
+    return lines.tolist()
+
+
+def format_ir_words(gcode_ir, rows, axis):
+    """Rebuild the value of a word of moves of a GcodeIR as it was written, like ".2" for " Z.2".
+
+    Parameters
+    ----------
+    gcode_ir : A GcodeIR.
+    rows : An array of lines of moves rebuilt from the columns (text_index of -1).
+    axis : The letter of the word, one of AXES.
+
+    Returns
+    -------
+    word_texts : A list of the values as bytes, empty for an absent word.
+    """
+
+    i = AXES.index(axis)
+    formats = gcode_ir.formats[rows, i].astype(np.int64)
+    values = getattr(gcode_ir, axis.lower())[rows]
+    present = formats >= 0
+    word_texts = [b""] * len(rows)
+    if not present.any():
+        return word_texts
+
+    # One value, or the sign and the decimals as an integer for a word without leading zero, see ir_word_templates()
+    templates = IR_WORD_TEMPLATES[i][formats[present] + 1]
+    values, formats = values[present], formats[present]
+    no_leading_zero = formats & FORMAT_NO_LEADING_ZERO > 0
+    word_values = np.empty((len(values), 2), dtype=object)
+    word_values[:, 0] = values
+    word_values[no_leading_zero, 0] = np.where(np.signbit(values[no_leading_zero]), b"-", b"").tolist()
+    word_values[no_leading_zero, 1] = np.rint(np.abs(values[no_leading_zero]) *
+                                              10.0 ** (formats[no_leading_zero] &
+                                                       FORMAT_DECIMALS)).astype(np.int64).tolist()
+    word_present = np.stack((np.ones(len(values), dtype=bool), no_leading_zero), axis=1)
+
+    # The letter and its space are removed from each word
+    word_text = b"\n".join(templates.tolist()) % tuple(word_values[word_present].tolist())
+    for index, text in zip(np.flatnonzero(present).tolist(), word_text.split(b"\n")):
+        word_texts[index] = text[2:]
+
+    return word_texts
+
+
+def write_gcode_ir(gcode_ir, output_file):
+    """Write the G-code of a GcodeIR, identical to the parsed G-code, by blocks of IR_BLOCK_LINES lines.
+
+    Parameters
+    ----------
+    gcode_ir : A GcodeIR.
+    output_file : The file in which to write the G-code, opened in binary mode.
+
+    Returns
+    -------
+
+    """
+
+    nb_lines = len(gcode_ir.opcodes)
+
+    for start in range(0, nb_lines, IR_BLOCK_LINES):
+        end = min(start + IR_BLOCK_LINES, nb_lines)
+        block = b"\n".join(format_ir_lines(gcode_ir, start, end))
+        output_file.write(block + b"\n" if end < nb_lines or gcode_ir.final_newline else block)
+
+
+def ir_line_layers(gcode_ir):
+    """Find the layer of each line of a GcodeIR. Layer numbers start at 0 with the first ";LAYER_CHANGE" line, layer 0
+    also holds the lines before it, like in gcode_editor().
+
+    Parameters
+    ----------
+    gcode_ir : A GcodeIR.
+
+    Returns
+    -------
+    line_layers : An array with the layer number of each line.
+    """
+
+    return np.searchsorted(gcode_ir.layer_starts, np.arange(len(gcode_ir.opcodes)), side="right")
+
+
+def read_gcode_ir(gcode_file_path):
+    """Read and parse a G-code file into a GcodeIR. Compressed and binary G-code files are decoded first.
+
+    Parameters
+    ----------
+    gcode_file_path : The relative path of the G code file.
+
+    Returns
+    -------
+    gcode_ir : A GcodeIR.
+    """
+
+    with open_gcode(gcode_file_path, "rb") as file:
+        return parse_gcode_ir(file.read())
+
+
+def gcode_ir_path(gcode_file_path):
+    """Compute the path of the saved IR of a G-code file, next to it.
+
+    Parameters
+    ----------
+    gcode_file_path : The relative path of the G code file.
+
+    Returns
+    -------
+    ir_path : The relative path of the IR file.
+    """
+
+    return gcode_file_path + GCODE_IR_EXTENSION
+
+
+def find_gcode_ir(gcode_file_path, mmap=False):
+    """Get the GcodeIR of a G-code file. The IR saved next to the file is used if the file did not change since it was
+    saved, otherwise the file is parsed and the new IR is saved.
+
+    Parameters
+    ----------
+    gcode_file_path : The relative path of the G code file.
+    mmap : Memory-map the arrays of a saved IR instead of reading them, see load_gcode_ir().
+
+    Returns
+    -------
+    gcode_ir : A GcodeIR.
+    """
+
+    stat = os.stat(gcode_file_path)
+    ir_path = gcode_ir_path(gcode_file_path)
+
+    try:
+        gcode_ir, source = load_gcode_ir(ir_path, mmap)
+        if source == (stat.st_size, stat.st_mtime_ns):
+            return gcode_ir
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        pass
+
+    gcode_ir = read_gcode_ir(gcode_file_path)
+
+    # Nothing is saved if the folder is read-only
+    try:
+        save_gcode_ir(ir_path, gcode_ir, (stat.st_size, stat.st_mtime_ns))
+    except OSError:
+        pass
+
+    return gcode_ir
+
+
+def save_gcode_ir(ir_path, gcode_ir, source=(-1, -1)):
+    """Save a GcodeIR in an uncompressed .npz file, so that its arrays can be memory-mapped by load_gcode_ir(). The
+    file is written under a temporary name then renamed, so that other processes never read a partial file.
+
+    Parameters
+    ----------
+    ir_path : The relative path of the IR file.
+    gcode_ir : A GcodeIR.
+    source : The (size, modification time in nanoseconds) of the parsed G-code file, to know if the IR is still
+    valid.
+
+    Returns
+    -------
+
+    """
+
+    temporary_path = f"{ir_path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary_path, "wb") as file:
+            np.savez(file, version=GCODE_IR_VERSION, source=np.array(source, dtype=np.int64), **gcode_ir._asdict())
+        os.replace(temporary_path, ir_path)
+    except OSError:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+
+def load_gcode_ir(ir_path, mmap=False):
+    """Load a GcodeIR saved by save_gcode_ir().
+
+    Parameters
+    ----------
+    ir_path : The relative path of the IR file.
+    mmap : Memory-map the arrays in the file instead of reading them. They are then read-only and only the parts used
+    are read from the disk.
+
+    Returns
+    -------
+    gcode_ir : A GcodeIR. A ValueError is raised if the file was saved by another version.
+    source : The (size, modification time in nanoseconds) of the parsed G-code file.
+    """
+
+    arrays = map_npz_arrays(ir_path) if mmap else None
+
+    with np.load(ir_path) as npz:
+        if int(npz["version"]) != GCODE_IR_VERSION:
+            raise ValueError(f"{ir_path} was saved by another version")
+        source = tuple(npz["source"].tolist())
+        if arrays is None:
+            arrays = {name: npz[name] for name in GcodeIR._fields}
+
+    gcode_ir = GcodeIR(**{name: arrays[name] for name in GcodeIR._fields})
+
+    return gcode_ir._replace(final_newline=bool(gcode_ir.final_newline)), source
+
+
+def map_npz_arrays(npz_path):
+    """Memory-map the arrays of an uncompressed .npz file, as written by np.savez(). np.load() cannot map them, each
+    array is found in the zip file from the header of its member.
+
+    Parameters
+    ----------
+    npz_path : The relative path of the .npz file.
+
+    Returns
+    -------
+    arrays : A dictionary giving each array by name, as a read-only numpy.memmap (or a plain array when it is empty).
+    """
+
+    arrays = {}
+
+    with zipfile.ZipFile(npz_path) as archive, open(npz_path, "rb") as file:
+        for member in archive.infolist():
+            if member.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{npz_path} is compressed and cannot be memory-mapped")
+
+            # The data of the member comes after its local header, whose name and extra field lengths may differ
+            # from the central directory
+            file.seek(member.header_offset + 26)
+            name_length, extra_length = np.frombuffer(file.read(4), dtype="<u2").tolist()
+            file.seek(member.header_offset + 30 + name_length + extra_length)
+
+            # The .npy header gives the shape and the type of the array
+            if np.lib.format.read_magic(file) == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+            name = member.filename[:-len(".npy")] if member.filename.endswith(".npy") else member.filename
+            if np.prod(shape, dtype=np.int64) == 0:
+                arrays[name] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(npz_path, dtype=dtype, mode="r", offset=file.tell(), shape=shape,
+                                         order="F" if fortran_order else "C")
+
+    return arrays
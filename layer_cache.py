@@ -0,0 +1,172 @@
+import hashlib
+import os
+
+from collections import OrderedDict, namedtuple
+
+# Default maximum amount of bytes of the cached layers on disk
+LAYER_CACHE_SIZE = 256 << 20
+
+# Part of every key. Change it when the edition of the lines changes, so that layers edited by an older version are
+# never spliced into a new file.
+LAYER_CACHE_VERSION = b"3"
+
+# Extension of the cached layer files
+LAYER_CACHE_EXTENSION = ".layer"
+
+# An open cache : its folder, its maximum size in bytes and the size of each entry by key, the least recently used
+# first. See open_layer_cache().
+LayerCache = namedtuple("LayerCache", ["cache_dir", "max_size", "entries"])
+
+
+def open_layer_cache(cache_dir, max_size=LAYER_CACHE_SIZE):
+    """Open an on-disk cache of edited layers. The folder is created if needed, the entries it already holds are
+    ordered by their last use (the modification time of their file).
+
+    Parameters
+    ----------
+    cache_dir : The folder of the cache.
+    max_size : The maximum amount of bytes of the cached layers, see evict_cached_layers().
+
+    Returns
+    -------
+    cache : A LayerCache.
+    """
+
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # List the entries, the least recently used first
+    files = [entry for entry in os.scandir(cache_dir)
+             if entry.is_file() and entry.name.endswith(LAYER_CACHE_EXTENSION)]
+    files.sort(key=lambda entry: entry.stat().st_mtime)
+    entries = OrderedDict((entry.name[:-len(LAYER_CACHE_EXTENSION)], entry.stat().st_size) for entry in files)
+
+    return LayerCache(cache_dir, max_size, entries)
+
+
+def layer_cache_key(layer_bytes, layer_rows, shift_x, shift_y, activate_heating, heating_path, external_coord,
+                    zero_copy, feedrate=None):
+    """Compute the key of an edited layer. It holds everything the edited layer depends on : the input bytes of the
+    layer, the rows of the layer table it uses (phase, speed, temperature and extrusion), the shift, the heating flag
+    and path, the state of the collection of external perimeter coordinates at the start of the layer and the feedrate
+    set again after its heating phase.
+
+    Parameters
+    ----------
+    layer_bytes : The input bytes of the layer.
+    layer_rows : The rows of the layer table used by the layer, see compute_layer_table().
+    shift_x : The shift of the workpiece on X axis.
+    shift_y : The shift of the workpiece on Y axis.
+    activate_heating : The heating flag of the parameters.
+    heating_path : How the heating path of the layer is computed, see find_heating_path().
+    external_coord : True if the coordinates of the external perimeter are being collected at the start of the layer.
+    zero_copy : True if the layer is edited in zero-copy mode, which keeps the line endings of unchanged lines.
+    feedrate : The text of the feedrate in effect at the end of the layer, see find_modal_feedrates().
+
+    Returns
+    -------
+    key : A hexadecimal string.
+    """
+
+    key = hashlib.blake2b(LAYER_CACHE_VERSION, digest_size=16)
+    key.update(repr((layer_rows, shift_x, shift_y, bool(activate_heating), heating_path, external_coord,
+                     zero_copy, feedrate)).encode())
+    key.update(layer_bytes)
+
+    return key.hexdigest()
+
+
+def read_cached_layer(cache, key):
+    """Read an edited layer from the cache and mark it as the most recently used.
+
+    Parameters
+    ----------
+    cache : A LayerCache.
+    key : The key of the layer, see layer_cache_key().
+
+    Returns
+    -------
+    layer_gcode : The edited G-code of the layer as bytes, or None if the layer is not in the cache.
+    heating_gcode : The G-code of the heating phase of the layer as bytes, or None if the layer is not in the cache.
+    """
+
+    if key not in cache.entries:
+        return None, None
+
+    layer_path = os.path.join(cache.cache_dir, key + LAYER_CACHE_EXTENSION)
+    try:
+        with open(layer_path, "rb") as file:
+            content = file.read()
+        os.utime(layer_path)
+    except OSError:
+        # Removed by another process
+        del cache.entries[key]
+        return None, None
+
+    cache.entries.move_to_end(key)
+
+    # The first line gives the size of the layer G-code, the heating G-code follows it
+    header_end = content.index(b"\n") + 1
+    layer_end = header_end + int(content[:header_end])
+
+    return content[header_end:layer_end], content[layer_end:]
+
+
+def write_cached_layer(cache, key, layer_gcode, heating_gcode):
+    """Save an edited layer in the cache. The file is written under a temporary name then renamed, so that other
+    processes never read a partial layer. Nothing is saved if the folder is read-only or full, the edition goes on
+    without caching the layer.
+
+    Parameters
+    ----------
+    cache : A LayerCache.
+    key : The key of the layer, see layer_cache_key().
+    layer_gcode : The edited G-code of the layer as bytes.
+    heating_gcode : The G-code of the heating phase of the layer as bytes.
+
+    Returns
+    -------
+
+    """
+
+    layer_path = os.path.join(cache.cache_dir, key + LAYER_CACHE_EXTENSION)
+    temporary_path = f"{layer_path}.{os.getpid()}.tmp"
+
+    try:
+        with open(temporary_path, "wb") as file:
+            file.write(b"%d\n" % len(layer_gcode))
+            file.write(layer_gcode)
+            file.write(heating_gcode)
+        os.replace(temporary_path, layer_path)
+    except OSError:
+        try:
+            os.remove(temporary_path)
+        except OSError:
+            pass
+        return
+
+    cache.entries[key] = os.path.getsize(layer_path)
+    cache.entries.move_to_end(key)
+
+
+def evict_cached_layers(cache):
+    """Remove the least recently used layers until the cache holds at most its maximum size.
+
+    Parameters
+    ----------
+    cache : A LayerCache.
+
+    Returns
+    -------
+
+    """
+
+    total_size = sum(cache.entries.values())
+
+    while total_size > cache.max_size and cache.entries:
+        key, size = cache.entries.popitem(last=False)
+        try:
+            os.remove(os.path.join(cache.cache_dir, key + LAYER_CACHE_EXTENSION))
+        except OSError:
+            # Already removed by another process, or read-only folder
+            pass
+        total_size -= size
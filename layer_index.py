@@ -0,0 +1,269 @@
+import math
+import mmap
+import numpy as np
+import os
+import re
+
+from collections import namedtuple
+
+# Extension added to the name of a G-code file to get the name of its index
+LAYER_INDEX_EXTENSION = ".index.npz"
+
+# Part of every index. Change it when the content of the index changes, so that older indexes are scanned again.
+LAYER_INDEX_VERSION = 2
+
+# The lines recorded in the index, found without decoding the file. Searching them after a newline rather than with
+# "^" lets the regex engine look for the newline and semicolon pair first, which is several times faster.
+LAYER_INDEX_LINE_PATTERN = re.compile(rb";(?:LAYER_CHANGE|BEFORE_LAYER_CHANGE|TYPE:External perimeter|WIPE_START|Z:|"
+                                      rb" layer_height)[^\n]*")
+LAYER_INDEX_PATTERN = re.compile(rb"\n(" + LAYER_INDEX_LINE_PATTERN.pattern + rb")")
+
+# The layer markers of which the index gives the first offset in each layer
+LAYER_MARKERS = {b";BEFORE_LAYER_CHANGE": "before_offsets", b";TYPE:External perimeter": "external_offsets",
+                 b";WIPE_START": "wipe_offsets"}
+
+# The layers of a G-code file. Layer i starts at the i-th ";LAYER_CHANGE" line. For each layer, the arrays give the
+# byte offset and the line number (from 1) of its ";LAYER_CHANGE" line, its Z height (from its ";Z:" line, or else its
+# first "G1 Z" line, NaN without any), the
+# byte offset of the first ";BEFORE_LAYER_CHANGE", ";TYPE:External perimeter" and ";WIPE_START" lines of the layer (-1
+# without one), and whether the coordinates of the external perimeter are being collected at its ";LAYER_CHANGE" line.
+# The size and modification time of the file tell if the index is still valid. See scan_layer_index().
+LayerIndex = namedtuple("LayerIndex", ["file_size", "mtime_ns", "layer_height", "offsets", "line_numbers", "z_heights",
+                                       "before_offsets", "external_offsets", "wipe_offsets", "external_flags"])
+
+
+def layer_index_path(gcode_file_path):
+    """Compute the path of the index of a G-code file, next to it.
+
+    Parameters
+    ----------
+    gcode_file_path : The relative path of the G code file.
+
+    Returns
+    -------
+    index_path : The relative path of the index file.
+    """
+
+    return gcode_file_path + LAYER_INDEX_EXTENSION
+
+
+def find_layer_index(gcode_file_path):
+    """Get the layer index of a G-code file. The index saved next to the file is used if the file did not change since
+    it was saved, otherwise the file is scanned and the new index is saved.
+
+    Parameters
+    ----------
+    gcode_file_path : The relative path of the G code file.
+
+    Returns
+    -------
+    index : A LayerIndex.
+    """
+
+    index = load_layer_index(gcode_file_path)
+    if index is None:
+        index = scan_layer_index(gcode_file_path)
+        save_layer_index(gcode_file_path, index)
+
+    return index
+
+
+def scan_layer_index(gcode_file_path):
+    """Scan a G-code file to build its layer index. The file is memory-mapped and searched with a single regex, without
+    decoding its lines. As in find_layer_info(), the layer height is taken from the last "; layer_height" line.
+
+    Parameters
+    ----------
+    gcode_file_path : The relative path of the G code file.
+
+    Returns
+    -------
+    index : A LayerIndex.
+    """
+
+    # Initialize variables
+    layer_height = 0
+    columns = {name: [] for name in ("offsets", "line_numbers", "z_heights", "external_flags",
+                                     *LAYER_MARKERS.values())}
+    external_coord = False
+    line_number = 1
+    counted_offset = 0
+
+    stat = os.stat(gcode_file_path)
+    with open(gcode_file_path, "rb") as file:
+
+        # An empty file cannot be memory-mapped
+        if stat.st_size:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                for offset, line in iter_index_lines(data):
+
+                    if line.startswith(b";LAYER_CHANGE"):
+                        # Count the lines up to this one
+                        line_number += data[counted_offset:offset].count(b"\n")
+                        counted_offset = offset
+                        columns["offsets"].append(offset)
+                        columns["line_numbers"].append(line_number)
+                        columns["z_heights"].append(math.nan)
+                        columns["external_flags"].append(external_coord)
+                        for name in LAYER_MARKERS.values():
+                            columns[name].append(-1)
+
+                    elif line.startswith(b"; layer_height"):
+                        layer_height = float(line.split(b"=")[1])
+
+                    elif line.startswith(b";Z:"):
+                        # The height given right after the ";LAYER_CHANGE" line
+                        if columns["offsets"] and math.isnan(columns["z_heights"][-1]):
+                            columns["z_heights"][-1] = float(line[3:])
+
+                    else:
+                        marker = next(marker for marker in LAYER_MARKERS if line.startswith(marker))
+                        if columns["offsets"] and columns[LAYER_MARKERS[marker]][-1] < 0:
+                            columns[LAYER_MARKERS[marker]][-1] = offset
+
+                        # The external perimeter starts at its ";TYPE:" line and ends at the next ";WIPE_START" line
+                        if marker != b";BEFORE_LAYER_CHANGE":
+                            external_coord = marker == b";TYPE:External perimeter"
+
+                # Layers without a ";Z:" line take the height of their first move along Z
+                layer_ends = columns["offsets"][1:] + [stat.st_size]
+                for i, (start, end) in enumerate(zip(columns["offsets"], layer_ends)):
+                    if math.isnan(columns["z_heights"][i]):
+                        columns["z_heights"][i] = find_move_height(data, start, end)
+
+    return LayerIndex(file_size=stat.st_size, mtime_ns=stat.st_mtime_ns, layer_height=layer_height,
+                      offsets=np.array(columns["offsets"], dtype=np.int64),
+                      line_numbers=np.array(columns["line_numbers"], dtype=np.int64),
+                      z_heights=np.array(columns["z_heights"], dtype=np.float64),
+                      before_offsets=np.array(columns["before_offsets"], dtype=np.int64),
+                      external_offsets=np.array(columns["external_offsets"], dtype=np.int64),
+                      wipe_offsets=np.array(columns["wipe_offsets"], dtype=np.int64),
+                      external_flags=np.array(columns["external_flags"], dtype=bool))
+
+
+def find_move_height(data, start, end):
+    """Find the Z height of the first "G1 Z" line in a part of a G-code file.
+
+    Parameters
+    ----------
+    data : The content of the file, as bytes or a memory map.
+    start : The byte offset where the search starts.
+    end : The byte offset where the search ends.
+
+    Returns
+    -------
+    z_height : The Z word of the line, NaN if there is none.
+    """
+
+    line_start = data.find(b"\nG1 Z", start, end)
+    if line_start < 0:
+        return math.nan
+
+    line_end = data.find(b"\n", line_start + 1)
+    line = data[line_start + 1:line_end if line_end >= 0 else len(data)]
+
+    return float(line.split(b";")[0].split()[1][1:])
+
+
+def iter_index_lines(data):
+    """Find the lines of a G-code file recorded in its layer index.
+
+    Parameters
+    ----------
+    data : The content of the file, as bytes or a memory map.
+
+    Returns
+    -------
+    index_lines : A generator of (byte offset, line) pairs, the lines as bytes without their newline.
+    """
+
+    # The first line has no newline before it
+    match = LAYER_INDEX_LINE_PATTERN.match(data)
+    if match:
+        yield 0, match.group()
+
+    for match in LAYER_INDEX_PATTERN.finditer(data):
+        yield match.start(1), match.group(1)
+
+
+def load_layer_index(gcode_file_path):
+    """Read the index saved next to a G-code file.
+
+    Parameters
+    ----------
+    gcode_file_path : The relative path of the G code file.
+
+    Returns
+    -------
+    index : A LayerIndex, or None if there is no index or if the file changed since the index was saved.
+    """
+
+    try:
+        stat = os.stat(gcode_file_path)
+        with np.load(layer_index_path(gcode_file_path)) as arrays:
+            if int(arrays["version"]) != LAYER_INDEX_VERSION:
+                return None
+            index = LayerIndex(**{name: arrays[name] for name in LayerIndex._fields})
+    except (OSError, KeyError, ValueError):
+        return None
+
+    if index.file_size != stat.st_size or index.mtime_ns != stat.st_mtime_ns:
+        return None
+
+    return index._replace(file_size=int(index.file_size), mtime_ns=int(index.mtime_ns),
+                          layer_height=float(index.layer_height))
+
+
+def save_layer_index(gcode_file_path, index):
+    """Save the index of a G-code file next to it. The file is written under a temporary name then renamed, so that
+    other processes never read a partial index. Nothing is saved if the folder is read-only.
+
+    Parameters
+    ----------
+    gcode_file_path : The relative path of the G code file.
+    index : A LayerIndex.
+
+    Returns
+    -------
+
+    """
+
+    index_path = layer_index_path(gcode_file_path)
+    temporary_path = f"{index_path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary_path, "wb") as file:
+            np.savez(file, version=LAYER_INDEX_VERSION, **index._asdict())
+        os.replace(temporary_path, index_path)
+    except OSError:
+        try:
+            os.remove(temporary_path)
+        except OSError:
+            pass
+
+
+def read_layers(gcode_file_path, first_layer, last_layer=None):
+    """Read a range of layers of a G-code file, seeking directly to the first one with the layer index.
+
+    Parameters
+    ----------
+    gcode_file_path : The relative path of the G code file.
+    first_layer : The number of the first layer, from 0.
+    last_layer : The number of the layer after the range, None for the first layer only.
+
+    Returns
+    -------
+    layers_text : The G-code of the layers, from the ";LAYER_CHANGE" line of the first one.
+    """
+
+    offsets = find_layer_index(gcode_file_path).offsets
+    last_layer = first_layer + 1 if last_layer is None else last_layer
+
+    # Stop at the next layer or at the end of the file
+    start = int(offsets[first_layer])
+    end = int(offsets[last_layer]) if last_layer < len(offsets) else None
+
+    with open(gcode_file_path, "rb") as file:
+        file.seek(start)
+        layers_bytes = file.read() if end is None else file.read(end - start)
+
+    return layers_bytes.decode()
@@ -0,0 +1,606 @@
+import math
+import numpy as np
+import os
+import re
+import tempfile
+
+from collections import namedtuple
+
+from gcode_codecs import BLOCK_PRINT_METADATA, find_bgcode_writer, open_gcode
+
+# The commands the estimation needs, by kind. A command must be followed by a space, a comment or the end of the line.
+MOVE_COMMANDS = (b"G0", b"G1")
+SET_POSITION_COMMAND = b"G92"
+MODE_COMMANDS = (b"G90", b"G91", b"M82", b"M83")
+LAYER_CHANGE_COMMENT = b";LAYER_CHANGE"
+
+# True for the bytes which can end a command
+COMMAND_END_BYTES = np.zeros(256, dtype=bool)
+COMMAND_END_BYTES[list(b" \t\r\n;")] = True
+
+# Words of the moves, in the order of the columns of estimate_rows()
+ESTIMATE_AXES = b"XYZEF"
+
+# Column of each byte which is the letter of a word, -1 for the other bytes
+WORD_COLUMNS = np.full(256, -1, dtype=np.int8)
+WORD_COLUMNS[list(ESTIMATE_AXES)] = np.arange(len(ESTIMATE_AXES))
+
+# Maximum amount of characters of a word value, longer values are cut
+WORD_VALUE_SIZE = 12
+
+# The estimates written by PrusaSlicer at the end of a G-code file, like "; filament used [mm] = 231.80"
+ESTIMATE_COMMENT_PATTERN = re.compile(rb"^; (filament used \[mm\]|filament used \[cm3\]|filament used \[g\]|"
+                                      rb"filament cost|total filament used \[g\]|total filament cost|"
+                                      rb"estimated printing time \((.*)\)|"
+                                      rb"estimated first layer printing time \((.*)\)) = ([^\r\n]*)", re.MULTILINE)
+
+# The first bytes of the comments of ESTIMATE_COMMENT_PATTERN, searched before running it
+ESTIMATE_COMMENT_STARTS = (b"; filament", b"; total filament", b"; estimated")
+
+# Amount of characters read at once by estimate_gcode_file()
+ESTIMATE_READ_SIZE = 1 << 20
+
+# The "M73" progress lines of the slicer, and their words giving a remaining time in minutes : R and S for the
+# remaining print time in normal and silent mode, C and D for the time to the next color change
+PROGRESS_LINE_PATTERN = re.compile(rb"^M73 [^\r\n;]*", re.MULTILINE)
+PROGRESS_TIME_PATTERN = re.compile(rb"(?<= )([RSCD])(\d+)(?![\d.])")
+
+# The print metadata of a binary G-code file always given by the estimates, see rewrite_print_metadata()
+ESTIMATE_METADATA_KEYS = ("filament used [mm]", "estimated printing time (normal mode)")
+
+# The comments whose value is scaled like the filament length, see rewrite_estimate_comments()
+FILAMENT_COMMENTS = (b"filament used [cm3]", b"filament used [g]", b"filament cost", b"total filament used [g]",
+                     b"total filament cost")
+
+# The estimated print time and filament of a G-code. seconds is the print time and filament_mm the length of filament
+# pushed by the extruder, retractions deducted. layer_seconds and layer_filament_mm are arrays giving them for each
+# layer, layer 0 starting at the first ";LAYER_CHANGE" line and holding the lines before it. moves is the amount of
+# G0 and G1 lines.
+PrintEstimate = namedtuple("PrintEstimate", ["seconds", "filament_mm", "layer_seconds", "layer_filament_mm", "moves"])
+
+
+class EstimatingWriter:
+    """A write-only stream passing G-code to a file, text or bytes alike, while estimating its print time and filament
+    (see estimate_block()). The estimates written by the slicer at the end of the file are replaced on the fly by the
+    estimates of the G-code written before them (see rewrite_estimate_comments()). The "M73 P.. R.." progress lines of
+    the slicer come before the lines they announce : the G-code is kept in a temporary file and only written to the
+    file when the stream is closed, once the whole G-code is estimated. The print metadata block of a binary G-code
+    file is then given the new estimates (see rewrite_print_metadata()), and the remaining times of the progress lines
+    are scaled by the ratio of the new print time to the print time of the slicer (see scale_progress_times()). Use it
+    as a context manager : the file is closed with it.
+    """
+
+    def __init__(self, file, acceleration=None):
+        self.file = file
+        self.acceleration = acceleration
+        self.pending = b""
+        self.is_text = None
+        self.spool = tempfile.TemporaryFile()
+
+        # The state of the printer after the lines already estimated
+        self.position = [0.0, 0.0, 0.0]
+        self.extruder = 0.0
+        self.feedrate = 0.0
+        self.relative_xyz = False
+        self.relative_e = False
+        self.layer_changes = 0
+
+        # What was estimated up to now
+        self.layer_seconds = []
+        self.layer_filament_mm = []
+        self.moves = 0
+
+        # The estimates of the slicer found in the comments, by name
+        self.slicer_values = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, data):
+        self.is_text = type(data) is str
+        text = self.pending + (data.encode() if self.is_text else bytes(data))
+
+        # Only whole lines are estimated and written
+        end = text.rfind(b"\n") + 1
+        self.pending = text[end:]
+        if end:
+            self.write_lines(text[:end])
+
+        return len(data)
+
+    def writelines(self, blocks):
+        for block in blocks:
+            self.write(block)
+
+    def write_lines(self, text):
+        # Estimate the lines before the first estimate comment, rewrite the comments, then estimate the rest
+        first_start = min((i for i in (text.find(start) for start in ESTIMATE_COMMENT_STARTS) if i >= 0), default=-1)
+        match = first_start >= 0 and ESTIMATE_COMMENT_PATTERN.search(text, text.rfind(b"\n", 0, first_start) + 1)
+        if match:
+            first_comment = match.start()
+            estimate_block(self, text[:first_comment])
+            text = text[:first_comment] + rewrite_estimate_comments(self, text[first_comment:])
+            estimate_block(self, text[first_comment:])
+        else:
+            estimate_block(self, text)
+
+        self.spool.write(text)
+
+    def close(self):
+        if self.spool.closed:
+            return
+
+        try:
+            if self.pending:
+                self.write_lines(self.pending)
+                self.pending = b""
+
+            # The print metadata of a binary G-code file is written before its G-code
+            bgcode_writer = find_bgcode_writer(self.file)
+            if bgcode_writer is not None:
+                bgcode_writer.update_metadata(BLOCK_PRINT_METADATA, rewrite_print_metadata(
+                    self, bgcode_writer.metadata(BLOCK_PRINT_METADATA)))
+
+            # Write the G-code by whole lines, with the progress lines of the new print time
+            slicer_seconds = self.slicer_values.get(b"time")
+            ratio = self.estimate().seconds / slicer_seconds if slicer_seconds else None
+            self.spool.seek(0)
+            remaining = b""
+            while block := self.spool.read(ESTIMATE_READ_SIZE):
+                block = remaining + block
+                end = block.rfind(b"\n") + 1
+                remaining = block[end:]
+                self.write_file(scale_progress_times(block[:end], ratio))
+            self.write_file(scale_progress_times(remaining, ratio))
+        finally:
+            self.spool.close()
+            self.file.close()
+
+    def write_file(self, text):
+        if text:
+            self.file.write(text.decode() if self.is_text else text)
+
+    def estimate(self):
+        return PrintEstimate(seconds=math.fsum(self.layer_seconds), filament_mm=math.fsum(self.layer_filament_mm),
+                             layer_seconds=np.array(self.layer_seconds),
+                             layer_filament_mm=np.array(self.layer_filament_mm), moves=self.moves)
+
+
+def estimate_block(writer, text):
+    """Estimate the print time and filament of whole lines of G-code and add them to the estimates of an
+    EstimatingWriter. The lines are parsed on whole arrays of bytes (see parse_estimate_lines()), the moves are
+    computed on whole arrays between two changes of positioning mode (see estimate_rows()).
+
+    Parameters
+    ----------
+    writer : An EstimatingWriter.
+    text : Whole lines of G-code as bytes.
+
+    Returns
+    -------
+
+    """
+
+    moves, settings, modes, layer_changes, columns = parse_estimate_lines(text)
+    if not len(moves):
+        return
+
+    # Estimate the lines between two changes of positioning mode at once
+    mode_rows = np.flatnonzero(modes >= 0).tolist()
+    start = 0
+    for end in mode_rows + [len(moves)]:
+        if end > start:
+            estimate_rows(writer, moves[start:end], settings[start:end], columns[start:end], layer_changes[start:end])
+        if end < len(moves):
+            mode = MODE_COMMANDS[modes[end]]
+            if mode in (b"G90", b"G91"):
+                writer.relative_xyz = mode == b"G91"
+            else:
+                writer.relative_e = mode == b"M83"
+        start = end + 1
+
+
+def parse_estimate_lines(text):
+    """Find the lines of G-code the estimation needs and the words of their moves, on whole arrays of bytes : the
+    first bytes of each line give its kind, each X, Y, Z, E and F letter after a space and before the comment of a move
+    starts a word, the values of the words are converted at once (see parse_word_values()).
+
+    Parameters
+    ----------
+    text : Whole lines of G-code as bytes.
+
+    Returns
+    -------
+    moves : An array of booleans, True for the G0 and G1 lines.
+    settings : An array of booleans, True for the G92 lines.
+    modes : An array of the index of each positioning mode line in MODE_COMMANDS, -1 for the other lines.
+    layer_changes : An array of booleans, True for the ";LAYER_CHANGE" lines.
+    columns : An array of the X, Y, Z, E and F words of each line, NaN when absent.
+    """
+
+    # The bytes, padded so that a few bytes after any position stay inside
+    padding = max(len(LAYER_CHANGE_COMMENT), WORD_VALUE_SIZE) + 1
+    data = np.frombuffer(text + b"\n" * padding, dtype=np.uint8)
+    size = len(text)
+    line_ends = np.flatnonzero(data[:size + (not text.endswith(b"\n"))] == ord("\n"))
+    line_starts = np.concatenate(([0], line_ends[:-1] + 1))
+
+    # The kind of each line from its first bytes : the first two as a single number, then the next ones
+    prefixes = data[line_starts].astype(np.uint16) << 8 | data[line_starts + 1]
+    third_ends = COMMAND_END_BYTES[data[line_starts + 2]]
+    fourth_ends = COMMAND_END_BYTES[data[line_starts + 3]]
+
+    def prefix(command):
+        return command[0] << 8 | command[1]
+
+    moves = ((prefixes == prefix(MOVE_COMMANDS[0])) | (prefixes == prefix(MOVE_COMMANDS[1]))) & third_ends
+    settings = (prefixes == prefix(SET_POSITION_COMMAND)) & (data[line_starts + 2] == SET_POSITION_COMMAND[2]) & \
+        fourth_ends
+    modes = np.full(len(line_starts), -1)
+    for i, command in enumerate(MODE_COMMANDS):
+        modes[(prefixes == prefix(command)) & (data[line_starts + 2] == command[2]) & fourth_ends] = i
+    layer_changes = prefixes == prefix(LAYER_CHANGE_COMMENT)
+    comment_lines = np.flatnonzero(layer_changes)
+    comment_heads = data[line_starts[comment_lines, None] + np.arange(len(LAYER_CHANGE_COMMENT))]
+    layer_changes[comment_lines] = ((comment_heads == np.frombuffer(LAYER_CHANGE_COMMENT, dtype=np.uint8)).all(axis=1) &
+                                    COMMAND_END_BYTES[data[line_starts[comment_lines] + len(LAYER_CHANGE_COMMENT)]])
+
+    # Keep the lines the estimation needs
+    kept = np.flatnonzero(moves | settings | (modes >= 0) | layer_changes)
+    kept_rows = np.full(len(line_starts), -1)
+    kept_rows[kept] = np.arange(len(kept))
+    columns = np.full((len(kept), len(ESTIMATE_AXES)), np.nan)
+
+    # The words of each line end at its comment or at its end
+    semicolons = np.flatnonzero(data[:size] == ord(";"))
+    word_ends = np.minimum(np.append(semicolons, size)[np.searchsorted(semicolons, line_starts)], line_ends)
+
+    # The letters of words after a space, in the words of the moves
+    positions = np.flatnonzero((data[:size] == ord(" ")) | (data[:size] == ord("\t"))) + 1
+    word_columns = WORD_COLUMNS[data[positions]]
+    positions, word_columns = positions[word_columns >= 0], word_columns[word_columns >= 0]
+    lines = np.searchsorted(line_ends, positions)
+    inside = (moves | settings)[lines] & (positions < word_ends[lines])
+    positions, word_columns, lines = positions[inside], word_columns[inside], lines[inside]
+    columns[kept_rows[lines], word_columns] = parse_word_values(data, positions + 1)
+
+    return moves[kept], settings[kept], modes[kept], layer_changes[kept], columns
+
+
+def parse_word_values(data, positions):
+    """Convert numbers written at given positions of an array of bytes, like "-12.5" or ".4", into floats at once. A
+    number stops at the first byte which is not a digit or its point. The WORD_VALUE_SIZE bytes from each position are
+    copied in a row, the bytes after the number are set to zero and the rows are converted by numpy.
+
+    Parameters
+    ----------
+    data : An array of bytes.
+    positions : An array of the position of the first byte of each number.
+
+    Returns
+    -------
+    values : An array of floats, NaN where there is no number.
+    """
+
+    # The bytes from each position, taken at once as items of WORD_VALUE_SIZE bytes overlapping each other
+    windows = np.ndarray(len(data) - WORD_VALUE_SIZE + 1, dtype=f"V{WORD_VALUE_SIZE}", buffer=data, strides=(1,))
+    characters = windows[positions].view(np.uint8).reshape(-1, WORD_VALUE_SIZE)
+
+    # The bytes of the number : an optional minus sign, then digits and a point
+    digits = (characters - np.uint8(ord("0"))) <= 9
+    valid = digits | (characters == ord("."))
+    valid[:, 0] |= characters[:, 0] == ord("-")
+    valid = np.logical_and.accumulate(valid, axis=1)
+    numbers = (valid & digits).any(axis=1)
+
+    # Rows without a number are converted as "0", then replaced by NaN
+    characters *= valid
+    characters[~numbers] = 0
+    characters[~numbers, 0] = ord("0")
+    values = characters.view(f"S{WORD_VALUE_SIZE}")[:, 0].astype(np.float64)
+    values[~numbers] = np.nan
+
+    return values
+
+
+def estimate_rows(writer, moves, settings, columns, layer_changes):
+    """Estimate lines of G-code parsed by estimate_block(), all in the same positioning mode, and add them to the
+    estimates of an EstimatingWriter.
+
+    The time of a move is its length over its feedrate. If the writer has an acceleration, each move accelerates
+    from a standstill to its feedrate and decelerates to a standstill, on a trapezoidal or triangular profile. A move
+    of the extruder alone takes the time of its length of filament. The position given by a G92 line is not a move.
+
+    Parameters
+    ----------
+    writer : An EstimatingWriter.
+    moves : An array of booleans, True for the G0 and G1 lines.
+    settings : An array of booleans, True for the G92 lines.
+    columns : An array of the X, Y, Z, E and F words of each line, NaN when absent.
+    layer_changes : An array of booleans, True for the ";LAYER_CHANGE" lines.
+
+    Returns
+    -------
+
+    """
+
+    # Position of the axes after each line
+    if writer.relative_xyz:
+        deltas = np.where(moves[:, None], np.nan_to_num(columns[:, :3]), 0.0)
+        positions = add_relative_moves(deltas, np.where(settings[:, None], columns[:, :3], np.nan), writer.position)
+    else:
+        positions = fill_forward(columns[:, :3], writer.position)
+        deltas = np.diff(positions, axis=0, prepend=[writer.position])
+
+    # Filament pushed by each line
+    if writer.relative_e:
+        filament = np.where(moves, np.nan_to_num(columns[:, 3]), 0.0)
+        extruder = add_relative_moves(filament[:, None], np.where(settings, columns[:, 3], np.nan)[:, None],
+                                      [writer.extruder])[:, 0]
+    else:
+        extruder = fill_forward(columns[:, 3:4], [writer.extruder])[:, 0]
+        filament = np.diff(extruder, prepend=writer.extruder)
+    filament[~moves] = 0.0
+
+    # Feedrate of each line in mm/s, F is kept from a move to the next
+    speeds = fill_forward(columns[:, 4:5], [writer.feedrate])[:, 0] / 60
+
+    # Length of each move, or of the filament for the moves of the extruder alone
+    lengths = np.where(moves, np.sqrt((deltas**2).sum(axis=1)), 0.0)
+    lengths = np.where(lengths > 0, lengths, np.abs(filament))
+
+    # Time of each move
+    timed = (lengths > 0) & (speeds > 0)
+    seconds = np.zeros(len(moves))
+    seconds[timed] = lengths[timed]/speeds[timed]
+    if writer.acceleration:
+        # Time to accelerate to the feedrate and decelerate, or to half of the length and back
+        full_speed = timed & (lengths >= speeds**2/writer.acceleration)
+        seconds[full_speed] += speeds[full_speed]/writer.acceleration
+        short = timed & ~full_speed
+        seconds[short] = 2*np.sqrt(lengths[short]/writer.acceleration)
+
+    # Add each line to its layer
+    layers = np.maximum(writer.layer_changes + np.cumsum(layer_changes) - 1, 0)
+    nb_layers = int(layers[-1]) + 1
+    layer_seconds = np.bincount(layers, seconds, minlength=nb_layers)
+    layer_filament = np.bincount(layers, filament, minlength=nb_layers)
+    missing = nb_layers - len(writer.layer_seconds)
+    writer.layer_seconds += [0.0] * missing
+    writer.layer_filament_mm += [0.0] * missing
+    first = int(layers[0])
+    for i, (layer_time, layer_length) in enumerate(zip(layer_seconds[first:].tolist(),
+                                                      layer_filament[first:].tolist()), first):
+        writer.layer_seconds[i] += layer_time
+        writer.layer_filament_mm[i] += layer_length
+
+    # The state of the printer after the lines
+    writer.position = positions[-1].tolist()
+    writer.extruder = float(extruder[-1])
+    writer.feedrate = float(speeds[-1]*60)
+    writer.layer_changes += int(layer_changes.sum())
+    writer.moves += int(moves.sum())
+
+
+def fill_forward(values, initial):
+    """Replace the NaN of each column by the last value above them.
+
+    Parameters
+    ----------
+    values : A 2D array of values, NaN when absent.
+    initial : The value of each column before the first row.
+
+    Returns
+    -------
+    filled : The array of values without NaN.
+    """
+
+    filled = np.vstack(([initial], values))
+    rows = np.where(np.isnan(filled), 0, np.arange(len(filled))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+
+    return np.take_along_axis(filled, rows, axis=0)[1:]
+
+
+def add_relative_moves(deltas, settings, initial):
+    """Compute the positions reached by relative moves, the positions set by G92 lines restarting from their value.
+
+    Parameters
+    ----------
+    deltas : A 2D array of the move of each line on each axis, 0 for the lines which do not move.
+    settings : A 2D array of the position set by each line on each axis, NaN when it is not set.
+    initial : The position of each axis before the first line.
+
+    Returns
+    -------
+    positions : A 2D array of the position of each axis after each line.
+    """
+
+    # The sum of the moves since the last position set
+    sums = np.cumsum(deltas, axis=0)
+    sums_at_settings = fill_forward(np.where(np.isnan(settings), np.nan, sums), np.zeros(deltas.shape[1]))
+
+    return fill_forward(settings, initial) + sums - sums_at_settings
+
+
+def rewrite_estimate_comments(writer, text):
+    """Replace the estimates of the slicer at the end of a G-code file by the estimates of an EstimatingWriter. The
+    filament length and the normal mode print time are those of the writer. The volume, weight and cost of filament
+    are scaled like its length, the print times of the other modes like the normal mode print time. The first layer
+    print time is the time of layer 0. The values of several extruders, separated by commas, are kept.
+
+    Parameters
+    ----------
+    writer : An EstimatingWriter.
+    text : Whole lines of G-code as bytes.
+
+    Returns
+    -------
+    text : The lines with the new estimates.
+    """
+
+    estimate = writer.estimate()
+
+    def replace(match):
+        name, mode, first_layer_mode, value = match.groups()
+        slicer_value = parse_estimate_value(name, value)
+        if slicer_value is None:
+            return match.group(0)
+
+        # The estimate of the writer, and the estimate of the slicer it replaces if the others are scaled like it
+        if name == b"filament used [mm]" or name in FILAMENT_COMMENTS:
+            key, new_value, unit_name = b"filament", estimate.filament_mm, b"filament used [mm]"
+        elif mode is not None:
+            key, new_value, unit_name = b"time", estimate.seconds, None
+        else:
+            key, new_value, unit_name = b"first layer time", estimate.layer_seconds[:1].sum(), None
+
+        if name == unit_name or (mode or first_layer_mode) == b"normal mode":
+            writer.slicer_values[key] = slicer_value
+        elif writer.slicer_values.get(key):
+            new_value *= slicer_value / writer.slicer_values[key]
+        else:
+            return match.group(0)
+
+        new_text = format_print_time(new_value).encode() if unit_name is None else b"%.2f" % new_value
+        return b"; " + name + b" = " + new_text
+
+    return ESTIMATE_COMMENT_PATTERN.sub(replace, text)
+
+
+def rewrite_print_metadata(writer, metadata):
+    """Give the estimates of an EstimatingWriter to the print metadata of a binary G-code file. The values are
+    replaced like the comments of rewrite_estimate_comments(), the filament length and the normal mode print time are
+    added if the metadata misses them.
+
+    Parameters
+    ----------
+    writer : An EstimatingWriter, with the whole G-code estimated.
+    metadata : A dictionary of the print metadata of the slicer.
+
+    Returns
+    -------
+    metadata : A dictionary of the new print metadata.
+    """
+
+    # The metadata as the comments written by the slicer at the end of a text file
+    text = "".join(f"; {key} = {value}\n" for key, value in metadata.items()).encode()
+    text = rewrite_estimate_comments(writer, text).decode()
+    metadata = dict(line[2:].split(" = ", 1) for line in text.splitlines())
+
+    estimate = writer.estimate()
+    for key, value in zip(ESTIMATE_METADATA_KEYS, ("%.2f" % estimate.filament_mm, format_print_time(estimate.seconds))):
+        metadata.setdefault(key, value)
+
+    return metadata
+
+
+def scale_progress_times(text, ratio):
+    """Scale the remaining times of the "M73" progress lines of G-code, written by the slicer in minutes.
+
+    Parameters
+    ----------
+    text : Whole lines of G-code as bytes.
+    ratio : The ratio of the new print time to the print time of the slicer, None to keep the times.
+
+    Returns
+    -------
+    text : The lines with the new remaining times.
+    """
+
+    if ratio is None or b"M73" not in text:
+        return text
+
+    def scale(match):
+        return match.group(1) + b"%d" % round(int(match.group(2)) * ratio)
+
+    return PROGRESS_LINE_PATTERN.sub(lambda match: PROGRESS_TIME_PATTERN.sub(scale, match.group()), text)
+
+
+def parse_estimate_value(name, value):
+    """Convert the value of an estimate comment of the slicer, see rewrite_estimate_comments().
+
+    Parameters
+    ----------
+    name : The name of the estimate, as bytes.
+    value : Its value as bytes, a number or a print time like "1h 2m 3s".
+
+    Returns
+    -------
+    number : The value as a float, a print time in seconds. None if it cannot be read, for example the values of
+    several extruders separated by commas.
+    """
+
+    try:
+        if b"time" not in name:
+            return float(value)
+        units = {b"d": 86400, b"h": 3600, b"m": 60, b"s": 1}
+        return float(sum(int(part[:-1]) * units[part[-1:]] for part in value.split()))
+    except (ValueError, KeyError):
+        return None
+
+
+def format_print_time(seconds):
+    """Format a print time like PrusaSlicer, for example "1h 2m 3s" or "45s".
+
+    Parameters
+    ----------
+    seconds : The print time in seconds.
+
+    Returns
+    -------
+    print_time : The print time as text.
+    """
+
+    seconds = round(seconds)
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+
+    # Units are written from the first one which is not zero
+    parts = [(days, "d"), (hours, "h"), (minutes, "m"), (seconds, "s")]
+    while len(parts) > 1 and not parts[0][0]:
+        parts.pop(0)
+
+    return " ".join(f"{value}{unit}" for value, unit in parts)
+
+
+def estimate_gcode_file(gcode_file_path, acceleration=None):
+    """Estimate the print time and filament of a G-code file, without writing anything.
+
+    Parameters
+    ----------
+    gcode_file_path : The relative path of the G code file.
+    acceleration : The acceleration of the moves in mm/s², None to only limit them by their feedrate.
+
+    Returns
+    -------
+    print_estimate : A PrintEstimate.
+    """
+
+    with open_gcode(gcode_file_path) as input_file, \
+            EstimatingWriter(open(os.devnull, "w"), acceleration) as writer:
+        while block := input_file.read(ESTIMATE_READ_SIZE):
+            writer.write(block)
+
+    return writer.estimate()
+
+
+def print_estimate_summary(print_estimate):
+    """Print a PrintEstimate. It can be given as on_estimate to gcode_editor().
+
+    Parameters
+    ----------
+    print_estimate : A PrintEstimate.
+
+    Returns
+    -------
+
+    """
+
+    print(f"Estimated printing time : {format_print_time(print_estimate.seconds)}, filament used : "
+          f"{print_estimate.filament_mm:.2f} mm, {len(print_estimate.layer_seconds)} layers, "
+          f"{print_estimate.moves} moves")
@@ -0,0 +1,594 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from collections import namedtuple
+
+from batch import batch_output_path, expand_paths, load_parameters
+from gcode_codecs import gcode_codec, gcode_metadata_blocks, open_gcode
+from gcode_editor import (FEEDRATE_PATTERN, G1_PATTERN, GRID_HEATING_PATHS, HEATING_PATHS, LAYER_EXTRUDE_FACTOR,
+                          LAYER_PHASE_NUM, LAYER_SPEED_MULT, LAYER_TEMPERATURE, OPTIMIZED_HEATING_PATHS,
+                          OUTPUT_BUFFER_SIZE, PHASE_MAPPINGS, PERIMETER_SEPARATOR, compute_layer_table, edit_g1_line,
+                          find_layer_feedrate, find_layer_heights, format_heating_phase, format_temperature_setup,
+                          get_coordinate, tag_modified_line)
+from gcode_ir import AXES, OP_COMMENT, OP_G1, find_gcode_ir, format_ir_lines, format_ir_words
+from print_estimate import EstimatingWriter
+
+# Kinds of the values of the templates of a SweepGcode. The X, Y, Z, E and F words of the standard G1 lines, the
+# temperature setup written after a ";BEFORE_LAYER_CHANGE" line, the heating phase written before a ";LAYER_CHANGE"
+# line and the other G1 lines, edited word by word.
+SLOT_X = 0
+SLOT_Y = 1
+SLOT_Z = 2
+SLOT_E = 3
+SLOT_F = 4
+SLOT_TEMPERATURE = 5
+SLOT_HEATING = 6
+SLOT_OTHER = 7
+SLOT_KINDS = 8
+
+# Placeholder of each kind of value in the templates. X, Y and E are formatted with 3 decimals, Z is copied as text, F
+# is copied as text or a float formatted like str(), the others are text. A template is formatted twice : first with
+# the X, Y and Z words, which only depend on the shift of the workpiece and are shared by the parameter sets with the
+# same shift, then with the values of each parameter set. The placeholders of the second step are escaped for the
+# first one.
+SLOT_FORMATS = (" X%.3f", " Y%.3f", " Z%s", " E%%.3f", " F%%s", "%%s", "%%s", "%%s")
+SHIFT_SLOT_KINDS = (SLOT_X, SLOT_Y, SLOT_Z)
+
+# References to a line which is not a standard G1 line in SweepGcode.coord_refs : a separator between two external
+# perimeters, and the first reference to a line of other_lines (the next ones go down)
+COORD_SEPARATOR = -1
+COORD_OTHER = -2
+
+# Amount of parameter sets edited together by sweep_gcode_file(), their output files are open at the same time
+SWEEP_GROUP_SIZE = 32
+
+# A layer table row for the coordinates of the lines edited word by word, which only depend on the shift
+NEUTRAL_LAYER_ROW = [0, 0, 100, np.nan, 100]
+
+# The GcodeIR of a G-code file parsed once by parse_sweep_gcode() to be edited with many parameter sets. The G-code is
+# cut in blocks of whole layers. templates holds the text of each block where every value that depends on the
+# parameters is a placeholder (see SLOT_FORMATS), and the values of block i are described by slot_kinds and slot_refs
+# from slot_bounds[i] to slot_bounds[i + 1], in the order of the placeholders. Each slot refers to a row of a column :
+#  - x, y, e and f : the words of the standard G1 lines as floats (NaN when absent), z_text and f_text as text ("" when
+#    absent), g1_layers the layer number of each G1 line ;
+#  - other_lines and other_layers : the G1 lines that G1_PATTERN cannot parse and their layer number ;
+#  - the layer number for a temperature setup, the layer number before the ";LAYER_CHANGE" line for a heating phase.
+# coord_refs lists the lines whose coordinates are collected for the heating phases (a row of x and y, COORD_SEPARATOR
+# or COORD_OTHER - row of other_lines), the coordinates of heating phase i are coord_refs[heating_bounds[i - 1]:
+# heating_bounds[i]]. heating_feedrates gives for each heating phase the last move with an F word before it, whose
+# feedrate is set again after an optimized heating path (see find_layer_feedrate()) : (SLOT_F, row of f),
+# (SLOT_OTHER, row of other_lines), (None, text of an F value copied as it is) or None.
+SweepGcode = namedtuple("SweepGcode", ["total_layers", "templates", "slot_bounds", "slot_kinds", "slot_refs", "x", "y",
+                                       "z_text", "e", "f", "f_text", "g1_layers", "other_lines", "other_layers",
+                                       "coord_refs", "heating_bounds", "heating_feedrates"])
+
+# Outcome of each parameter set of sweep_gcode_file()
+SweepResult = namedtuple("SweepResult", ["parameter_file_path", "output_file_path", "status", "message"])
+
+
+def parse_sweep_gcode(gcode_ir, buffer_size=OUTPUT_BUFFER_SIZE):
+    """Parse G-code once for sweep_gcode_file(). The lines of a GcodeIR are read like iter_edited_range() does with the
+    regex engine, but instead of editing them, the values that depend on the parameters are kept in columns and
+    replaced by placeholders in the text. The words of the moves of the IR are taken from its columns, the lines kept as
+    text are parsed like a file opened in text mode.
+
+    Parameters
+    ----------
+    gcode_ir : A GcodeIR, see find_gcode_ir().
+    buffer_size : Amount of characters of whole layers gathered in each template.
+
+    Returns
+    -------
+    sweep_gcode : A SweepGcode.
+    """
+
+    # Initialize counters and variables
+    layer_counter = 0
+    entry_layer = 0
+    external_coord = False
+    collected_coords = False
+
+    # The lines of the IR. The words of each move are given by a bit per word, in the order of the slots.
+    opcodes = gcode_ir.opcodes.tolist()
+    text_index = gcode_ir.text_index.tolist()
+    text_offsets = gcode_ir.text_offsets.tolist()
+    text_bytes = gcode_ir.text_bytes.tobytes()
+    word_masks = ((gcode_ir.formats >= 0) @ (1 << np.arange(len(AXES)))).tolist()
+    last_line = len(opcodes) - 1
+
+    # The template and the slot kinds of a move of the IR, for each combination of words
+    move_kinds = [[kind for kind in range(len(AXES)) if word_mask >> kind & 1] for word_mask in range(1 << len(AXES))]
+    move_templates = ["G1" + "".join(SLOT_FORMATS[kind] for kind in kinds) + "  ;Modified\n" for kinds in move_kinds]
+
+    # The standard G1 lines : moves of the IR (a row of the IR) and lines kept as text (the text of their words), and
+    # the other G1 lines
+    g1_layers, move_refs, move_rows, text_refs, text_words = [], [], [], [], []
+    other_lines, other_layers = [], []
+
+    # Templates and their slots
+    templates, slot_bounds, slot_kinds, slot_refs = [], [0], [], []
+    template_parts = []
+    template_size = 0
+
+    # Lines whose coordinates are collected for the heating phases, and the last move with an F word (F is modal)
+    coord_refs, heating_bounds = [], []
+    heating_feedrates, layer_feedrate = [], None
+
+    for i, opcode in enumerate(opcodes):
+
+        # A G1 move of the IR. One placeholder for each word of the line.
+        if opcode == OP_G1 and text_index[i] < 0:
+            entry_layer = layer_counter
+            word_mask = word_masks[i]
+            template_part = move_templates[word_mask]
+            kinds = move_kinds[word_mask]
+            slot_kinds.extend(kinds)
+            slot_refs.extend([len(g1_layers)] * len(kinds))
+
+            if word_mask >> SLOT_F & 1:
+                layer_feedrate = SLOT_F, len(g1_layers)
+            if external_coord and word_mask & 3 == 3:
+                coord_refs.append(len(g1_layers))
+                collected_coords = True
+            move_refs.append(len(g1_layers))
+            move_rows.append(i)
+            g1_layers.append(layer_counter)
+
+            template_parts.append(template_part)
+            template_size += len(template_part)
+            continue
+
+        # The other lines as read from a file opened in text mode, the G0 moves are rebuilt from the columns
+        if text_index[i] >= 0:
+            line = text_bytes[text_offsets[text_index[i]]:text_offsets[text_index[i] + 1]].decode()
+        else:
+            line = format_ir_lines(gcode_ir, i, i + 1)[0].decode()
+        if line.endswith("\r"):
+            line = line[:-1]
+        if i < last_line or gcode_ir.final_newline:
+            line += "\n"
+
+        # Text copied as it is, a "%" must not be taken for a placeholder in any of the two formatting steps
+        template_part = None
+
+        # A comment. We used some of them for control.
+        if opcode == OP_COMMENT:
+
+            if line.startswith(";LAYER_CHANGE"):
+                # Heat current layer before start the next
+                if layer_counter > 0:
+                    template_parts.append(SLOT_FORMATS[SLOT_HEATING])
+                    slot_kinds.append(SLOT_HEATING)
+                    slot_refs.append(layer_counter)
+                    heating_bounds.append(len(coord_refs))
+                    heating_feedrates.append(layer_feedrate)
+                    collected_coords = False
+
+                # The template holds whole layers
+                if template_size >= buffer_size:
+                    templates.append("".join(template_parts))
+                    slot_bounds.append(len(slot_kinds))
+                    template_parts.clear()
+                    template_size = 0
+
+                layer_counter += 1
+
+            elif line.startswith(";BEFORE_LAYER_CHANGE"):
+                # The temperature of the layer of the last instruction
+                template_parts.append(SLOT_FORMATS[SLOT_TEMPERATURE])
+                slot_kinds.append(SLOT_TEMPERATURE)
+                slot_refs.append(entry_layer)
+
+            elif line.startswith(";TYPE:External perimeter"):
+                # The grid heating path must not join the end of a perimeter to the start of the next one
+                if collected_coords:
+                    coord_refs.append(COORD_SEPARATOR)
+                external_coord = True
+
+            elif external_coord and line.startswith(";WIPE_START"):
+                external_coord = False
+
+        # A normal G-code line. We have to edit some of them.
+        else:
+            entry_layer = layer_counter
+
+            if line.startswith("G1"):
+                match = G1_PATTERN.match(line)
+                if match is None:
+                    # Edited word by word with the parameters of the layer
+                    template_part = SLOT_FORMATS[SLOT_OTHER]
+                    slot_kinds.append(SLOT_OTHER)
+                    slot_refs.append(len(other_lines))
+                    if external_coord and get_coordinate(edit_g1_line(line, NEUTRAL_LAYER_ROW, 0, 0)):
+                        coord_refs.append(COORD_OTHER - len(other_lines))
+                        collected_coords = True
+                    if FEEDRATE_PATTERN.match(line):
+                        layer_feedrate = SLOT_OTHER, len(other_lines)
+                    other_lines.append(line)
+                    other_layers.append(layer_counter)
+                else:
+                    # One placeholder for each word of the line
+                    template_part = ["G1"]
+                    for kind, value in enumerate(match.groups()):
+                        if value is not None:
+                            template_part.append(SLOT_FORMATS[kind])
+                            slot_kinds.append(kind)
+                            slot_refs.append(len(g1_layers))
+                    template_part.append("  ;Modified\n")
+                    template_part = "".join(template_part)
+
+                    x, y, z, e, f = match.groups()
+                    if f is not None:
+                        layer_feedrate = SLOT_F, len(g1_layers)
+                    if external_coord and x is not None and y is not None:
+                        coord_refs.append(len(g1_layers))
+                        collected_coords = True
+                    text_refs.append(len(g1_layers))
+                    text_words.append(match.groups())
+                    g1_layers.append(layer_counter)
+
+            # Other moves are copied as they are
+            elif line.startswith("G") and (match := FEEDRATE_PATTERN.match(line)):
+                layer_feedrate = None, match.group(1)
+
+            # The temperature lines are only tagged
+            elif line.startswith(("M104", "M109")):
+                modified_line_parts = line.split()
+                tag_modified_line(modified_line_parts)
+                line = " ".join(modified_line_parts)
+
+        if template_part is None:
+            template_part = line.replace("%", "%%%%")
+        template_parts.append(template_part)
+        template_size += len(line)
+
+    # The last template
+    templates.append("".join(template_parts))
+    slot_bounds.append(len(slot_kinds))
+
+    # The columns of the standard G1 lines, from the columns of the IR and from the text of the other ones
+    x_column, y_column, e_column, f_column = (np.full(len(g1_layers), np.nan) for _ in range(4))
+    z_column, f_text_column = np.full(len(g1_layers), "", dtype=object), np.full(len(g1_layers), "", dtype=object)
+    move_rows = np.array(move_rows, dtype=np.int64)
+    for column, ir_column in ((x_column, gcode_ir.x), (y_column, gcode_ir.y), (e_column, gcode_ir.e),
+                              (f_column, gcode_ir.f)):
+        column[move_refs] = ir_column[move_rows]
+    for column, axis in ((z_column, "Z"), (f_text_column, "F")):
+        column[move_refs] = [word_text.decode() for word_text in format_ir_words(gcode_ir, move_rows, axis)]
+    for ref, (x, y, z, e, f) in zip(text_refs, text_words):
+        x_column[ref], y_column[ref], e_column[ref], f_column[ref] = (np.nan if value is None else float(value)
+                                                                      for value in (x, y, e, f))
+        z_column[ref], f_text_column[ref] = z or "", f or ""
+
+    return SweepGcode(total_layers=layer_counter, templates=templates,
+                      slot_bounds=np.array(slot_bounds, dtype=np.int64),
+                      slot_kinds=np.array(slot_kinds, dtype=np.int8), slot_refs=np.array(slot_refs, dtype=np.int64),
+                      x=x_column, y=y_column, z_text=z_column, e=e_column, f=f_column, f_text=f_text_column,
+                      g1_layers=np.array(g1_layers, dtype=np.int64), other_lines=other_lines,
+                      other_layers=np.array(other_layers, dtype=np.int64),
+                      coord_refs=np.array(coord_refs, dtype=np.int64),
+                      heating_bounds=np.array(heating_bounds, dtype=np.int64), heating_feedrates=heating_feedrates)
+
+
+def format_sweep_heatings(sweep_gcode, shift_x, shift_y, heating_path="box"):
+    """Format the heating phases of a SweepGcode for a shift of the workpiece. They only depend on the shift, all the
+    parameter sets with the same shift share them. The feedrate set again after an optimized heating path depends on
+    the speed of each parameter set, it is left as a "%s" placeholder (see format_heating_feedrates()).
+
+    Parameters
+    ----------
+    sweep_gcode : A SweepGcode.
+    shift_x : The shift of the workpiece on X axis.
+    shift_y : The shift of the workpiece on Y axis.
+    heating_path : How the heating path is computed, one of HEATING_PATHS.
+
+    Returns
+    -------
+    heating_texts : An array of the G-code of the heating phase written before each ";LAYER_CHANGE" line, by layer
+    number before the line. The value of layer 0 is empty.
+    """
+
+    # Coordinates as written in the modified lines. round() gives the value written with 3 decimals.
+    x_list = (sweep_gcode.x + shift_x).tolist()
+    y_list = (sweep_gcode.y + shift_y).tolist()
+    coords = []
+    for ref in sweep_gcode.coord_refs.tolist():
+        if ref >= 0:
+            coords.append([round(x_list[ref], 3), round(y_list[ref], 3)])
+        elif ref == COORD_SEPARATOR:
+            coords.append(PERIMETER_SEPARATOR)
+        else:
+            other_line = sweep_gcode.other_lines[COORD_OTHER - ref]
+            coords.append(get_coordinate(edit_g1_line(other_line, NEUTRAL_LAYER_ROW, shift_x, shift_y)))
+    coord_array = np.array(coords, dtype=float).reshape(-1, 2)
+
+    # Only the grid heating path separates the external perimeters
+    if heating_path not in GRID_HEATING_PATHS:
+        coord_array = coord_array[sweep_gcode.coord_refs != COORD_SEPARATOR]
+        heating_bounds = np.searchsorted(np.flatnonzero(sweep_gcode.coord_refs != COORD_SEPARATOR),
+                                         sweep_gcode.heating_bounds)
+    else:
+        heating_bounds = sweep_gcode.heating_bounds
+
+    heating_texts = np.full(sweep_gcode.total_layers + 1, "", dtype=object)
+    start = 0
+    for layer, end in enumerate(heating_bounds.tolist(), 1):
+        feedrate = None
+        if heating_path in OPTIMIZED_HEATING_PATHS and sweep_gcode.heating_feedrates[layer - 1] is not None:
+            feedrate = "%s"
+        heating_texts[layer] = format_heating_phase(coord_array[start:end], heating_path, feedrate)
+        start = end
+
+    return heating_texts
+
+
+def format_heating_feedrates(sweep_gcode, heating_texts, parameter_set, layer_rows, modified_layers, layer_table):
+    """Fill the feedrate of the heating phases of an optimized heating path for a parameter set, with the value of the
+    last move with an F word before each heating phase as written in the edited G-code.
+
+    Parameters
+    ----------
+    sweep_gcode : A SweepGcode.
+    heating_texts : The heating phases of the shift of the set, see format_sweep_heatings().
+    parameter_set : A ParameterSet.
+    layer_rows : The layer table of the set as a list of rows.
+    modified_layers : An array telling for each layer if its speed is modified.
+    layer_table : The layer table of the set, see compute_layer_table().
+
+    Returns
+    -------
+    heating_texts : An array of the G-code of the heating phase written before each ";LAYER_CHANGE" line.
+    """
+
+    heating_texts = heating_texts.copy()
+
+    for layer, heating_feedrate in enumerate(sweep_gcode.heating_feedrates, 1):
+        if heating_feedrate is None:
+            continue
+        kind, ref = heating_feedrate
+
+        # Same value as the F word of the edited line
+        if kind == SLOT_F:
+            g1_layer = sweep_gcode.g1_layers[ref]
+            if modified_layers[g1_layer]:
+                feedrate = "%s" % (sweep_gcode.f[ref] * layer_table[g1_layer, LAYER_SPEED_MULT]/100)
+            else:
+                feedrate = sweep_gcode.f_text[ref]
+        elif kind == SLOT_OTHER:
+            feedrate = find_layer_feedrate([edit_g1_line(sweep_gcode.other_lines[ref],
+                                                         layer_rows[sweep_gcode.other_layers[ref]],
+                                                         parameter_set.shift_x, parameter_set.shift_y)])
+        else:
+            feedrate = ref
+
+        heating_texts[layer] = heating_texts[layer] % feedrate
+
+    return heating_texts
+
+
+def sweep_gcode_file(gcode_file_path, parameter_sets, output_file_paths, heating_path="box", phase_mapping="layer",
+                     buffer_size=OUTPUT_BUFFER_SIZE):
+    """Edit a G-code file with many parameter sets. The GcodeIR of the file, saved next to it by find_gcode_ir(), is
+    parsed once with parse_sweep_gcode(), then each block of layers is edited for a group of parameter sets at once :
+    the extrusion amounts and speeds of all sets are computed on (sets, lines) arrays and each output is formatted with
+    a single operation per block. The heating phases are computed once per shift of the workpiece. Each output is
+    identical to the output of edit_gcode_file() with the same parameters.
+
+    Parameters
+    ----------
+    gcode_file_path : The relative path of the G code file to edit.
+    parameter_sets : A list of ParameterSet, see load_parameter_file() and new_parameter_set().
+    output_file_paths : The relative path of the new G code file of each parameter set.
+    heating_path : How the heating path is computed, one of HEATING_PATHS.
+    phase_mapping : How the phases are placed on the part, one of PHASE_MAPPINGS.
+    buffer_size : Amount of characters of whole layers formatted and written at once.
+
+    Returns
+    -------
+
+    """
+
+    # Parse the G-code once, the IR saved next to the file by a previous sweep is reused
+    sweep_gcode = parse_sweep_gcode(find_gcode_ir(gcode_file_path), buffer_size)
+    layer_heights = find_layer_heights(gcode_file_path) if phase_mapping == "height" else None
+
+    # A binary G-code file keeps the metadata of the input, with the estimates of its G-code (see EstimatingWriter)
+    metadata_blocks = ()
+    if any(gcode_codec(output_file_path) == "bgcode" for output_file_path in output_file_paths):
+        metadata_blocks = gcode_metadata_blocks(gcode_file_path)
+
+    # The heating phases of each shift
+    heating_texts = {}
+    for parameter_set in parameter_sets:
+        shift = parameter_set.shift_x, parameter_set.shift_y
+        if parameter_set.activate_heating and shift not in heating_texts:
+            heating_texts[shift] = format_sweep_heatings(sweep_gcode, *shift, heating_path)
+
+    for group_start in range(0, len(parameter_sets), SWEEP_GROUP_SIZE):
+        group_end = group_start + SWEEP_GROUP_SIZE
+        output_files = [EstimatingWriter(open_gcode(output_file_path, "w", metadata_blocks))
+                        if gcode_codec(output_file_path) == "bgcode" else open_gcode(output_file_path, "w")
+                        for output_file_path in output_file_paths[group_start:group_end]]
+        try:
+            write_sweep_group(sweep_gcode, parameter_sets[group_start:group_end], output_files, heating_texts,
+                              layer_heights, heating_path)
+        finally:
+            for output_file in output_files:
+                output_file.close()
+
+
+def write_sweep_group(sweep_gcode, parameter_sets, output_files, heating_texts, layer_heights=None,
+                      heating_path="box"):
+    """Edit the blocks of a SweepGcode for a group of parameter sets and write them to their output files.
+
+    Parameters
+    ----------
+    sweep_gcode : A SweepGcode.
+    parameter_sets : A list of ParameterSet.
+    output_files : The file in which to write the G-code of each parameter set.
+    heating_texts : A dictionary giving the heating phases of each (shift_x, shift_y) pair, see
+    format_sweep_heatings().
+    layer_heights : The Z height of each layer to place the phases by height, None to place them by layer number.
+    heating_path : How the heating path is computed, one of HEATING_PATHS.
+
+    Returns
+    -------
+
+    """
+
+    # The layer table of each set, in a (sets, layers, columns) array
+    layer_tables = np.stack([compute_layer_table(parameter_set.parameter_array, parameter_set.extrude_ratio_array,
+                                                 sweep_gcode.total_layers, layer_heights)
+                             for parameter_set in parameter_sets])
+    layer_rows = [layer_table.tolist() for layer_table in layer_tables]
+    modified_layers = layer_tables[:, :, LAYER_PHASE_NUM] > 0
+
+    # The temperature setup of each layer, only after phase 0
+    temperature_texts = np.full(modified_layers.shape, "", dtype=object)
+    for i, layer in zip(*np.nonzero(modified_layers)):
+        temperature_texts[i, layer] = format_temperature_setup(layer_tables[i, layer, LAYER_TEMPERATURE])
+
+    # The heating phases of each set, none without heating
+    no_heating = np.full(sweep_gcode.total_layers + 1, "", dtype=object)
+    set_heating_texts = [heating_texts[parameter_set.shift_x, parameter_set.shift_y]
+                         if parameter_set.activate_heating else no_heating for parameter_set in parameter_sets]
+    if heating_path in OPTIMIZED_HEATING_PATHS:
+        set_heating_texts = [format_heating_feedrates(sweep_gcode, set_heating_texts[i], parameter_set, layer_rows[i],
+                                                      modified_layers[i], layer_tables[i])
+                             if parameter_set.activate_heating else no_heating
+                             for i, parameter_set in enumerate(parameter_sets)]
+
+    for block, template in enumerate(sweep_gcode.templates):
+
+        # The slots of the block, apart for the shift and for each set. Their placeholders come in this order in the
+        # template and in the template formatted for a shift.
+        slot_start, slot_end = sweep_gcode.slot_bounds[block:block + 2]
+        slot_kinds = sweep_gcode.slot_kinds[slot_start:slot_end]
+        slot_refs = sweep_gcode.slot_refs[slot_start:slot_end]
+        shift_slots = np.isin(slot_kinds, SHIFT_SLOT_KINDS)
+        shift_kinds, set_kinds = slot_kinds[shift_slots], slot_kinds[~shift_slots]
+        positions = [np.flatnonzero((shift_kinds if kind in SHIFT_SLOT_KINDS else set_kinds) == kind)
+                     for kind in range(SLOT_KINDS)]
+        refs = [(slot_refs[shift_slots] if kind in SHIFT_SLOT_KINDS else slot_refs[~shift_slots])[positions[kind]]
+                for kind in range(SLOT_KINDS)]
+
+        # The template of each shift
+        shift_templates = {}
+        for parameter_set in parameter_sets:
+            shift = parameter_set.shift_x, parameter_set.shift_y
+            if shift not in shift_templates:
+                values = np.empty(len(shift_kinds), dtype=object)
+                values[positions[SLOT_X]] = sweep_gcode.x[refs[SLOT_X]] + shift[0]
+                values[positions[SLOT_Y]] = sweep_gcode.y[refs[SLOT_Y]] + shift[1]
+                values[positions[SLOT_Z]] = sweep_gcode.z_text[refs[SLOT_Z]]
+                shift_templates[shift] = template % tuple(values.tolist())
+
+        # Extrusion amounts and speeds of every set at once
+        e_layers = sweep_gcode.g1_layers[refs[SLOT_E]]
+        e_values = sweep_gcode.e[refs[SLOT_E]] * layer_tables[:, e_layers, LAYER_EXTRUDE_FACTOR]/100
+        f_layers = sweep_gcode.g1_layers[refs[SLOT_F]]
+        f_values = sweep_gcode.f[refs[SLOT_F]] * layer_tables[:, f_layers, LAYER_SPEED_MULT]/100
+        f_modified = modified_layers[:, f_layers]
+        f_texts = sweep_gcode.f_text[refs[SLOT_F]]
+
+        for i, (parameter_set, output_file) in enumerate(zip(parameter_sets, output_files)):
+            values = np.empty(len(set_kinds), dtype=object)
+            values[positions[SLOT_E]] = e_values[i]
+
+            # Speed is only modified after phase 0
+            speeds = f_texts.copy()
+            speeds[f_modified[i]] = f_values[i][f_modified[i]]
+            values[positions[SLOT_F]] = speeds
+
+            values[positions[SLOT_TEMPERATURE]] = temperature_texts[i, refs[SLOT_TEMPERATURE]]
+            values[positions[SLOT_HEATING]] = set_heating_texts[i][refs[SLOT_HEATING]]
+            values[positions[SLOT_OTHER]] = [edit_g1_line(sweep_gcode.other_lines[ref],
+                                                          layer_rows[i][sweep_gcode.other_layers[ref]],
+                                                          parameter_set.shift_x, parameter_set.shift_y)
+                                             for ref in refs[SLOT_OTHER].tolist()]
+
+            shift_template = shift_templates[parameter_set.shift_x, parameter_set.shift_y]
+            output_file.write(shift_template % tuple(values.tolist()))
+
+
+def run_sweep(gcode_file_path, parameter_file_paths, output_folder="output/", heating_path="box",
+              phase_mapping="layer"):
+    """Edit a G-code file with every parameter file in a single sweep. Each parameter file is extracted and checked
+    once, the files which cannot be used are reported and skipped.
+
+    Parameters
+    ----------
+    gcode_file_path : The relative path of the G code file to edit.
+    parameter_file_paths : A list of relative paths of parameter files.
+    output_folder : The folder of the new G-code files, see batch_output_path().
+    heating_path : How the heating path is computed, one of HEATING_PATHS.
+    phase_mapping : How the phases are placed on the part, one of PHASE_MAPPINGS.
+
+    Returns
+    -------
+    results : A list of SweepResult, in the order of the parameter files.
+    """
+
+    # Extract and check each parameter file once
+    parameters = load_parameters(parameter_file_paths)
+    valid_paths = [path for path in parameters if not isinstance(parameters[path], str)]
+    output_file_paths = {path: batch_output_path(gcode_file_path, path, output_folder) for path in parameters}
+
+    os.makedirs(output_folder, exist_ok=True)
+
+    status, message = "ok", ""
+    try:
+        sweep_gcode_file(gcode_file_path, [parameters[path] for path in valid_paths],
+                         [output_file_paths[path] for path in valid_paths], heating_path, phase_mapping)
+    except Exception as e:
+        status, message = "error", f"{type(e).__name__}: {e}"
+
+    return [SweepResult(path, output_file_paths[path], status, message) if path in valid_paths else
+            SweepResult(path, output_file_paths[path], "invalid", parameters[path]) for path in parameters]
+
+
+def main(argv=None):
+    """Command line interface of the parameter sweep.
+
+    Example :
+    python sweep.py input/part.gcode "parameter/*.txt" --output output/
+
+    Parameters
+    ----------
+    argv : The command line arguments, sys.argv is used if None.
+
+    Returns
+    -------
+    exit_code : 0 if every parameter file was used, 1 otherwise.
+    """
+
+    parser = argparse.ArgumentParser(description="Edit a G-code file with many parameter files in a single sweep.")
+    parser.add_argument("gcode", help="G-code file to edit")
+    parser.add_argument("parameter", nargs="+", help="Parameter files or glob patterns")
+    parser.add_argument("--output", default="output/", help="Folder of the new G-code files")
+    parser.add_argument("--heating-path", choices=HEATING_PATHS, default="box", help="How the heating path is computed")
+    parser.add_argument("--phase-mapping", choices=PHASE_MAPPINGS, default="layer",
+                        help="How the phases are placed on the part")
+    args = parser.parse_args(argv)
+
+    start_time = time.perf_counter()
+    results = run_sweep(args.gcode, expand_paths(args.parameter), args.output, args.heating_path,
+                        args.phase_mapping)
+
+    for result in results:
+        print(f"{result.status:<7} {result.parameter_file_path} -> {result.output_file_path}")
+        if result.message:
+            print(f"        {result.message}")
+
+    nb_ok = sum(result.status == "ok" for result in results)
+    print(f"{nb_ok}/{len(results)} parameter files applied in {time.perf_counter() - start_time:.3f} s.")
+
+    return 0 if nb_ok == len(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
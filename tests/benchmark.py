@@ -0,0 +1,500 @@
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# The benchmark can be run from any folder
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_FOLDER)
+
+import gcode_editor as gce  # noqa: E402
+import layer_index  # noqa: E402
+
+PARAMETER_PATH = os.path.join(ROOT_FOLDER, "parameter", "example_parameter.txt")
+HISTORY_PATH = os.path.join(ROOT_FOLDER, "tests", "benchmark_history.json")
+
+# Stages timed by run_benchmark(), in order
+STAGES = ("parameter_load", "layer_scan", "layer_index_load", "g1_rewrite_split", "g1_rewrite_regex",
+          "g1_rewrite_numpy", "heating_path", "output_write", "full_edit")
+
+# Average length of a line of the synthetic G-code, used to reach the requested size
+SYNTHETIC_LINE_LENGTH = 26
+
+# Side of the square printed by the synthetic G-code, in mm, and its center on the bed
+SYNTHETIC_SIDE = 40.0
+SYNTHETIC_CENTER = 125.0
+
+
+def format_synthetic_layer(layer, layer_height, nb_infill_lines, rng):
+    """Format one layer of synthetic G-code with the structure of a PrusaSlicer file : layer change comments, a wipe,
+    a perimeter, an external perimeter and a zigzag infill.
+
+    Parameters
+    ----------
+    layer : The number of the layer, from 1.
+    layer_height : Height of each layer.
+    nb_infill_lines : Amount of G1 lines of the infill.
+    rng : A numpy random generator.
+
+    Returns
+    -------
+    layer_gcode : The G-code of the layer.
+    """
+
+    z = round(layer * layer_height, 3)
+    low = SYNTHETIC_CENTER - SYNTHETIC_SIDE/2
+    high = SYNTHETIC_CENTER + SYNTHETIC_SIDE/2
+
+    # Layer change, wipe and travel
+    lines = [f";LAYER_CHANGE\n;Z:{z:g}\n;HEIGHT:{layer_height:g}\n;BEFORE_LAYER_CHANGE\nG92 E0.0\n;{z:g}\n\n\n",
+             "G1 E-.64 F2100\n;WIPE_START\nG1 F9600\n",
+             f"G1 X{low + 1:.3f} Y{low + 1:.3f} E-.152\n;WIPE_END\nG1 E-.008 F2100\n",
+             f"G1 Z{z:g} F720\n;AFTER_LAYER_CHANGE\n;{z:g}\n"]
+
+    # A temperature change from time to time
+    if layer % 10 == 0:
+        lines.append(f"M104 S{200 + layer % 20}\n")
+
+    # Perimeter then external perimeter, as squares
+    for type_name, margin in (("Perimeter", 0.4), ("External perimeter", 0.0)):
+        corners = [(low + margin, low + margin), (high - margin, low + margin), (high - margin, high - margin),
+                   (low + margin, high - margin), (low + margin, low + margin)]
+        lines.append(f"G1 X{corners[0][0]:.3f} Y{corners[0][1]:.3f} F12000\nM204 P700\n;TYPE:{type_name}\n"
+                     f";WIDTH:0.45\nG1 F1500\n")
+        lines.extend(f"G1 X{x:.3f} Y{y:.3f} E{SYNTHETIC_SIDE * 0.033:.5f}\n" for x, y in corners[1:])
+
+    # Zigzag infill between the perimeters, formatted at once
+    x = rng.uniform(low + 1, high - 1, nb_infill_lines)
+    y = np.linspace(low + 1, high - 1, nb_infill_lines)
+    e = np.abs(np.diff(x, prepend=x[0])) * 0.033 + 0.01
+    infill = np.column_stack((x, y, e)).ravel().tolist()
+    lines.append("M204 P1500\n;TYPE:Solid infill\n;WIDTH:0.45305\nG1 F2116\n")
+    lines.append(("G1 X%.3f Y%.3f E%.5f\n" * nb_infill_lines) % tuple(infill))
+
+    return "".join(lines)
+
+
+def generate_synthetic_gcode(gcode_file_path, total_layers=500, size_mb=10, layer_height=0.2, seed=0):
+    """Write a synthetic G-code file with the structure of a file sliced by PrusaSlicer, of about the requested size.
+
+    Parameters
+    ----------
+    gcode_file_path : The path of the file to write.
+    total_layers : Amount of layers.
+    size_mb : The approximate size of the file, in MB.
+    layer_height : Height of each layer.
+    seed : The seed of the random infill.
+
+    Returns
+    -------
+    size : The size of the file in bytes.
+    """
+
+    rng = np.random.default_rng(seed)
+
+    # Most of the size is in the infill lines
+    nb_infill_lines = max(1, int(size_mb * 1e6 / total_layers / SYNTHETIC_LINE_LENGTH) - 30)
+
+    with open(gcode_file_path, "w") as file:
+        file.write("; generated by tests/benchmark.py\n\nM104 S215 ; set extruder temp\nM109 S215 ; wait for "
+                   "extruder temp\nG28 ; home all without mesh bed level\nG92 E0\n")
+        for layer in range(1, total_layers + 1):
+            file.write(format_synthetic_layer(layer, layer_height, nb_infill_lines, rng))
+        file.write(f"M107\n; filament used [mm] = 0\n; total layers count = {total_layers}\n\n"
+                   f"; prusaslicer_config = begin\n; layer_height = {layer_height:g}\n; prusaslicer_config = end\n")
+
+    return os.path.getsize(gcode_file_path)
+
+
+def time_call(function, *args, repeat=1, **kwargs):
+    """Time a function call, keeping the best of several runs.
+
+    Parameters
+    ----------
+    function : The function to call.
+    args : The positional arguments of the function.
+    repeat : The amount of runs.
+    kwargs : The keyword arguments of the function.
+
+    Returns
+    -------
+    seconds : The duration of the fastest run.
+    result : The result of the last run.
+    """
+
+    best = float("inf")
+    result = None
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+
+    return best, result
+
+
+def stage_result(seconds, items):
+    """Gather the result of a stage.
+
+    Parameters
+    ----------
+    seconds : The duration of the stage.
+    items : The amount of items processed by the stage.
+
+    Returns
+    -------
+    result : A dictionary with the duration, the amount of items and the throughput in items per second.
+    """
+
+    return {"seconds": seconds, "items": items, "throughput": items / seconds if seconds else None}
+
+
+def load_parameters_uncached(parameter_file_path):
+    """Load a parameter file with load_parameter_file() after emptying its cache, so that the file is parsed and
+    checked.
+
+    Parameters
+    ----------
+    parameter_file_path : The path of the parameter file.
+
+    Returns
+    -------
+    parameter_set : A ParameterSet.
+    """
+
+    gce.compile_parameter_file.cache_clear()
+
+    return gce.load_parameter_file(parameter_file_path)
+
+
+def read_sample_layers(gcode_file_path, max_lines):
+    """Read the first layers of a G-code file, up to an amount of lines, and collect what the stages need : the G1
+    lines of each layer with their external perimeter flag, and the lines of each layer.
+
+    Parameters
+    ----------
+    gcode_file_path : The path of the G-code file.
+    max_lines : The maximum amount of lines to read.
+
+    Returns
+    -------
+    layers : A list with, for each layer, the list of its lines.
+    g1_layers : A list with, for each layer, a list of (G1 line, external perimeter flag).
+    """
+
+    layers = [[]]
+    g1_layers = [[]]
+    external_coord = False
+
+    with open(gcode_file_path, "r") as file:
+        for nb_lines, line in enumerate(file):
+            if nb_lines >= max_lines:
+                break
+
+            if line.startswith(";LAYER_CHANGE"):
+                layers.append([])
+                g1_layers.append([])
+            elif line.startswith(";TYPE:External perimeter"):
+                external_coord = True
+            elif line.startswith(";WIPE_START"):
+                external_coord = False
+            elif line.startswith("G1"):
+                g1_layers[-1].append((line, external_coord))
+
+            layers[-1].append(line)
+
+    return layers, g1_layers
+
+
+def rewrite_layers(g1_layers, layer_entry, shift_x, shift_y, engine):
+    """Rewrite the G1 lines of some layers with one of the engines of gcode_editor, like edit_layer_range() does.
+
+    Parameters
+    ----------
+    g1_layers : A list with, for each layer, a list of (G1 line, external perimeter flag).
+    layer_entry : The row of the layer table to use for every line.
+    shift_x : The shift of the workpiece on X axis.
+    shift_y : The shift of the workpiece on Y axis.
+    engine : One of gce.ENGINES.
+
+    Returns
+    -------
+    coords : A list with, for each layer, an array of the [x, y] coordinates of its external perimeter.
+    """
+
+    coords = []
+    layer_coords = gce.CoordinateBuffer()
+
+    for g1_layer in g1_layers:
+        layer_coords.clear()
+
+        if engine == "numpy":
+            for i in range(0, len(g1_layer), gce.G1_BATCH_SIZE):
+                g1_lines, g1_external = zip(*g1_layer[i:i + gce.G1_BATCH_SIZE])
+                layer_coords.extend(gce.rewrite_g1_batch(g1_lines, g1_external, layer_entry, shift_x, shift_y)[1])
+        else:
+            for line, external in g1_layer:
+                modified_line = None
+                if engine == "regex":
+                    modified_line = gce.rewrite_g1_line(line, layer_entry, shift_x, shift_y,
+                                                        layer_coords if external else None)
+                if modified_line is None:
+                    modified_line = gce.edit_g1_line(line, layer_entry, shift_x, shift_y)
+                    if external and (coord := gce.get_coordinate(modified_line)):
+                        layer_coords.append(*coord)
+
+        coords.append(layer_coords.view().copy())
+
+    return coords
+
+
+def format_heating_layers(coords):
+    """Compute and format the heating phase of each layer, like edit_layer_range() does.
+
+    Parameters
+    ----------
+    coords : A list with, for each layer, an array of the [x, y] coordinates of its external perimeter.
+
+    Returns
+    -------
+
+    """
+
+    for layer_coords in coords:
+        if len(layer_coords):
+            upper, lower = gce.find_heating_path(layer_coords)
+            gce.format_heating_gcode(upper, lower)
+
+
+def write_layers(output_file_path, layers):
+    """Write lines layer by layer with flush_layer(), like iter_edited_range() does.
+
+    Parameters
+    ----------
+    output_file_path : The path of the file to write.
+    layers : A list with, for each layer, the list of its lines.
+
+    Returns
+    -------
+
+    """
+
+    output_buffer = io.StringIO()
+
+    with open(output_file_path, "w") as output_file:
+        for layer_lines in layers:
+            edited_block = gce.flush_layer(output_buffer, list(layer_lines), gce.OUTPUT_BUFFER_SIZE)
+            if edited_block:
+                output_file.write(edited_block)
+        edited_block = gce.flush_layer(output_buffer, [], 0)
+        if edited_block:
+            output_file.write(edited_block)
+
+
+def run_benchmark(gcode_file_path, work_folder, sample_lines=500000, repeat=3):
+    """Time each stage of the edition of a G-code file separately.
+
+    Parameters
+    ----------
+    gcode_file_path : The path of the G-code file.
+    work_folder : A folder for the output files.
+    sample_lines : The amount of lines read for the stages working in memory (G1 rewrite, heating path and output
+    write).
+    repeat : The amount of runs of each stage, the fastest is kept.
+
+    Returns
+    -------
+    results : A dictionary giving for each stage of STAGES its duration in seconds, the amount of items it processed
+    and its throughput in items per second. The items are files for parameter_load, bytes for the layer scans, output
+    write and full edit, G1 lines for the G1 rewrites and layers for heating_path.
+    """
+
+    results = {}
+    file_size = os.path.getsize(gcode_file_path)
+
+    # Parameter load, without the cache of load_parameter_file()
+    seconds, parameter_set = time_call(load_parameters_uncached, PARAMETER_PATH, repeat=repeat * 10)
+    results["parameter_load"] = stage_result(seconds, 1)
+
+    # Layer scan, then the layer offsets read from the saved index
+    seconds, index = time_call(layer_index.scan_layer_index, gcode_file_path, repeat=repeat)
+    results["layer_scan"] = stage_result(seconds, file_size)
+    layer_index.save_layer_index(gcode_file_path, index)
+    seconds, _ = time_call(gce.find_layer_offsets, gcode_file_path, repeat=repeat)
+    results["layer_index_load"] = stage_result(seconds, file_size)
+
+    # G1 rewrite of the sample, with a row of the layer table in the last phase so that every word is modified
+    layers, g1_layers = read_sample_layers(gcode_file_path, sample_lines)
+    nb_g1_lines = sum(len(g1_layer) for g1_layer in g1_layers)
+    layer_table = gce.compute_layer_table(parameter_set.parameter_array, parameter_set.extrude_ratio_array, 10)
+    layer_entry = layer_table.tolist()[-1]
+    coords = None
+    for engine in ("split", "regex", "numpy"):
+        seconds, coords = time_call(rewrite_layers, g1_layers, layer_entry, parameter_set.shift_x,
+                                    parameter_set.shift_y, engine, repeat=repeat)
+        results[f"g1_rewrite_{engine}"] = stage_result(seconds, nb_g1_lines)
+
+    # Heating path of each layer of the sample
+    seconds, _ = time_call(format_heating_layers, coords, repeat=repeat)
+    results["heating_path"] = stage_result(seconds, len(coords))
+
+    # Output write of the sample
+    output_file_path = os.path.join(work_folder, "benchmark-output.gcode")
+    seconds, _ = time_call(write_layers, output_file_path, layers, repeat=repeat)
+    results["output_write"] = stage_result(seconds, os.path.getsize(output_file_path))
+
+    # Full edition, for reference
+    seconds, _ = time_call(gce.edit_gcode_file, gcode_file_path, output_file_path, parameter_set, repeat=1)
+    results["full_edit"] = stage_result(seconds, file_size)
+    os.remove(output_file_path)
+
+    return results
+
+
+def get_version():
+    """Get the git commit of the project, to tell the entries of the history apart.
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    version : The short hash of the current commit, or None if it is unknown.
+    """
+
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_FOLDER, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def read_history(history_path):
+    """Read the history of benchmark results.
+
+    Parameters
+    ----------
+    history_path : The path of the JSON history file.
+
+    Returns
+    -------
+    history : A list of entries, the oldest first. Empty if the file does not exist.
+    """
+
+    if not os.path.exists(history_path):
+        return []
+
+    with open(history_path, "r") as file:
+        return json.load(file)
+
+
+def find_regressions(history, entry, tolerance):
+    """Compare the throughput of each stage with the last entry of the history run with the same configuration.
+
+    Parameters
+    ----------
+    history : A list of previous entries.
+    entry : The new entry.
+    tolerance : The relative loss of throughput from which a stage is reported, like 0.1 for 10 %.
+
+    Returns
+    -------
+    regressions : A list of (stage, previous throughput, new throughput), empty if there is no previous entry.
+    """
+
+    previous_entries = [previous for previous in history if previous["config"] == entry["config"]]
+    if not previous_entries:
+        return []
+    previous = previous_entries[-1]
+
+    regressions = []
+    for stage, result in entry["results"].items():
+        previous_result = previous["results"].get(stage)
+        if previous_result and previous_result["throughput"] and result["throughput"] is not None:
+            if result["throughput"] < previous_result["throughput"] * (1 - tolerance):
+                regressions.append((stage, previous_result["throughput"], result["throughput"]))
+
+    return regressions
+
+
+def main(argv=None):
+    """Command line interface of the benchmark.
+
+    Examples :
+    python tests/benchmark.py --size-mb 100 --layers 1000
+    python tests/benchmark.py --gcode input/xyz-10mm-calibration-cube_0.4n_0.2mm_PLA_MK4_8m.gcode --no-history
+
+    Parameters
+    ----------
+    argv : The command line arguments, sys.argv is used if None.
+
+    Returns
+    -------
+    exit_code : 1 if a regression was found with --fail-on-regression, 0 otherwise.
+    """
+
+    parser = argparse.ArgumentParser(description="Benchmark each stage of the G-code edition.")
+    parser.add_argument("--gcode", help="Benchmark this G-code file instead of a synthetic one")
+    parser.add_argument("--size-mb", type=float, default=10, help="Size of the synthetic G-code file, in MB")
+    parser.add_argument("--layers", type=int, default=500, help="Amount of layers of the synthetic G-code file")
+    parser.add_argument("--sample-lines", type=int, default=500000,
+                        help="Amount of lines used by the stages working in memory")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of each stage, the fastest is kept")
+    parser.add_argument("--history", default=HISTORY_PATH, help="JSON file keeping the results of each run")
+    parser.add_argument("--no-history", action="store_true", help="Do not save the results")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Relative loss of throughput reported as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with code 1 on a regression")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as work_folder:
+
+        # Input file
+        if args.gcode:
+            gcode_file_path = args.gcode
+            config = {"gcode": os.path.basename(args.gcode), "size": os.path.getsize(args.gcode)}
+        else:
+            gcode_file_path = os.path.join(work_folder, "synthetic.gcode")
+            print(f"Generating {args.size_mb:g} MB of G-code with {args.layers} layers...")
+            size = generate_synthetic_gcode(gcode_file_path, args.layers, args.size_mb)
+            config = {"gcode": "synthetic", "size": size, "layers": args.layers}
+        config["sample_lines"] = args.sample_lines
+
+        results = run_benchmark(gcode_file_path, work_folder, args.sample_lines, args.repeat)
+
+    entry = {"date": datetime.datetime.now().isoformat(timespec="seconds"),
+             "version": get_version(),
+             "python": platform.python_version(),
+             "numpy": np.__version__,
+             "machine": platform.machine(),
+             "config": config,
+             "results": results}
+
+    # Print the results
+    for stage in STAGES:
+        print(f"{stage:<18} {results[stage]['seconds']:10.4f} s  {results[stage]['throughput']:14.1f} items/s")
+
+    # Compare with the history then save the results
+    history = read_history(args.history)
+    regressions = find_regressions(history, entry, args.tolerance)
+    for stage, previous_throughput, throughput in regressions:
+        print(f"Regression : {stage} went from {previous_throughput:.1f} to {throughput:.1f} items/s")
+
+    if not args.no_history:
+        history.append(entry)
+        with open(args.history, "w") as file:
+            json.dump(history, file, indent=2)
+
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+# The tests can be run from any folder
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_FOLDER)
+
+import gcode_editor as gce  # noqa: E402
+
+INPUT_FOLDER = os.path.join(ROOT_FOLDER, "input")
+CUBE_FILE_NAMES = sorted(file_name for file_name in os.listdir(INPUT_FOLDER) if file_name.endswith(".gcode"))
+PARAMETER_PATHS = [os.path.join(ROOT_FOLDER, "parameter", file_name)
+                   for file_name in ("example_parameter.txt", "example_parameter_bis.txt")]
+
+
+@pytest.fixture(params=CUBE_FILE_NAMES)
+def cube_path(request, tmp_path):
+    """Copy a bundled cube in a temporary folder, the layer index and the IR are saved next to it."""
+
+    gcode_file_path = str(tmp_path / request.param)
+    shutil.copy(os.path.join(INPUT_FOLDER, request.param), gcode_file_path)
+
+    return gcode_file_path
+
+
+@pytest.fixture(scope="session")
+def parameter_sets():
+    return [gce.load_parameter_file(parameter_file_path) for parameter_file_path in PARAMETER_PATHS]
+
+
+def edit_cube(cube_path, parameter_set, **options):
+    """Edit a cube with edit_gcode_file() and read the new file.
+
+    Parameters
+    ----------
+    cube_path : The path of the G-code file to edit.
+    parameter_set : A ParameterSet.
+    options : Options of edit_gcode_file().
+
+    Returns
+    -------
+    gcode : The new G-code as bytes.
+    """
+
+    output_file_path = cube_path + ".out"
+    gce.edit_gcode_file(cube_path, output_file_path, parameter_set, **options)
+    with open(output_file_path, "rb") as file:
+        return file.read()
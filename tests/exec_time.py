@@ -1,15 +1,22 @@
+import os
+import sys
 import timeit
 
 # Time the execution
 number_of_executions = 500
 
+# Paths are taken from the project folder, so that the script can be run from any folder. For a detailed benchmark
+# of each stage on large files, see benchmark.py.
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_FOLDER)
+
 GCODE_FILENAME = "xyz-10mm-calibration-cube_0.4n_0.2mm_PLA_MK4_8m.gcode"
 GCODE_INPUT_FOLDER = "input/"
-GCODE_PATH = "../" + GCODE_INPUT_FOLDER + GCODE_FILENAME
+GCODE_PATH = os.path.join(ROOT_FOLDER, GCODE_INPUT_FOLDER + GCODE_FILENAME)
 
 PARAMETER_FILENAME = 'example_parameter.txt'
 PARAMETER_FOLDER = "parameter/"
-PARAMETER_PATH = "../" + PARAMETER_FOLDER + PARAMETER_FILENAME
+PARAMETER_PATH = os.path.join(ROOT_FOLDER, PARAMETER_FOLDER + PARAMETER_FILENAME)
 
 exec_time_find_layer = timeit.timeit(setup="from gcode_editor import find_layer_info",
                                      stmt=f"find_layer_info('{GCODE_PATH}')",
@@ -24,3 +31,12 @@ exec_time_gcode_editor = timeit.timeit(setup="from gcode_editor import gcode_edi
                                        number=number_of_executions)
 
 print(exec_time_gcode_editor/number_of_executions)
+
+# Compare the engines used to edit G1 lines
+for engine in ("split", "regex"):
+    exec_time_engine = timeit.timeit(setup="from gcode_editor import gcode_editor",
+                                     stmt=f"gcode_editor('{GCODE_PATH}', '{PARAMETER_PATH}', engine='{engine}')",
+                                     globals=globals(),
+                                     number=number_of_executions)
+
+    print(f"{engine} : {exec_time_engine/number_of_executions}")
@@ -0,0 +1,127 @@
+import argparse
+import asyncio
+import os
+import sys
+from urllib.parse import unquote, urlsplit
+
+# A local stand-in for the HTTP upload endpoint of a printer, to try async_editor.py without a printer. Each PUT
+# request saves its body in the upload folder under the last part of its path.
+#
+# python tests/mock_printer.py --port 8080 --delay 0.01
+# python async_editor.py --gcode "input/*.gcode" --parameter parameter/example_parameter.txt
+#     --to http://127.0.0.1:8080/api/v1/files/usb
+
+
+async def read_body(reader, headers, delay):
+    """Read the body of a request, chunked or with a Content-Length.
+
+    Parameters
+    ----------
+    reader : The asyncio.StreamReader of the connection.
+    headers : The headers of the request, with lower case names.
+    delay : Seconds waited after each chunk, to act as a slow printer.
+
+    Returns
+    -------
+    body : The body as bytes.
+    """
+
+    if headers.get("transfer-encoding", "").lower() != "chunked":
+        return await reader.readexactly(int(headers.get("content-length", 0)))
+
+    chunks = []
+    while True:
+        size = int((await reader.readline()).split(b";")[0], 16)
+        if size == 0:
+            await reader.readline()
+            return b"".join(chunks)
+        chunks.append(await reader.readexactly(size))
+        await reader.readline()
+        await asyncio.sleep(delay)
+
+
+async def handle_upload(reader, writer, upload_folder, delay):
+    """Answer one upload request.
+
+    Parameters
+    ----------
+    reader : The asyncio.StreamReader of the connection.
+    writer : The asyncio.StreamWriter of the connection.
+    upload_folder : The folder of the uploaded files.
+    delay : Seconds waited after each chunk of the body.
+
+    Returns
+    -------
+
+    """
+
+    try:
+        method, target, _ = (await reader.readline()).decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+
+        if method != "PUT":
+            status = "405 Method Not Allowed"
+        else:
+            file_name = os.path.basename(unquote(urlsplit(target).path))
+            try:
+                body = await read_body(reader, headers, delay)
+            except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+                print(f"Upload of {file_name} interrupted, nothing saved")
+                return
+            with open(os.path.join(upload_folder, file_name), "wb") as file:
+                file.write(body)
+            print(f"Received {file_name} ({len(body)} bytes)")
+            status = "201 Created"
+
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Length: 0\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def serve(host, port, upload_folder, delay):
+    """Run the mock printer until interrupted.
+
+    Parameters
+    ----------
+    host : The address to listen on.
+    port : The TCP port.
+    upload_folder : The folder of the uploaded files.
+    delay : Seconds waited after each chunk of the body.
+
+    Returns
+    -------
+
+    """
+
+    os.makedirs(upload_folder, exist_ok=True)
+    server = await asyncio.start_server(lambda reader, writer: handle_upload(reader, writer, upload_folder, delay),
+                                        host, port)
+    print(f"Mock printer listening on http://{host}:{port}, saving uploads in {upload_folder}")
+
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mock of the HTTP upload endpoint of a printer.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--folder", default="uploads/", help="Folder of the uploaded files")
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds waited after each chunk, for a slow printer")
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.folder, args.delay))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    sys.exit(main())
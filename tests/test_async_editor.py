@@ -0,0 +1,137 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+# The tests can be run from any folder
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_FOLDER)
+
+import async_editor as ae  # noqa: E402
+import gcode_editor as gce  # noqa: E402
+import mock_printer  # noqa: E402
+from conftest import PARAMETER_PATHS, edit_cube  # noqa: E402
+
+# Small chunks and blocks, so that the edition and the sink take turns many times on a cube
+TEST_CHUNK_SIZE = 1000
+TEST_BUFFER_SIZE = 5000
+
+
+async def start_server(handle):
+    """Start a local TCP server on a free port.
+
+    Parameters
+    ----------
+    handle : The coroutine function answering a connection, from its reader and writer.
+
+    Returns
+    -------
+    server : The asyncio server.
+    port : Its TCP port.
+    """
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+def test_edit_gcode_async(cube_path, parameter_sets, tmp_path):
+    output_file_path = str(tmp_path / "async.gcode")
+    total_layers = gce.find_layer_info(cube_path)[2]
+
+    async def edit():
+        sink = await ae.open_file_sink(output_file_path)
+        size = await ae.edit_gcode_async(ae.read_file_chunks(cube_path, TEST_CHUNK_SIZE), sink, parameter_sets[0],
+                                         total_layers, buffer_size=TEST_BUFFER_SIZE)
+        await sink.close()
+        return size
+
+    # The G-code sent by blocks is the G-code of edit_gcode_file()
+    size = asyncio.run(edit())
+    with open(output_file_path, "rb") as file:
+        assert file.read() == edit_cube(cube_path, parameter_sets[0])
+    assert size == os.path.getsize(output_file_path)
+
+
+def test_failing_sink(cube_path, parameter_sets, tmp_path):
+    output_file_path = str(tmp_path / "partial.gcode")
+    total_layers = gce.find_layer_info(cube_path)[2]
+
+    async def edit():
+        file_sink = await ae.open_file_sink(output_file_path)
+        written = []
+
+        # A sink failing after its first block
+        async def write(data):
+            if written:
+                raise ConnectionError("printer disconnected")
+            written.append(data)
+            await file_sink.write(data)
+
+        chunks = ae.read_file_chunks(cube_path, TEST_CHUNK_SIZE)
+        with pytest.raises(ConnectionError):
+            await ae.edit_gcode_async(chunks, file_sink._replace(write=write), parameter_sets[0], total_layers,
+                                      buffer_size=TEST_BUFFER_SIZE)
+        await file_sink.abort()
+        return chunks
+
+    # The input file is closed with its chunks, the partial file is removed
+    chunks = asyncio.run(edit())
+    assert chunks.ag_frame is None
+    assert not os.path.exists(output_file_path)
+
+
+def test_run_jobs_async(cube_path, parameter_sets, tmp_path):
+    upload_folder = tmp_path / "uploads"
+    upload_folder.mkdir()
+    output_folder = tmp_path / "output"
+    output_folder.mkdir()
+    invalid_parameter_path = str(tmp_path / "invalid.txt")
+    with open(invalid_parameter_path, "w") as file:
+        file.write("Phase 0 (%) : 0\n")
+    socket_data = []
+
+    async def receive_socket(reader, writer):
+        socket_data.append(await reader.read())
+        writer.close()
+
+    async def run():
+        printer, printer_port = await start_server(
+            lambda reader, writer: mock_printer.handle_upload(reader, writer, str(upload_folder), 0))
+        socket_server, socket_port = await start_server(receive_socket)
+        destinations = [str(output_folder), f"http://127.0.0.1:{printer_port}/api/v1/files/usb",
+                        f"tcp://127.0.0.1:{socket_port}", "http://127.0.0.1:1/closed"]
+        jobs = [(cube_path, parameter_file_path, ae.job_target(cube_path, parameter_file_path, destination))
+                for parameter_file_path in PARAMETER_PATHS for destination in destinations]
+        jobs.append((cube_path, invalid_parameter_path, str(output_folder / "invalid.gcode")))
+        async with printer, socket_server:
+            return jobs, await ae.run_jobs_async(jobs, max_jobs=3)
+
+    jobs, results = asyncio.run(run())
+
+    # Every job reports its status in order, a refused connection and an invalid parameter file do not stop the others
+    assert [result.output_file_path for result in results] == [target for _, _, target in jobs]
+    assert [result.status for result in results] == ["ok", "ok", "ok", "error"]*len(PARAMETER_PATHS) + ["invalid"]
+    assert "ConnectionRefusedError" in results[3].message
+    assert not os.path.exists(output_folder / "invalid.gcode")
+
+    # Each destination gets the edited G-code
+    for parameter_file_path, parameter_set in zip(PARAMETER_PATHS, parameter_sets):
+        expected = edit_cube(cube_path, parameter_set)
+        file_name = os.path.basename(ae.job_target(cube_path, parameter_file_path, str(output_folder)))
+        with open(output_folder / file_name, "rb") as file:
+            assert file.read() == expected
+        with open(upload_folder / file_name, "rb") as file:
+            assert file.read() == expected
+        assert expected in socket_data
+
+
+def test_job_target():
+    parameter_file_path = "parameter/example_parameter.txt"
+    assert ae.job_target("input/part.gcode", parameter_file_path, "tcp://127.0.0.1:9100") == "tcp://127.0.0.1:9100"
+
+    # Compressed G-code is sent as text, the file name is quoted in a URL
+    assert ae.job_target("input/my part.gcode.gz", parameter_file_path, "http://printer/api/v1/files/usb/") == \
+        "http://printer/api/v1/files/usb/modified-example_parameter-my%20part.gcode"
+    assert ae.job_target("input/part.bgcode", parameter_file_path, "output") == \
+        os.path.join("output", "modified-example_parameter-part.gcode")
@@ -0,0 +1,97 @@
+import json
+import os
+import shutil
+import sys
+
+# The tests can be run from any folder
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_FOLDER)
+
+import batch  # noqa: E402
+import gcode_editor as gce  # noqa: E402
+from conftest import CUBE_FILE_NAMES, INPUT_FOLDER, PARAMETER_PATHS  # noqa: E402
+
+
+def copy_cubes(folder):
+    """Copy the bundled cubes in a folder.
+
+    Parameters
+    ----------
+    folder : The folder, created if needed.
+
+    Returns
+    -------
+    cube_paths : The paths of the copies.
+    """
+
+    os.makedirs(folder, exist_ok=True)
+    for file_name in CUBE_FILE_NAMES:
+        shutil.copy(os.path.join(INPUT_FOLDER, file_name), folder)
+
+    return [os.path.join(folder, file_name) for file_name in CUBE_FILE_NAMES]
+
+
+def test_read_manifest(tmp_path):
+    cube_paths = copy_cubes(str(tmp_path / "input"))
+    manifest_path = str(tmp_path / "manifest.json")
+    with open(manifest_path, "w") as file:
+        json.dump([{"gcode": str(tmp_path / "input" / "*.gcode"), "parameter": PARAMETER_PATHS},
+                   {"gcode": cube_paths[0], "parameter": PARAMETER_PATHS[0]},
+                   {"gcode": "missing.gcode", "parameter": PARAMETER_PATHS[1]}], file)
+
+    # Every G-code file with every parameter file, the repeated job once, a pattern matching nothing as it is
+    assert batch.read_manifest(manifest_path) == [(cube_path, parameter_file_path) for cube_path in cube_paths
+                                                  for parameter_file_path in PARAMETER_PATHS] + \
+        [("missing.gcode", PARAMETER_PATHS[1])]
+
+
+def test_find_duplicate_outputs():
+    assert batch.find_duplicate_outputs(["output/a.gcode", "output/b.gcode", "output/../output/a.gcode",
+                                         "output/a.gcode"]) == {2: 0, 3: 0}
+
+
+def test_run_batch(tmp_path):
+    cube_paths = copy_cubes(str(tmp_path / "input"))
+    other_cube_path = copy_cubes(str(tmp_path / "other"))[0]
+    invalid_parameter_path = str(tmp_path / "invalid.txt")
+    with open(invalid_parameter_path, "w") as file:
+        file.write("Phase 0 (%) : zero\n")
+
+    jobs = batch.list_jobs(cube_paths, PARAMETER_PATHS) + [(cube_paths[0], invalid_parameter_path),
+                                                          (str(tmp_path / "missing.gcode"), PARAMETER_PATHS[0]),
+                                                          (other_cube_path, PARAMETER_PATHS[0])]
+    output_folder = str(tmp_path / "output")
+    results = batch.run_batch(jobs, output_folder, workers=2)
+
+    assert [result[:2] for result in results] == jobs
+    assert [result.status for result in results] == ["ok"] * 4 + ["invalid", "error", "invalid"]
+    assert "float" in results[4].message
+    assert results[5].message.startswith("FileNotFoundError")
+    assert results[6].message == f"Same output file as {cube_paths[0]} + {PARAMETER_PATHS[0]}"
+
+    # Each job writes the file of a single edition, named after the G-code file and the parameter file
+    for result in results[:4]:
+        parameter_name = os.path.splitext(os.path.basename(result.parameter_file_path))[0]
+        assert result.output_file_path == os.path.join(
+            output_folder, f"modified-{parameter_name}-{os.path.basename(result.gcode_file_path)}")
+        expected_path = str(tmp_path / "expected.gcode")
+        gce.edit_gcode_file(result.gcode_file_path, expected_path, gce.load_parameter_file(result.parameter_file_path))
+        with open(result.output_file_path, "rb") as file, open(expected_path, "rb") as expected_file:
+            assert file.read() == expected_file.read()
+    assert len(os.listdir(output_folder)) == 4
+
+
+def test_main(tmp_path, capsys):
+    cube_paths = copy_cubes(str(tmp_path / "input"))
+    report_path = str(tmp_path / "report.json")
+    argv = ["--gcode", *cube_paths, "--parameter", PARAMETER_PATHS[0], "--output", str(tmp_path / "output"),
+            "--workers", "1", "--report", report_path]
+
+    assert batch.main(argv) == 0
+    assert "2/2 jobs succeeded" in capsys.readouterr().out
+    with open(report_path) as file:
+        assert [job["status"] for job in json.load(file)] == ["ok", "ok"]
+
+    # A failed job gives the exit code 1
+    argv[1:1 + len(cube_paths)] = [cube_paths[0], str(tmp_path / "missing.gcode")]
+    assert batch.main(argv) == 1
@@ -0,0 +1,91 @@
+import os
+import sys
+
+import numpy as np
+
+# The tests can be run from any folder
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_FOLDER)
+
+import check  # noqa: E402
+import gcode_editor as gce  # noqa: E402
+from conftest import PARAMETER_PATHS  # noqa: E402
+
+
+def stack_sets(parameter_arrays):
+    """Stack parameter sets with the same amount of phases into the arrays of validate_parameter_batch().
+
+    Parameters
+    ----------
+    parameter_arrays : A list of parameter sets, each one in the form returned by extract_values_from_file().
+
+    Returns
+    -------
+    sections : The stacked array of each section.
+    """
+
+    return [np.stack([np.asarray(parameter_array[section], dtype=float) for parameter_array in parameter_arrays])
+            for section in range(len(check.PARAMETER_SECTIONS))]
+
+
+def violation_codes(result):
+    return [(violation.set_index, violation.section, violation.row, violation.code) for violation in result.violations]
+
+
+def test_validate_parameter_batch():
+    example = gce.extract_values_from_file(PARAMETER_PATHS[0])
+    phases, temperatures, speeds, extrude_corrections, shifts, heatings = stack_sets([example]*3)
+
+    # Set 1 : phases out of order which do not end at 100 %, a negative speed, a wrong phase number and a shift which is
+    # not a number
+    phases[1, 2, 1], phases[1, 3, 1] = 30, 90
+    speeds[1, 0, 1] = -10
+    temperatures[1, 2, 0] = 5
+    shifts[1, 1] = np.nan
+
+    # Set 2 : an unusual temperature and heating flag, only warnings
+    temperatures[2, 0, 1] = 170
+    heatings[2, 0] = 0.5
+
+    result = check.validate_parameter_batch(phases, temperatures, speeds, extrude_corrections, shifts, heatings)
+    assert result.is_valid.tolist() == [True, False, True]
+    assert violation_codes(result) == [(1, "temperature", 2, "temperature_index"),
+                                       (1, "phase", 3, "last_phase"),
+                                       (1, "phase", 2, "phase_order"),
+                                       (1, "speed", 0, "negative_speed"),
+                                       (1, "shift", 1, "shift_value"),
+                                       (2, "temperature", 0, "low_temperature"),
+                                       (2, "heating", 0, "heating_float")]
+    assert result.violations[0].message == "Wrong index. You have use 5 instead of 2"
+    assert result.violations[5].message == "Your temperature 170 °C seems to be low"
+    assert all(violation.severity == check.WARNING for violation in result.violations[5:])
+
+
+def test_validate_parameter_sets(capsys):
+    parameter_arrays = [gce.extract_values_from_file(path) for path in PARAMETER_PATHS]
+
+    # A set with another amount of phases, a set without heating section and a set with a missing temperature
+    two_phases = [np.array([[0, 0], [1, 100]]), np.array([[0, 200], [1, 150]]), np.array([[0, 100], [1, 100]]),
+                  *parameter_arrays[0][3:]]
+    no_heating = parameter_arrays[0][:5]
+    missing_temperature = [parameter_arrays[0][0], parameter_arrays[0][1][:-1], *parameter_arrays[0][2:]]
+
+    result = check.validate_parameter_sets(parameter_arrays + [two_phases, no_heating, missing_temperature])
+    assert result.is_valid.tolist() == [True]*len(parameter_arrays) + [True, False, False]
+    assert violation_codes(result) == [(len(parameter_arrays), "temperature", 1, "low_temperature"),
+                                       (len(parameter_arrays) + 1, "phase", -1, "section_count"),
+                                       (len(parameter_arrays) + 2, "temperature", -1, "temperature_count")]
+
+    # The sets are valid when check_parameter() accepts them, which does not count the sections
+    for parameter_array, is_valid in zip(parameter_arrays + [two_phases, missing_temperature],
+                                         np.delete(result.is_valid, len(parameter_arrays) + 1)):
+        assert check.check_parameter(parameter_array) == is_valid
+
+    # Nothing is printed until the violations are
+    capsys.readouterr()
+    check.validate_parameter_sets([missing_temperature])
+    assert capsys.readouterr().out == ""
+    check.print_violations(result.violations)
+    assert capsys.readouterr().out.splitlines() == ["Warning : Your temperature 150 °C seems to be low",
+                                                    "Error : The parameter file has 5 sections instead of 6.",
+                                                    "Error : Some phases are not described in temperature."]
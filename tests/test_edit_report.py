@@ -0,0 +1,77 @@
+import os
+import sys
+
+import pytest
+
+# The tests can be run from any folder
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_FOLDER)
+
+import gcode_editor as gce  # noqa: E402
+from conftest import PARAMETER_PATHS, edit_cube  # noqa: E402
+
+# Options of edit_gcode_file() for each way of going through the lines, the cache is given a folder by the test
+REPORT_MODES = {"default": {}, "numpy": {"engine": "numpy"}, "single_pass": {"single_pass": True},
+                "zero_copy": {"zero_copy": True}, "workers": {"workers": 2},
+                "workers_zero_copy": {"workers": 2, "zero_copy": True}, "cache": {"cache_dir": None},
+                "layer_range": {"layer_range": (3, 6)}}
+
+
+def count_file_lines(gcode_file_path):
+    with open(gcode_file_path, "rb") as file:
+        return sum(1 for _ in file)
+
+
+@pytest.mark.parametrize("mode", REPORT_MODES)
+def test_input_line_count(cube_path, parameter_sets, mode, tmp_path):
+    options = dict(REPORT_MODES[mode])
+    if "cache_dir" in options:
+        options["cache_dir"] = str(tmp_path / "cache")
+
+    # Every line is counted once while it is edited, copied or taken from the cache
+    for _ in range(2 if mode == "cache" else 1):
+        stats = gce.new_edit_stats()
+        edit_cube(cube_path, parameter_sets[0], stats=stats, **options)
+        assert stats.counts["input_lines"] == count_file_lines(cube_path)
+    if mode == "cache":
+        assert stats.counts["cached_layers"] > 0
+
+    # The edited lines are counted by kind, the stages are timed
+    if mode != "layer_range":
+        assert stats.counts["layers"] + stats.counts["cached_layers"] > 0
+        assert stats.counts["g1_lines"] > 0 or mode == "cache"
+    assert stats.seconds["output_write"] >= 0
+
+
+def test_edit_report(cube_path, capsys):
+    reports = []
+    output_file_path = gce.gcode_editor(cube_path, PARAMETER_PATHS[0], on_report=reports.append)
+
+    report, = reports
+    assert report["lines"] == report["counts"]["input_lines"] == count_file_lines(cube_path)
+    assert report["input_bytes"] == os.path.getsize(cube_path)
+    assert report["output_bytes"] == os.path.getsize(output_file_path)
+    assert report["counts"]["layers"] == gce.find_layer_info(cube_path)[2]
+    assert {"g1_rewrite", "heating_path", "modify_temperature", "output_write"} <= set(report["stage_seconds"])
+    assert sum(report["stage_seconds"].values()) <= report["seconds"]
+
+    gce.print_edit_report(report)
+    assert f"Edited {report['lines']} lines" in capsys.readouterr().out
+
+
+def test_stage_timer():
+    stats = gce.new_edit_stats()
+    timer = gce.new_stage_timer(stats)
+    timer.lap("first", "lines")
+    timer.lap("second")
+    timer.count("events", 3)
+    timer.count_lines(b"G1 X1\nG1 Y2\nM104 S200", 1)
+    timer.count_lines(memoryview(b"G1 X1\n\n"))
+
+    assert stats.counts == {"lines": 1, "events": 3, "input_lines": 4}
+    assert set(stats.seconds) == {"first", "second"}
+
+    # Nothing is collected without statistics
+    assert gce.new_stage_timer(None) is gce.NULL_STAGE_TIMER
+    gce.NULL_STAGE_TIMER.lap("first", "lines")
+    gce.NULL_STAGE_TIMER.count_lines(b"G1 X1\n")
@@ -0,0 +1,127 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+# The tests can be run from any folder
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_FOLDER)
+
+import fast_edit  # noqa: E402
+import gcode_cli  # noqa: E402
+import gcode_editor as gce  # noqa: E402
+from conftest import PARAMETER_PATHS, edit_cube  # noqa: E402
+
+# A parameter file with a single phase over the whole part at a constant speed and temperature, without extrusion
+# correction nor heating : gcode_editor.py only shifts the part and multiplies its speed, like the fast path
+SHIFT_SPEED_PARAMETERS = f"\n{'-' * 66}\n".join(["Phase 0 (%) : 0\nPhase 1 (%) : 100",
+                                                 "Phase 0 (deg C) : 215\nPhase 1 (deg C) : 215",
+                                                 "Phase 0 (%) : 80\nPhase 1 (%) : 80", "Correction (%) : 0",
+                                                 "Shift_X (mm) : 2\nShift_Y (mm) : 3", "Heating : 0"])
+
+
+def split_g1_line(line):
+    """Split the code of a G1 line in words, without its comment. The value of the E word is given apart, since
+    gcode_editor.py writes it again with 3 decimals even without extrusion correction.
+
+    Parameters
+    ----------
+    line : A G1 line of G-code.
+
+    Returns
+    -------
+    words : The words before the comment, with only the letter of the E word.
+    extrusion : The value of the E word, 0 without E word.
+    """
+
+    words = line.partition(";")[0].split()
+    extrusion = 0
+    for i, word in enumerate(words):
+        if word[0] == "E":
+            words[i], extrusion = "E", float(word[1:])
+
+    return words, extrusion
+
+
+def test_edit_shift_speed_line():
+    assert fast_edit.edit_shift_speed_line("G1 X10 Y20.5 E1.2 F1800\n", 2, -3, 50) == \
+        "G1 X12.000 Y17.500 E1.2 F900.0  ;Modified\n"
+
+    # The comments are kept, even stuck to a word
+    assert fast_edit.edit_shift_speed_line("G1 Z.2 F720 ; move  up\r\n", 2, 3, 100) == \
+        "G1 Z.2 F720.0 ; move  up  ;Modified\n"
+    assert fast_edit.edit_shift_speed_line("G1 F9600;_WIPE\n", 0, 0, 80) == "G1 F7680.0 ;_WIPE  ;Modified\n"
+
+    # Only the G1 lines are edited
+    lines = ["G1 X1\n", "G10 ; retract\n", "G11\n", "G1\tY1\n", "M104 S200\n"]
+    assert "".join(fast_edit.iter_shift_speed_blocks(lines, 1, 1, 100, batch_size=2)) == \
+        "G1 X2.000  ;Modified\nG10 ; retract\nG11\nG1 Y2.000  ;Modified\nM104 S200\n"
+
+
+def test_fast_path_matches_editor(cube_path, tmp_path):
+    parameter_file_path = str(tmp_path / "shift_speed.txt")
+    with open(parameter_file_path, "w") as file:
+        file.write(SHIFT_SPEED_PARAMETERS)
+    parameter_set = gce.load_parameter_file(parameter_file_path)
+    expected_lines = edit_cube(cube_path, parameter_set).decode().splitlines(keepends=True)
+
+    output_file_path = fast_edit.edit_shift_speed_file(cube_path, 2, 3, 80, str(tmp_path / "fast.gcode"))
+    with open(output_file_path) as file:
+        fast_lines = file.readlines()
+    with open(cube_path) as file:
+        input_lines = file.readlines()
+
+    # The G1 lines get the same positions, extrusions, feedrates and tag, the other lines are copied
+    expected_g1_lines = [line for line in expected_lines if line.startswith("G1")]
+    fast_g1_lines = [line for line in fast_lines if line.startswith("G1")]
+    fast_words, fast_extrusions = zip(*map(split_g1_line, fast_g1_lines))
+    expected_words, expected_extrusions = zip(*map(split_g1_line, expected_g1_lines))
+    assert fast_words == expected_words
+    assert fast_extrusions == pytest.approx(expected_extrusions, abs=1e-3)
+    assert all(line.endswith("  ;Modified\n") for line in fast_g1_lines + expected_g1_lines)
+    assert [line for line in fast_lines if not line.startswith("G1")] == \
+        [line for line in input_lines if not line.startswith("G1")]
+
+
+@pytest.mark.parametrize("options, shift_speed", [(["--shift", "2", "3", "--speed", "80"], (2, 3, 80)),
+                                                  (["--speed", "50"], (0, 0, 50)),
+                                                  (["--shift", "-1", "0"], (-1, 0, 100))])
+def test_cli_fast_path(cube_path, options, shift_speed, tmp_path, capsys):
+    assert gcode_cli.main([cube_path] + options) == 0
+    output_file_path = os.path.join(os.path.dirname(cube_path), "modified-" + os.path.basename(cube_path))
+    assert f"Find the new G code file {output_file_path}." in capsys.readouterr().out
+
+    # A missing option leaves the position or the speed unchanged
+    expected_file_path = fast_edit.edit_shift_speed_file(cube_path, *shift_speed, str(tmp_path / "expected.gcode"))
+    with open(output_file_path) as file, open(expected_file_path) as expected_file:
+        assert file.read() == expected_file.read()
+
+
+def test_cli_parameter_file(cube_path, parameter_sets, capsys):
+    assert gcode_cli.main([cube_path, PARAMETER_PATHS[0], "--engine", "numpy", "--report"]) == 0
+    assert "Edited" in capsys.readouterr().out
+
+    output_file_path = os.path.join(os.path.dirname(cube_path), "modified-" + os.path.basename(cube_path))
+    with open(output_file_path, "rb") as file:
+        assert file.read() == edit_cube(cube_path, parameter_sets[0])
+
+
+@pytest.mark.parametrize("argv", [[], ["part.gcode"], ["part.gcode", "--speed", "0"],
+                                  ["part.gcode", "parameter.txt", "--shift", "1", "1"]])
+def test_cli_errors(argv):
+    with pytest.raises(SystemExit) as error:
+        gcode_cli.main(argv)
+    assert error.value.code == 2
+
+
+def test_cli_missing_file(tmp_path, capsys):
+    assert gcode_cli.main([str(tmp_path / "missing.gcode"), "--speed", "80"]) == 1
+    assert "Edition canceled." in capsys.readouterr().out
+
+
+def test_cli_without_numpy(cube_path):
+    # The fast path never loads NumPy
+    code = "import sys, gcode_cli; gcode_cli.main(sys.argv[1:]); sys.exit('numpy' in sys.modules)"
+    subprocess.run([sys.executable, "-c", code, cube_path, "--shift", "1", "1"], cwd=ROOT_FOLDER, check=True,
+                   capture_output=True)
@@ -0,0 +1,76 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# The tests can be run from any folder
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_FOLDER)
+
+import gcode_editor as gce  # noqa: E402
+
+# Shift of the part on X and Y
+SHIFT_X = 1
+SHIFT_Y = -2
+
+# Rows of the layer table (see compute_layer_table()) : phase 1 at 50 % with the speed at 50 % and the extrusion at
+# 110 %, and phase 0 where only the extrusion is corrected (95 %)
+PHASE_ENTRY = np.array([1, 0.5, 50, 210, 110])
+FIRST_ENTRY = np.array([0, 0, 100, np.nan, 95])
+
+# A standard G1 line as written by PrusaSlicer, with the expected line in phase 1 and in phase 0. F is formatted like
+# str() once multiplied, and copied as it is in phase 0.
+G1_CASES = [("G1 X10 Y20.5 E.5 F1800\n", "G1 X11.000 Y18.500 E0.550 F900.0  ;Modified\n",
+             "G1 X11.000 Y18.500 E0.475 F1800  ;Modified\n"),
+            ("G1 Z.6 F720\n", "G1 Z.6 F360.0  ;Modified\n", "G1 Z.6 F720  ;Modified\n"),
+            ("G1 E-.8 F2100\n", "G1 E-0.880 F1050.0  ;Modified\n", "G1 E-0.760 F2100  ;Modified\n"),
+            ("G1 X-1.25 Y0\n", "G1 X-0.250 Y-2.000  ;Modified\n", "G1 X-0.250 Y-2.000  ;Modified\n"),
+            ("G1 X120.5 Y3.25 Z.2 E1.23456 F600\n", "G1 X121.500 Y1.250 Z.2 E1.358 F300.0  ;Modified\n",
+             "G1 X121.500 Y1.250 Z.2 E1.173 F600  ;Modified\n")]
+
+# Lines that G1_PATTERN does not parse, edited word by word
+OTHER_G1_CASES = [("G1 X1 Y1 ; move\n", "G1 X2.000 Y-1.000 ; move  ;Modified\n"),
+                  ("G1 F1800 X1\n", "G1 F900.0 X2.000  ;Modified\n")]
+
+
+@pytest.mark.parametrize("line, phase_line, first_line", G1_CASES)
+def test_rewrite_g1_line(line, phase_line, first_line):
+    for layer_entry, expected in ((PHASE_ENTRY, phase_line), (FIRST_ENTRY, first_line)):
+        assert gce.rewrite_g1_line(line, layer_entry, SHIFT_X, SHIFT_Y) == expected
+        assert gce.edit_g1_line(line, layer_entry, SHIFT_X, SHIFT_Y) == expected
+
+
+@pytest.mark.parametrize("line, expected", OTHER_G1_CASES)
+def test_other_g1_line(line, expected):
+    assert gce.rewrite_g1_line(line, PHASE_ENTRY, SHIFT_X, SHIFT_Y) is None
+    assert gce.edit_g1_line(line, PHASE_ENTRY, SHIFT_X, SHIFT_Y) == expected
+
+
+def test_rewrite_g1_coordinates():
+    # The coordinates are collected as written in the modified line, only for lines with both X and Y
+    coord_buffer = gce.CoordinateBuffer()
+    for line, _, _ in G1_CASES:
+        gce.rewrite_g1_line(line, PHASE_ENTRY, SHIFT_X, SHIFT_Y, coord_buffer)
+
+    assert coord_buffer.view().tolist() == [[11, 18.5], [-0.25, -2], [121.5, 1.25]]
+
+
+@pytest.mark.parametrize("layer_entry", [PHASE_ENTRY, FIRST_ENTRY])
+def test_rewrite_g1_batch(layer_entry):
+    # The other lines are edited word by word in the middle of the standard lines of the batch
+    lines = [case[0] for case in G1_CASES[:3] + OTHER_G1_CASES + G1_CASES[3:]]
+    expected = [gce.rewrite_g1_line(line, layer_entry, SHIFT_X, SHIFT_Y) or
+                gce.edit_g1_line(line, layer_entry, SHIFT_X, SHIFT_Y) for line in lines]
+    modified_lines, coords = gce.rewrite_g1_batch(lines, [True] * len(lines), layer_entry, SHIFT_X, SHIFT_Y)
+    assert modified_lines == expected
+
+    # The coordinates of every line of the external perimeter with X and Y, in the order of the lines
+    assert coords.tolist() == [[11, 18.5], [2, -1], [-0.25, -2], [121.5, 1.25]]
+
+    # Only the lines of the external perimeter give their coordinates, the last line may miss its end of line
+    lines[-1] = lines[-1].rstrip("\n")
+    external = [False] * (len(lines) - 1) + [True]
+    modified_lines, coords = gce.rewrite_g1_batch(lines, external, layer_entry, SHIFT_X, SHIFT_Y)
+    assert modified_lines == expected
+    assert coords.tolist() == [[121.5, 1.25]]
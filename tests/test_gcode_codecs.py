@@ -0,0 +1,183 @@
+import os
+import re
+import shutil
+import sys
+
+import pytest
+
+# The tests can be run from any folder
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_FOLDER)
+
+import gcode_codecs as gcc  # noqa: E402
+import gcode_editor as gce  # noqa: E402
+
+INPUT_FOLDER = os.path.join(ROOT_FOLDER, "input")
+CUBE_PATHS = [os.path.join(INPUT_FOLDER, file_name) for file_name in sorted(os.listdir(INPUT_FOLDER))
+              if file_name.endswith(".gcode")]
+PARAMETER_PATH = os.path.join(ROOT_FOLDER, "parameter", "example_parameter.txt")
+
+# Extension of a file of each codec
+CODEC_EXTENSIONS = (".gcode.gz", ".gcode.xz", ".bgcode")
+
+# Order of the blocks of a binary G-code file given by the specification of the format, one letter per block type :
+# the file metadata (optional), the printer metadata, the thumbnails, the print metadata, the slicer metadata, then the
+# G-code blocks only
+BLOCK_LETTERS = {gcc.BLOCK_FILE_METADATA: "F", gcc.BLOCK_PRINTER_METADATA: "P", gcc.BLOCK_THUMBNAIL: "T",
+                 gcc.BLOCK_PRINT_METADATA: "R", gcc.BLOCK_SLICER_METADATA: "S", gcc.BLOCK_GCODE: "G"}
+REFERENCE_BLOCK_ORDER = re.compile(r"F?PT*RSG+")
+
+
+def reference_heatshrink_compress(data, window_bits, lookahead_bits):
+    """Compress data with Heatshrink one item after the other, each one the longest match in the window at its latest
+    start, or a literal byte.
+
+    Parameters
+    ----------
+    data : The bytes to compress.
+    window_bits : The base 2 logarithm of the window size.
+    lookahead_bits : The base 2 logarithm of the longest back-reference.
+
+    Returns
+    -------
+    compressed : The compressed bytes.
+    """
+
+    bits = []
+    position = 0
+    while position < len(data):
+        window_start = max(0, position - (1 << window_bits) + 1)
+        count = min(1 << lookahead_bits, len(data) - position)
+        while count >= 2 and data.rfind(data[position:position + count], window_start, position + count - 1) < 0:
+            count -= 1
+
+        if count >= 2:
+            match = data.rfind(data[position:position + count], window_start, position + count - 1)
+            bits.append(f"0{position - match - 1:0{window_bits}b}{count - 1:0{lookahead_bits}b}")
+            position += count
+        else:
+            bits.append(f"1{data[position]:08b}")
+            position += 1
+
+    bits = "".join(bits)
+    bits += "0" * (-len(bits) % 8)
+    return bytes(int(bits[i:i + 8], 2) for i in range(0, len(bits), 8))
+
+
+def read_block_types(bgcode_file_path):
+    """Read the type of each block of a binary G-code file, checking its header and checksums.
+
+    Parameters
+    ----------
+    bgcode_file_path : The path of the binary G-code file.
+
+    Returns
+    -------
+    block_types : A list of block types.
+    """
+
+    with open(bgcode_file_path, "rb") as file:
+        return [block.block_type for block in gcc.read_bgcode_blocks(file)]
+
+
+def write_bgcode(gcode, bgcode_file_path, metadata_blocks=()):
+    """Write G-code text in a new binary G-code file.
+
+    Parameters
+    ----------
+    gcode : The G-code text as bytes.
+    bgcode_file_path : The path of the new binary G-code file.
+    metadata_blocks : The BgcodeBlocks written before the G-code.
+
+    Returns
+    -------
+
+    """
+
+    with gcc.open_gcode(bgcode_file_path, "wb", metadata_blocks) as file:
+        file.write(gcode)
+
+
+@pytest.mark.parametrize("extension", CODEC_EXTENSIONS)
+@pytest.mark.parametrize("gcode_file_path", CUBE_PATHS)
+def test_codec_round_trip(gcode_file_path, extension, tmp_path):
+    with open(gcode_file_path, "rb") as file:
+        original = file.read()
+
+    encoded_file_path = str(tmp_path / ("cube" + extension))
+    metadata_blocks = gcc.gcode_metadata_blocks(gcode_file_path) if extension == ".bgcode" else ()
+    with gcc.open_gcode(encoded_file_path, "wb", metadata_blocks) as file:
+        file.write(original)
+    with gcc.open_gcode(encoded_file_path, "rb") as file:
+        assert file.read() == original
+
+    # An encoded file is edited like the text file, and saved in the same format. The layer index of the text file is
+    # saved next to its copy. A binary G-code file is always estimated.
+    parameter_set = gce.load_parameter_file(PARAMETER_PATH)
+    text_file_path = str(tmp_path / "cube.gcode")
+    shutil.copy(gcode_file_path, text_file_path)
+    text_output_path = str(tmp_path / "modified-cube.gcode")
+    encoded_output_path = str(tmp_path / ("modified-cube" + extension))
+    gce.edit_gcode_file(text_file_path, text_output_path, parameter_set, estimate=extension == ".bgcode")
+    gce.edit_gcode_file(encoded_file_path, encoded_output_path, parameter_set)
+    with open(text_output_path, "rb") as text_file, gcc.open_gcode(encoded_output_path, "rb") as encoded_file:
+        assert encoded_file.read() == text_file.read()
+
+
+@pytest.mark.parametrize("gcode_file_path", CUBE_PATHS)
+def test_text_to_bgcode_block_order(gcode_file_path, tmp_path):
+    bgcode_file_path = str(tmp_path / "cube.bgcode")
+    with open(gcode_file_path, "rb") as file:
+        write_bgcode(file.read(), bgcode_file_path, gcc.gcode_metadata_blocks(gcode_file_path))
+
+    block_types = read_block_types(bgcode_file_path)
+    assert REFERENCE_BLOCK_ORDER.fullmatch("".join(BLOCK_LETTERS[block_type] for block_type in block_types))
+
+    # Every metadata block is written, the thumbnails of the text file are kept
+    for block_type in gcc.BGCODE_METADATA_BLOCKS:
+        assert block_types.count(block_type) == 1
+    with open(gcode_file_path) as file:
+        assert block_types.count(gcc.BLOCK_THUMBNAIL) == sum(line.startswith("; thumbnail begin") for line in file)
+
+
+def test_missing_metadata_blocks(tmp_path):
+    bgcode_file_path = str(tmp_path / "part.bgcode")
+    write_bgcode(b"G1 X1 Y2\n", bgcode_file_path, [gcc.new_metadata_block(gcc.BLOCK_SLICER_METADATA, {"a": 1})])
+
+    block_types = read_block_types(bgcode_file_path)
+    assert block_types == [gcc.BLOCK_FILE_METADATA, gcc.BLOCK_PRINTER_METADATA, gcc.BLOCK_PRINT_METADATA,
+                           gcc.BLOCK_SLICER_METADATA, gcc.BLOCK_GCODE]
+
+    # The metadata of a binary G-code file is kept as it is
+    assert gcc.gcode_metadata_blocks(bgcode_file_path)[-1].payload == b"a=1\n"
+
+
+def test_heatshrink_compress():
+    # 3 literal bytes, then a back-reference overlapping the bytes it produces : offset 3, 6 bytes
+    assert gcc.heatshrink_compress(b"abcabcabc", 12, 4) == bytes([0b10110000, 0b11011000, 0b10101100, 0b01100000,
+                                                                   0b00000010, 0b01010000])
+    assert gcc.heatshrink_compress(b"", 12, 4) == b""
+
+    # The matches found for every position at once are those found one item after the other
+    with open(CUBE_PATHS[0], "rb") as file:
+        gcode = file.read()
+    for data in (gcode[:20000], gcc.meatpack_encode(gcode[-20000:]), bytes(range(256)) * 20, b"a" * 100):
+        for window_bits, lookahead_bits in gcc.HEATSHRINK_PARAMETERS.values():
+            compressed = gcc.heatshrink_compress(data, window_bits, lookahead_bits)
+            assert compressed == reference_heatshrink_compress(data, window_bits, lookahead_bits)
+            assert gcc.heatshrink_decompress(compressed, window_bits, lookahead_bits, len(data)) == data
+
+
+def test_meatpack_encode():
+    # Pairs of 4-bit codes, the characters without code follow their byte, the spaces of the G line are removed
+    # before its comment
+    assert gcc.meatpack_encode(b"G1 X10.5 E2 ; a b\nM104 S200\n") == (
+        b"\xff\xff\xfb\xff\xff\xf7" b"\x1d\x1e\xa0\xb5\xf2 \xff; \xffa \xcfb" b"\x1fM\x40\xff S\x02\xc0")
+
+    # A last character without newline is written unpacked
+    assert gcc.meatpack_encode(b"G1 X12") == b"\xff\xff\xfb\xff\xff\xf7\x1d\x1e\xff\xff\xfa2"
+
+    for gcode_file_path in CUBE_PATHS:
+        with open(gcode_file_path, "rb") as file:
+            gcode = file.read()
+        assert gcc.meatpack_decode(gcc.meatpack_encode(gcode)) == gcode
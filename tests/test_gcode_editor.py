@@ -0,0 +1,60 @@
+import os
+import sys
+
+import pytest
+
+# The tests can be run from any folder
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_FOLDER)
+
+import gcode_editor as gce  # noqa: E402
+from conftest import edit_cube  # noqa: E402
+
+# Options of edit_gcode_file() for each mode, the output must be the same as the output of the regex engine
+EDIT_MODES = {"split": {"engine": "split"},
+              "numpy": {"engine": "numpy"},
+              "single_pass": {"single_pass": True},
+              "zero_copy": {"zero_copy": True},
+              "workers": {"workers": 3},
+              "workers_zero_copy": {"workers": 3, "zero_copy": True}}
+
+
+# A comment with the characters at which str.splitlines() cuts a line but a file read in text mode does not
+SPLIT_CHARACTERS_COMMENT = " ; a\x0cb\x1cc\x85d"
+
+
+def add_comment(cube_path, comment):
+    """Add a comment at the end of the first extrusion of the second layer of a cube, so that it is edited word by word.
+
+    Parameters
+    ----------
+    cube_path : The path of the G-code file.
+    comment : The comment, with its leading space and semicolon.
+
+    Returns
+    -------
+
+    """
+
+    with open(cube_path) as file:
+        lines = file.readlines()
+    second_layer = [i for i, line in enumerate(lines) if line.startswith(";LAYER_CHANGE")][1]
+    i = next(i for i in range(second_layer, len(lines)) if lines[i].startswith("G1 X") and " E" in lines[i])
+    lines[i] = lines[i].rstrip("\n") + comment + "\n"
+    with open(cube_path, "w") as file:
+        file.writelines(lines)
+
+
+@pytest.mark.parametrize("comment", ["", SPLIT_CHARACTERS_COMMENT])
+@pytest.mark.parametrize("mode", EDIT_MODES)
+@pytest.mark.parametrize("heating_path", gce.HEATING_PATHS)
+def test_edit_modes(cube_path, parameter_sets, mode, heating_path, comment):
+    if comment:
+        add_comment(cube_path, comment)
+
+    for parameter_set in parameter_sets:
+        expected = edit_cube(cube_path, parameter_set, heating_path=heating_path)
+        # The line with the comment is edited word by word, its characters are whitespace for str.split()
+        assert (b" ; a b c d  ;Modified\n" in expected) == bool(comment)
+        assert edit_cube(cube_path, parameter_set, heating_path=heating_path, **EDIT_MODES[mode]) == expected
+
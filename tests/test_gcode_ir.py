@@ -0,0 +1,100 @@
+import io
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# The tests can be run from any folder
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_FOLDER)
+
+import gcode_ir  # noqa: E402
+
+# Moves rebuilt from the columns of the IR, and lines kept as text : a comment after a move, a double space, a leading
+# zero and a number with too many decimals
+IR_GCODE = b"""M83
+;LAYER_CHANGE
+G1 X1.5 Y-.25 E0.01000 F1800
+G0 Z10
+G1 X2 ; move
+M104 S200
+;LAYER_CHANGE
+G1  X3
+G1 X03
+G1 E0.1234567
+"""
+
+
+def format_gcode_ir(parsed_ir):
+    output_file = io.BytesIO()
+    gcode_ir.write_gcode_ir(parsed_ir, output_file)
+    return output_file.getvalue()
+
+
+def test_parse_gcode_ir():
+    parsed_ir = gcode_ir.parse_gcode_ir(IR_GCODE)
+
+    assert parsed_ir.opcodes.tolist() == [gcode_ir.OP_TEXT, gcode_ir.OP_COMMENT, gcode_ir.OP_G1, gcode_ir.OP_G0,
+                                          gcode_ir.OP_G1, gcode_ir.OP_M104, gcode_ir.OP_COMMENT, gcode_ir.OP_G1,
+                                          gcode_ir.OP_G1, gcode_ir.OP_G1]
+    assert parsed_ir.layer_starts.tolist() == [1, 6]
+    assert gcode_ir.ir_line_layers(parsed_ir).tolist() == [0, 1, 1, 1, 1, 1, 2, 2, 2, 2]
+
+    # The words of the moves fill the columns, even on the lines kept as text
+    assert np.array_equal(parsed_ir.x, [np.nan, np.nan, 1.5, np.nan, 2, np.nan, np.nan, 3, 3, np.nan], equal_nan=True)
+    assert (parsed_ir.y[2], parsed_ir.e[2], parsed_ir.f[2], parsed_ir.z[3]) == (-0.25, 0.01, 1800, 10)
+    assert parsed_ir.e[9] == pytest.approx(0.1234567)
+
+    # The format of each word is kept : decimals, point and leading zero
+    assert parsed_ir.formats[2].tolist() == [gcode_ir.FORMAT_POINT | 1,
+                                             gcode_ir.FORMAT_POINT | gcode_ir.FORMAT_NO_LEADING_ZERO | 2, -1,
+                                             gcode_ir.FORMAT_POINT | 5, 0]
+    assert parsed_ir.text_index.tolist() == [0, 1, -1, -1, 2, 3, 4, 5, 6, 7]
+    text_lines = [bytes(parsed_ir.text_bytes[start:end]) for start, end in zip(parsed_ir.text_offsets[:-1],
+                                                                                parsed_ir.text_offsets[1:])]
+    assert text_lines == [b"M83", b";LAYER_CHANGE", b"G1 X2 ; move", b"M104 S200", b";LAYER_CHANGE", b"G1  X3",
+                          b"G1 X03", b"G1 E0.1234567"]
+
+    assert format_gcode_ir(parsed_ir) == IR_GCODE
+
+
+def test_gcode_ir_round_trip(cube_path):
+    with open(cube_path, "rb") as file:
+        original = file.read()
+
+    # Writing the IR gives back the file, with or without its final newline
+    for data in (original, original.rstrip(b"\n")):
+        assert format_gcode_ir(gcode_ir.parse_gcode_ir(data)) == data
+
+    # The saved IR is reused as long as the file does not change
+    parsed_ir = gcode_ir.find_gcode_ir(cube_path)
+    assert os.path.exists(gcode_ir.gcode_ir_path(cube_path))
+    for mmap in (False, True):
+        loaded_ir = gcode_ir.find_gcode_ir(cube_path, mmap)
+        for field in gcode_ir.GcodeIR._fields:
+            assert np.array_equal(getattr(loaded_ir, field), getattr(parsed_ir, field), equal_nan=True)
+
+
+def test_gcode_ir_file(cube_path):
+    gcode_ir.find_gcode_ir(cube_path)
+    ir_path = gcode_ir.gcode_ir_path(cube_path)
+
+    # The mapped arrays are read from the file
+    mapped_ir, source = gcode_ir.load_gcode_ir(ir_path, mmap=True)
+    assert source == (os.path.getsize(cube_path), os.stat(cube_path).st_mtime_ns)
+    assert not mapped_ir.x.flags.writeable
+
+    # A changed file is parsed again
+    with open(cube_path, "ab") as file:
+        file.write(b"G1 X1\n")
+    changed_ir = gcode_ir.find_gcode_ir(cube_path)
+    assert changed_ir.x[-1] == 1 and len(changed_ir.opcodes) == len(mapped_ir.opcodes) + 1
+
+    # An IR saved by another version is not used
+    parsed_ir, _ = gcode_ir.load_gcode_ir(ir_path)
+    with open(ir_path, "wb") as file:
+        np.savez(file, version=gcode_ir.GCODE_IR_VERSION + 1, source=np.array(source), **parsed_ir._asdict())
+    with pytest.raises(ValueError):
+        gcode_ir.load_gcode_ir(ir_path)
+    assert format_gcode_ir(gcode_ir.find_gcode_ir(cube_path)).endswith(b"G1 X1\n")
@@ -0,0 +1,135 @@
+import os
+import re
+import sys
+
+import numpy as np
+import pytest
+
+# The tests can be run from any folder
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_FOLDER)
+
+import gcode_editor as gce  # noqa: E402
+import sweep  # noqa: E402
+from conftest import edit_cube  # noqa: E402
+
+# Layers of the cubes whose moves get no F word, so that the feedrate in effect comes from the layers before them
+LAYERS_WITHOUT_FEEDRATE = range(3, 6)
+
+
+def remove_feedrates(cube_path, layers):
+    """Remove the F word of the G1 lines of some layers of a cube.
+
+    Parameters
+    ----------
+    cube_path : The path of the G-code file.
+    layers : The numbers of the layers, from 0 with the first ";LAYER_CHANGE" line.
+
+    Returns
+    -------
+
+    """
+
+    with open(cube_path) as file:
+        lines = file.readlines()
+
+    layer = -1
+    for i, line in enumerate(lines):
+        if line.startswith(";LAYER_CHANGE"):
+            layer += 1
+        elif layer in layers and line.startswith("G1"):
+            lines[i] = re.sub(r" F[-\d.]+", "", line)
+
+    with open(cube_path, "w") as file:
+        file.writelines(lines)
+
+
+def check_heating_feedrates(gcode):
+    """Check that each heating phase of edited G-code sets HEATING_FEEDRATE on its first move, then sets again the
+    feedrate of the last move with an F word before it.
+
+    Parameters
+    ----------
+    gcode : The edited G-code as bytes.
+
+    Returns
+    -------
+    nb_heating : The amount of heating phases.
+    """
+
+    lines = gcode.decode().splitlines(keepends=True)
+    nb_heating = 0
+    feedrate = None
+    heating_start = None
+    for i, line in enumerate(lines):
+        if line.startswith(";HEATING_PHASE"):
+            heating_start = i
+            assert lines[i + 1].endswith(f" F{gce.HEATING_FEEDRATE}\n")
+        elif line.startswith(";END_HEATING_PHASE"):
+            assert lines[i - 1] == f"G1 F{feedrate}\n"
+            heating_start = None
+            nb_heating += 1
+        elif heating_start is None and (match := gce.FEEDRATE_PATTERN.match(line)):
+            feedrate = match.group(1)
+
+    return nb_heating
+
+
+def test_format_heating_moves():
+    points = np.array([[0, 2], [10, 2], [10, 1]])
+    assert gce.format_heating_moves(points, 3000, "1800") == (";HEATING_PHASE\nG0 X0 Y2 F3000\nG0 X10 Y2\n"
+                                                             "G0 X10 Y1\nG1 F1800\n;END_HEATING_PHASE\n")
+
+    # The feedrate of the heating is set even when the feedrate to set again is not known
+    assert gce.format_heating_moves(points, 3000) == ";HEATING_PHASE\nG0 X0 Y2 F3000\nG0 X10 Y2\nG0 X10 Y1\n" \
+                                                     ";END_HEATING_PHASE\n"
+    assert gce.format_heating_moves(points[:0], 3000, "1800") == ";HEATING_PHASE\n;END_HEATING_PHASE\n"
+
+
+def test_optimize_heating_moves():
+    upper = [[10, 0], [10, 1], [10, 2]]
+    lower = [[0, 0], [0, 1], [0, 2]]
+
+    # The zigzag starts at the corner nearest to the nozzle
+    assert gce.optimize_heating_moves(upper, lower, [0, 2.1]).tolist() == [[0, 2], [10, 2], [10, 1], [0, 1], [0, 0],
+                                                                          [10, 0]]
+    assert gce.optimize_heating_moves(upper, lower, [9, -1]).tolist() == [[10, 0], [0, 0], [0, 1], [10, 1], [10, 2],
+                                                                         [0, 2]]
+
+    # The moves of zero length and the collinear moves are merged
+    assert gce.merge_collinear_moves(np.array([[0, 0], [0, 0], [1, 0], [2, 0], [2, 1]])).tolist() == [[0, 0], [2, 0],
+                                                                                                     [2, 1]]
+
+
+def test_find_layer_feedrate():
+    layer_lines = [";LAYER_CHANGE\n", "G1 X1 Y1 F1800\n", "G1 X2 Y2\n"]
+    assert gce.find_layer_feedrate(layer_lines) == "1800"
+    assert gce.find_layer_feedrate([b"G1 F900\n;LAYER_CHANGE\n", memoryview(b"G1 X1\n")], "1200") == "1200"
+    assert gce.find_layer_feedrate([";LAYER_CHANGE\n", "G1 X1 ; F600\n"]) is None
+
+
+@pytest.mark.parametrize("heating_path", gce.OPTIMIZED_HEATING_PATHS)
+def test_modal_feedrate(cube_path, parameter_sets, heating_path, tmp_path):
+    remove_feedrates(cube_path, LAYERS_WITHOUT_FEEDRATE)
+    total_layers = gce.find_layer_info(cube_path)[2]
+
+    output_file_paths = [str(tmp_path / f"sweep-{i}.gcode") for i in range(len(parameter_sets))]
+    sweep.sweep_gcode_file(cube_path, parameter_sets, output_file_paths, heating_path)
+
+    for parameter_set, output_file_path in zip(parameter_sets, output_file_paths):
+        expected = edit_cube(cube_path, parameter_set, heating_path=heating_path)
+        assert check_heating_feedrates(expected) == total_layers - 1
+
+        # The modes editing ranges of layers apart set the same feedrate again
+        for options in ({"workers": 3}, {"workers": 3, "zero_copy": True}, {"single_pass": True},
+                        {"cache_dir": str(tmp_path / "cache")}, {"cache_dir": str(tmp_path / "cache")}):
+            assert edit_cube(cube_path, parameter_set, heating_path=heating_path, **options) == expected
+        with open(output_file_path, "rb") as file:
+            assert file.read() == expected
+
+        # A range starting in the layers without F word
+        edited = edit_cube(cube_path, parameter_set, heating_path=heating_path, layer_range=(4, 8))
+        range_start = [match.start() for match in re.finditer(b";LAYER_CHANGE", edited)][4]
+        range_end = [match.start() for match in re.finditer(b";LAYER_CHANGE", edited)][8]
+        expected_start = [match.start() for match in re.finditer(b";LAYER_CHANGE", expected)][4]
+        assert edited[range_start:range_end] == expected[expected_start:expected_start + range_end - range_start]
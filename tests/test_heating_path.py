@@ -0,0 +1,86 @@
+import os
+import sys
+
+import numpy as np
+
+# The tests can be run from any folder
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_FOLDER)
+
+import gcode_editor as gce  # noqa: E402
+
+
+def square_perimeter(x, y, side):
+    """Compute the corners of a square external perimeter.
+
+    Parameters
+    ----------
+    x : X coordinate of the lower left corner.
+    y : Y coordinate of the lower left corner.
+    side : Side of the square.
+
+    Returns
+    -------
+    corners : The [x, y] corners of the square.
+    """
+
+    return [[x, y], [x + side, y], [x + side, y + side], [x, y + side]]
+
+
+def heating_segments(upper_coord, lower_coord):
+    """Gather the parallel lines of a heating path without their order nor their direction.
+
+    Parameters
+    ----------
+    upper_coord : The upper coordinates of the parallel lines.
+    lower_coord : The lower coordinates of the parallel lines.
+
+    Returns
+    -------
+    segments : The sorted (x left, y, x right, y) of the lines.
+    """
+
+    ends = np.sort(np.stack((upper_coord, lower_coord), axis=1), axis=1)
+    return sorted(map(tuple, ends.reshape(-1, 4).tolist()))
+
+
+def test_grid_heating_path_one_part():
+    # The cells of a single square cover its whole bounding box : the lines are the lines of the box
+    coord_array = np.array(square_perimeter(0, 0, 10), dtype=float)
+    assert heating_segments(*gce.set_grid_heating_path(coord_array)) == \
+        heating_segments(*gce.set_heating_path(coord_array))
+
+
+def test_grid_heating_path_two_parts():
+    coord_array = np.array(square_perimeter(0, 0, 10) + [gce.PERIMETER_SEPARATOR] + square_perimeter(50, 40, 10))
+    upper_coord, lower_coord = gce.set_grid_heating_path(coord_array)
+    box_upper_coord, box_lower_coord = gce.set_heating_path(coord_array)
+
+    # The lines of the box are cut to the parts, with at most one cell around them
+    assert set(upper_coord[:, 1].tolist()) <= set(box_upper_coord[:, 1].tolist())
+    x_left, x_right = np.minimum(upper_coord[:, 0], lower_coord[:, 0]), np.maximum(upper_coord[:, 0], lower_coord[:, 0])
+    over_first = (x_left >= -gce.HEATING_CELL_SIZE) & (x_right <= 10 + gce.HEATING_CELL_SIZE)
+    over_second = (x_left >= 50 - gce.HEATING_CELL_SIZE) & (x_right <= 60 + gce.HEATING_CELL_SIZE)
+    assert (over_first | over_second).all()
+    assert np.abs(upper_coord - lower_coord).sum() < np.abs(box_upper_coord - box_lower_coord).sum()/2
+
+    # The part nearest to the end of the perimeter is swept first, then the other one, each in a zigzag
+    assert over_second[:over_second.sum()].all() and over_first[over_second.sum():].all()
+    start_coord = np.where((np.arange(len(upper_coord)) % 2 == 0)[:, None], upper_coord, lower_coord)
+    end_coord = np.where((np.arange(len(upper_coord)) % 2 == 0)[:, None], lower_coord, upper_coord)
+    in_group = over_second[1:] == over_second[:-1]
+    assert (start_coord[1:, 0] == end_coord[:-1, 0])[in_group].all()
+    assert (np.abs(np.diff(start_coord[:, 1]))[in_group] < 2*gce.HEATING_LINE_SPACING).all()
+
+
+def test_grid_heating_path_empty():
+    upper_coord, lower_coord = gce.set_grid_heating_path(np.array([gce.PERIMETER_SEPARATOR]))
+    assert upper_coord.shape == lower_coord.shape == (0, 2)
+
+
+def test_group_cell_runs():
+    # Row 0 : two runs joined by the run of row 1, row 2 : two runs touching the run of row 1 only by a corner
+    assert gce.group_cell_runs([0, 0, 1, 2, 2], [0, 5, 1, 0, 6], [2, 7, 6, 1, 7]) == [1, 1, 1, 3, 4]
+
+    # A gap of a row separates the groups
+    assert gce.group_cell_runs([0, 2], [0, 0], [3, 3]) == [0, 1]
@@ -0,0 +1,54 @@
+import os
+import sys
+
+# The tests can be run from any folder
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_FOLDER)
+
+import gcode_editor as gce  # noqa: E402
+import layer_cache  # noqa: E402
+from conftest import edit_cube  # noqa: E402
+
+
+def test_layer_cache(cube_path, parameter_sets, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    total_layers = gce.find_layer_info(cube_path)[2]
+
+    for parameter_set in parameter_sets:
+        expected = edit_cube(cube_path, parameter_set)
+
+        # Edited once, then every layer is read from the cache
+        for nb_cached in (0, total_layers):
+            stats = gce.new_edit_stats()
+            assert edit_cube(cube_path, parameter_set, cache_dir=cache_dir, stats=stats) == expected
+            assert stats.counts["cached_layers"] == nb_cached
+
+
+def test_evict_cached_layers(tmp_path):
+    cache = layer_cache.open_layer_cache(str(tmp_path), max_size=30)
+    for key in ("a", "b", "c"):
+        layer_cache.write_cached_layer(cache, key, b"G1 X1\n", b"G0 Y2\n")
+    assert cache.entries == {"a": 14, "b": 14, "c": 14}
+
+    # Reading a layer makes it the most recently used, the least recently used ones are removed first
+    assert layer_cache.read_cached_layer(cache, "a") == (b"G1 X1\n", b"G0 Y2\n")
+    layer_cache.evict_cached_layers(cache)
+    assert list(cache.entries) == ["c", "a"]
+    assert sorted(os.listdir(tmp_path)) == ["a.layer", "c.layer"]
+
+    # The cache opened again finds its entries, the least recently used first
+    os.utime(tmp_path / "c.layer", (0, 0))
+    assert list(layer_cache.open_layer_cache(str(tmp_path)).entries) == ["c", "a"]
+    assert layer_cache.read_cached_layer(cache, "b") == (None, None)
+
+
+def test_failed_cache_write(cube_path, parameter_sets, tmp_path, monkeypatch):
+    def fail_replace(source, destination):
+        raise OSError(28, "No space left on device")
+
+    # A layer that cannot be saved is only not cached, without any temporary file left
+    cache_dir = str(tmp_path / "cache")
+    expected = edit_cube(cube_path, parameter_sets[0])
+    monkeypatch.setattr(os, "replace", fail_replace)
+    assert edit_cube(cube_path, parameter_sets[0], cache_dir=cache_dir) == expected
+    assert os.listdir(cache_dir) == []
@@ -0,0 +1,74 @@
+import os
+import sys
+
+import numpy as np
+
+# The tests can be run from any folder
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_FOLDER)
+
+import gcode_editor as gce  # noqa: E402
+import layer_index  # noqa: E402
+from conftest import edit_cube  # noqa: E402
+
+
+def test_layer_index(cube_path):
+    with open(cube_path, "rb") as file:
+        original = file.read()
+    lines = original.splitlines(keepends=True)
+    line_offsets = np.cumsum([0] + [len(line) for line in lines])
+
+    # Each layer starts at a ";LAYER_CHANGE" line, given by its offset and its line number
+    index = layer_index.find_layer_index(cube_path)
+    layer_lines = [i for i, line in enumerate(lines) if line.startswith(b";LAYER_CHANGE")]
+    assert index.offsets.tolist() == line_offsets[layer_lines].tolist()
+    assert index.line_numbers.tolist() == [i + 1 for i in layer_lines]
+    layer_height, total_height, total_layers = gce.find_layer_info(cube_path)
+    assert (index.layer_height, len(index.offsets)) == (layer_height, total_layers)
+    assert index.z_heights.max() == total_height
+    assert (np.diff(index.z_heights) > 0).all()
+    assert ((index.offsets < index.external_offsets) | (index.external_offsets == -1)).all()
+    assert all(original.startswith(b";TYPE:External perimeter", offset) for offset in index.external_offsets
+               if offset >= 0)
+
+    # A range of layers is read from its first ";LAYER_CHANGE" line to the next layer
+    third_layer = layer_index.read_layers(cube_path, 2).encode()
+    assert third_layer == original[index.offsets[2]:index.offsets[3]]
+    assert layer_index.read_layers(cube_path, len(index.offsets) - 2, len(index.offsets)).encode() == \
+        original[index.offsets[-2]:]
+
+
+def test_layer_index_file(cube_path):
+    index_path = layer_index.layer_index_path(cube_path)
+    index = layer_index.find_layer_index(cube_path)
+    assert os.path.exists(index_path)
+
+    # The saved index is used as long as the file does not change
+    loaded_index = layer_index.load_layer_index(cube_path)
+    for field in layer_index.LayerIndex._fields:
+        assert np.array_equal(getattr(loaded_index, field), getattr(index, field), equal_nan=True)
+
+    # A changed file is scanned again, its new index is saved
+    with open(cube_path, "ab") as file:
+        file.write(b";LAYER_CHANGE\n;Z:100\n")
+    assert layer_index.load_layer_index(cube_path) is None
+    new_index = layer_index.find_layer_index(cube_path)
+    assert len(new_index.offsets) == len(index.offsets) + 1
+    assert new_index.z_heights[-1] == 100
+    assert layer_index.load_layer_index(cube_path).file_size == os.path.getsize(cube_path)
+
+
+def test_layer_range(cube_path, parameter_sets):
+    total_layers = gce.find_layer_info(cube_path)[2]
+    with open(cube_path, "rb") as file:
+        original = file.read()
+    header_size = original.index(b";LAYER_CHANGE")
+
+    for parameter_set in parameter_sets:
+        expected = edit_cube(cube_path, parameter_set)
+        assert edit_cube(cube_path, parameter_set, layer_range=(0, total_layers)) == expected
+
+        # The layers before the range are copied as they are, the last ones are edited like in a full edition
+        edited = edit_cube(cube_path, parameter_set, layer_range=(total_layers // 2, total_layers))
+        assert edited[:header_size] == original[:header_size]
+        assert edited.endswith(expected[expected.rindex(b";LAYER_CHANGE"):])
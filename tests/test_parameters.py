@@ -0,0 +1,58 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+# The tests can be run from any folder
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_FOLDER)
+
+import gcode_editor as gce  # noqa: E402
+from conftest import PARAMETER_PATHS  # noqa: E402
+
+
+def test_load_parameter_file(tmp_path):
+    parameter_file_path = str(tmp_path / "parameter.txt")
+    shutil.copy(PARAMETER_PATHS[0], parameter_file_path)
+
+    parameter_set = gce.load_parameter_file(parameter_file_path)
+    assert parameter_set.phases[:, 1].tolist() == [0, 40, 70, 100]
+    assert parameter_set.temperatures[:, 1].tolist() == [190, 200, 210, 220]
+    assert parameter_set.speeds[:, 1].tolist() == [50, 30, 40, 60]
+    assert (parameter_set.extrude_correction, parameter_set.shift_x, parameter_set.shift_y) == (5, 2, 3)
+    assert parameter_set.activate_heating
+
+    # The arrays are shared by every call, they cannot be modified
+    assert gce.load_parameter_file(parameter_file_path) is parameter_set
+    with pytest.raises(ValueError):
+        parameter_set.speeds[0, 1] = 100
+
+
+def test_parameter_cache_invalidation(tmp_path):
+    parameter_file_path = str(tmp_path / "parameter.txt")
+    shutil.copy(PARAMETER_PATHS[0], parameter_file_path)
+    parameter_set = gce.load_parameter_file(parameter_file_path)
+    stat = os.stat(parameter_file_path)
+
+    # A change of modification time parses the file again, even with the same size
+    with open(parameter_file_path) as file:
+        content = file.read()
+    with open(parameter_file_path, "w") as file:
+        file.write(content.replace("Shift_X (mm) : 2", "Shift_X (mm) : 7"))
+    os.utime(parameter_file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert os.path.getsize(parameter_file_path) == stat.st_size
+    assert gce.load_parameter_file(parameter_file_path).shift_x == 7
+
+    # A value which is not a number is reported once the file changed
+    with open(parameter_file_path, "w") as file:
+        file.write(content.replace("Shift_X (mm) : 2", "Shift_X (mm) : two"))
+    os.utime(parameter_file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2_000_000_000))
+    with pytest.raises(ValueError, match="cannot be converted into a float"):
+        gce.load_parameter_file(parameter_file_path)
+
+    # The first version is found again in the cache
+    with open(parameter_file_path, "w") as file:
+        file.write(content)
+    os.utime(parameter_file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert gce.load_parameter_file(parameter_file_path) is parameter_set
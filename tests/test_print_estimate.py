@@ -0,0 +1,161 @@
+import io
+import os
+import re
+import sys
+
+import pytest
+
+# The tests can be run from any folder
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_FOLDER)
+
+import gcode_codecs as gcc  # noqa: E402
+import gcode_editor as gce  # noqa: E402
+import print_estimate as pe  # noqa: E402
+import sweep  # noqa: E402
+
+# Two layers of moves at 10 mm/s then 20 mm/s, then the progress lines and the estimates of a slicer which found a
+# print time of 1 s : the writer finds 2 s, the times are doubled
+ESTIMATE_GCODE = b"""G90
+M83
+G1 X10 Y0 F600
+;LAYER_CHANGE
+G1 X10 Y10 E2 F1200
+;LAYER_CHANGE
+G1 X0 Y10 E3
+M73 P50 R3 ; progress
+M73 Q50 S4
+; filament used [mm] = 10.00
+; filament used [g] = 0.20
+; filament used [cm3] = 0.10, 0.20
+; estimated printing time (normal mode) = 1s
+; estimated printing time (silent mode) = 2s
+; estimated first layer printing time (normal mode) = 1s
+"""
+EXPECTED_GCODE = ESTIMATE_GCODE[:ESTIMATE_GCODE.index(b"M73")] + b"""M73 P50 R6 ; progress
+M73 Q50 S8
+; filament used [mm] = 5.00
+; filament used [g] = 0.10
+; filament used [cm3] = 0.10, 0.20
+; estimated printing time (normal mode) = 2s
+; estimated printing time (silent mode) = 4s
+; estimated first layer printing time (normal mode) = 2s
+"""
+
+
+class KeptBytesIO(io.BytesIO):
+    # A BytesIO whose value can still be read once it is closed
+    def close(self):
+        pass
+
+
+def read_print_metadata(bgcode_file_path):
+    """Read the print metadata block of a binary G-code file.
+
+    Parameters
+    ----------
+    bgcode_file_path : The path of the binary G-code file.
+
+    Returns
+    -------
+    metadata : A dictionary of the print metadata.
+    """
+
+    block, = [block for block in gcc.gcode_metadata_blocks(bgcode_file_path)
+              if block.block_type == gcc.BLOCK_PRINT_METADATA]
+    return gcc.read_metadata_block(block)
+
+
+@pytest.mark.parametrize("block_size", [1, 7, len(ESTIMATE_GCODE)])
+def test_estimating_writer(block_size):
+    output_file = KeptBytesIO()
+    with pe.EstimatingWriter(output_file) as writer:
+        for start in range(0, len(ESTIMATE_GCODE), block_size):
+            writer.write(ESTIMATE_GCODE[start:start + block_size])
+
+    estimate = writer.estimate()
+    assert (estimate.seconds, estimate.filament_mm, estimate.moves) == (2, 5, 3)
+    assert estimate.layer_seconds.tolist() == [1.5, 0.5]
+    assert estimate.layer_filament_mm.tolist() == [2, 3]
+
+    # The estimates of the slicer are replaced, the values of several extruders are kept, the remaining times of the
+    # progress lines are scaled
+    assert output_file.getvalue() == EXPECTED_GCODE
+
+
+def test_estimating_writer_text():
+    output_file = io.StringIO()
+    output_file.close = lambda: None
+    with pe.EstimatingWriter(output_file) as writer:
+        writer.writelines([ESTIMATE_GCODE.decode()[:40], ESTIMATE_GCODE.decode()[40:]])
+
+    assert output_file.getvalue() == EXPECTED_GCODE.decode()
+
+
+def test_scale_progress_times():
+    assert pe.scale_progress_times(b"M73 P10 R20\nM73 Q10 S30\nM73 C5 D6\nG1 X20 R20\n", 0.5) == \
+        b"M73 P10 R10\nM73 Q10 S15\nM73 C2 D3\nG1 X20 R20\n"
+    assert pe.scale_progress_times(b"M73 P10 R20\n", None) == b"M73 P10 R20\n"
+
+
+def test_format_print_time():
+    assert pe.format_print_time(45.4) == "45s"
+    assert pe.format_print_time(3723) == "1h 2m 3s"
+    assert pe.format_print_time(90000) == "1d 1h 0m 0s"
+    assert pe.parse_estimate_value(b"estimated printing time (normal mode)", b"1d 1h 0m 0s") == 90000
+    assert pe.parse_estimate_value(b"filament used [mm]", b"231.80") == 231.8
+    assert pe.parse_estimate_value(b"filament used [mm]", b"1.00, 2.00") is None
+
+
+def test_estimate_gcode_file(cube_path, parameter_sets, tmp_path, capsys):
+    # The estimate of a file is the estimate of the writer of its edition
+    output_file_path = str(tmp_path / "modified-cube.gcode")
+    edit_estimate = gce.edit_gcode_file(cube_path, output_file_path, parameter_sets[0], estimate=True)
+    file_estimate = pe.estimate_gcode_file(output_file_path)
+    assert file_estimate.seconds == pytest.approx(edit_estimate.seconds)
+    assert file_estimate.filament_mm == pytest.approx(edit_estimate.filament_mm)
+    assert len(file_estimate.layer_seconds) == gce.find_layer_info(cube_path)[2]
+
+    # The remaining times of the progress lines follow the new print time
+    with open(cube_path, "rb") as file:
+        original = file.read()
+    with open(output_file_path, "rb") as file:
+        edited = file.read()
+    slicer_seconds = pe.parse_estimate_value(b"estimated printing time (normal mode)", re.search(
+        rb"estimated printing time \(normal mode\) = ([^\n]*)", original).group(1))
+    original_times = re.findall(rb"^M73 P\d+ R(\d+)", original, re.MULTILINE)
+    edited_times = re.findall(rb"^M73 P\d+ R(\d+)", edited, re.MULTILINE)
+    assert edited_times == [b"%d" % round(int(time) * edit_estimate.seconds / slicer_seconds)
+                            for time in original_times]
+
+    pe.print_estimate_summary(edit_estimate)
+    assert f"filament used : {edit_estimate.filament_mm:.2f} mm" in capsys.readouterr().out
+
+
+def test_bgcode_print_metadata(cube_path, parameter_sets, tmp_path):
+    bgcode_file_path = str(tmp_path / "cube.bgcode")
+    with open(cube_path, "rb") as file, \
+            gcc.open_gcode(bgcode_file_path, "wb", gcc.gcode_metadata_blocks(cube_path)) as bgcode_file:
+        bgcode_file.write(file.read())
+    slicer_metadata = read_print_metadata(bgcode_file_path)
+
+    # The print metadata of an edited binary G-code file gives the estimates of its G-code
+    output_file_path = str(tmp_path / "modified-cube.bgcode")
+    sweep_file_path = str(tmp_path / "sweep-cube.bgcode")
+    gce.edit_gcode_file(bgcode_file_path, output_file_path, parameter_sets[0])
+    sweep.sweep_gcode_file(cube_path, parameter_sets[:1], [sweep_file_path])
+    for file_path in (output_file_path, sweep_file_path):
+        estimate = pe.estimate_gcode_file(file_path)
+        metadata = read_print_metadata(file_path)
+        assert metadata.keys() == slicer_metadata.keys()
+        assert metadata["filament used [mm]"] == "%.2f" % estimate.filament_mm
+        assert metadata["estimated printing time (normal mode)"] == pe.format_print_time(estimate.seconds)
+        assert metadata["filament used [g]"] == "%.2f" % (float(slicer_metadata["filament used [g]"]) * float(
+            metadata["filament used [mm]"]) / float(slicer_metadata["filament used [mm]"]))
+
+    # The estimates missing from the print metadata are added
+    part_file_path = str(tmp_path / "part.bgcode")
+    with pe.EstimatingWriter(gcc.open_gcode(part_file_path, "wb")) as writer:
+        writer.write(ESTIMATE_GCODE[:ESTIMATE_GCODE.index(b"M73")])
+    assert read_print_metadata(part_file_path) == {"filament used [mm]": "5.00",
+                                                   "estimated printing time (normal mode)": "2s"}
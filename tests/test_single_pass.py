@@ -0,0 +1,61 @@
+import os
+import sys
+
+import pytest
+
+# The tests can be run from any folder
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_FOLDER)
+
+import gcode_codecs as gcc  # noqa: E402
+import gcode_editor as gce  # noqa: E402
+import layer_index  # noqa: E402
+from conftest import edit_cube  # noqa: E402
+
+
+def add_layer_count(cube_path):
+    """Write the amount of layers at the end of a cube, in the statistics of the slicer like PrusaSlicer 2.6.
+
+    Parameters
+    ----------
+    cube_path : The path of the G-code file.
+
+    Returns
+    -------
+    layer_count : The amount of ";LAYER_CHANGE" lines of the file.
+    """
+
+    with open(cube_path, "rb") as file:
+        layer_count = file.read().count(b"\n;LAYER_CHANGE")
+    with open(cube_path, "ab") as file:
+        file.write(f"; total layers count = {layer_count}\n".encode())
+
+    return layer_count
+
+
+def test_slicer_layer_count(cube_path, tmp_path):
+    # The bundled cubes were sliced before the amount of layers was written
+    assert gce.find_slicer_layer_count(cube_path) is None
+
+    layer_count = add_layer_count(cube_path)
+    assert gce.find_slicer_layer_count(cube_path) == layer_count
+
+    # A binary G-code file gives it in its print metadata
+    bgcode_file_path = str(tmp_path / "cube.bgcode")
+    with open(cube_path, "rb") as file, gcc.open_gcode(bgcode_file_path, "wb",
+                                                        gcc.gcode_metadata_blocks(cube_path)) as bgcode_file:
+        bgcode_file.write(file.read())
+    assert gce.find_slicer_layer_count(bgcode_file_path) == layer_count
+
+
+@pytest.mark.parametrize("phase_mapping", gce.PHASE_MAPPINGS)
+def test_single_pass(cube_path, parameter_sets, phase_mapping):
+    add_layer_count(cube_path)
+
+    # The layers are not scanned before the edition, no layer index is built unless the phases are placed by height
+    edited = [edit_cube(cube_path, parameter_set, single_pass=True, phase_mapping=phase_mapping)
+              for parameter_set in parameter_sets]
+    assert os.path.exists(layer_index.layer_index_path(cube_path)) == (phase_mapping == "height")
+
+    for parameter_set, gcode in zip(parameter_sets, edited):
+        assert gcode == edit_cube(cube_path, parameter_set, phase_mapping=phase_mapping)
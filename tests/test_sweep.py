@@ -0,0 +1,85 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# The tests can be run from any folder
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_FOLDER)
+
+import gcode_editor as gce  # noqa: E402
+import sweep  # noqa: E402
+from conftest import PARAMETER_PATHS, edit_cube  # noqa: E402
+
+
+def vary_parameter_set(parameter_set, speed_offset, shift_x, activate_heating):
+    """Derive a parameter set from another one, like a tool generating calibration variants.
+
+    Parameters
+    ----------
+    parameter_set : The ParameterSet to start from.
+    speed_offset : Percents added to the speed of every phase.
+    shift_x : The new shift of the workpiece on X axis.
+    activate_heating : Whether the new set has the heating phase.
+
+    Returns
+    -------
+    parameter_set : A new ParameterSet.
+    """
+
+    parameter_array = [np.array(array) for array in parameter_set.parameter_array]
+    parameter_array[2][:, 1] += speed_offset
+    parameter_array[4][0] = shift_x
+    parameter_array[5][0] = int(activate_heating)
+
+    return gce.new_parameter_set(parameter_array)
+
+
+@pytest.mark.parametrize("heating_path", gce.HEATING_PATHS)
+@pytest.mark.parametrize("phase_mapping", gce.PHASE_MAPPINGS)
+def test_sweep(cube_path, parameter_sets, heating_path, phase_mapping):
+    output_file_paths = [f"{cube_path}.sweep{i}" for i in range(len(parameter_sets))]
+    sweep.sweep_gcode_file(cube_path, parameter_sets, output_file_paths, heating_path, phase_mapping)
+
+    for parameter_set, output_file_path in zip(parameter_sets, output_file_paths):
+        with open(output_file_path, "rb") as file:
+            assert file.read() == edit_cube(cube_path, parameter_set, heating_path=heating_path,
+                                            phase_mapping=phase_mapping)
+
+
+def test_sweep_groups(cube_path, parameter_sets, monkeypatch):
+    # Variants sharing a shift or not, with and without heating, edited by groups of 2 sets
+    variants = [vary_parameter_set(parameter_sets[0], speed_offset, shift_x, activate_heating)
+                for speed_offset, shift_x, activate_heating in ((0, 2, True), (10, 2, True), (20, 5, True),
+                                                                 (30, 2, False), (40, 5, False))]
+    monkeypatch.setattr(sweep, "SWEEP_GROUP_SIZE", 2)
+    output_file_paths = [f"{cube_path}.variant{i}" for i in range(len(variants))]
+    sweep.sweep_gcode_file(cube_path, variants, output_file_paths, "box-optimized")
+
+    outputs = []
+    for variant, output_file_path in zip(variants, output_file_paths):
+        with open(output_file_path, "rb") as file:
+            outputs.append(file.read())
+        assert outputs[-1] == edit_cube(cube_path, variant, heating_path="box-optimized")
+    assert len(set(outputs)) == len(variants)
+    assert [b";HEATING_PHASE" in output for output in outputs] == [True, True, True, False, False]
+
+
+def test_run_sweep(cube_path, tmp_path, capsys):
+    invalid_parameter_path = str(tmp_path / "invalid.txt")
+    with open(invalid_parameter_path, "w") as file:
+        file.write("Phase 0 (%) : 0\n")
+    output_folder = str(tmp_path / "sweep")
+
+    # The invalid parameter file is reported, the others are applied
+    results = sweep.run_sweep(cube_path, PARAMETER_PATHS + [invalid_parameter_path], output_folder)
+    assert [result.status for result in results] == ["ok"]*len(PARAMETER_PATHS) + ["invalid"]
+    for result in results[:-1]:
+        with open(result.output_file_path, "rb") as file:
+            assert file.read() == edit_cube(cube_path, gce.load_parameter_file(result.parameter_file_path))
+    assert not os.path.exists(results[-1].output_file_path)
+
+    assert sweep.main([cube_path, *PARAMETER_PATHS, "--output", output_folder]) == 0
+    assert sweep.main([cube_path, invalid_parameter_path, "--output", output_folder]) == 1
+    assert "0/1 parameter files applied" in capsys.readouterr().out